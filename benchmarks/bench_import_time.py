@@ -0,0 +1,126 @@
+"""导入耗时基准
+
+使用 ``python -X importtime`` 在独立解释器中导入各入口模块，
+统计累计耗时并检查是否提前加载了重量级可选依赖。
+
+用法:
+    python benchmarks/bench_import_time.py [--repeat 5] [--budget-ms 200]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 需要测量的入口模块
+ENTRY_MODULES = [
+    "src",
+    "src.agents",
+    "src.core",
+    "src.core.task_executor",
+    "src.ui.cli",
+    "src.ui.web_ui",
+]
+
+# 导入入口模块时不应加载的重量级依赖
+HEAVY_MODULES = [
+    "PIL",
+    "pyautogui",
+    "chromadb",
+    "networkx",
+    "langchain",
+    "langchain_core",
+    "langchain_openai",
+    "gradio",
+    "sentence_transformers",
+]
+
+_LINE_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    解析 -X importtime 输出
+    
+    Args:
+        stderr: 解释器标准错误输出
+        
+    Returns:
+        (模块名, 自身耗时us, 累计耗时us) 列表
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE_PATTERN.match(line)
+        if match:
+            entries.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return entries
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    """
+    在新解释器中导入模块并返回导入记录
+    
+    Args:
+        module: 模块名
+        
+    Returns:
+        导入记录列表
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(PROJECT_ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(PROJECT_ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def heavy_imports(entries: List[Tuple[str, int, int]]) -> List[str]:
+    """返回导入记录中出现的重量级依赖"""
+    loaded = []
+    for name, _, _ in entries:
+        root = name.split(".")[0]
+        if root in HEAVY_MODULES and root not in loaded:
+            loaded.append(root)
+    return loaded
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="导入耗时基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块重复次数")
+    parser.add_argument("--budget-ms", type=float, default=200.0,
+                        help="单个入口模块累计导入耗时上限（毫秒）")
+    args = parser.parse_args()
+    
+    failed = False
+    print(f"{'模块':<28}{'中位数(ms)':>12}{'最小(ms)':>12}  重量级依赖")
+    for module in ENTRY_MODULES:
+        samples: List[float] = []
+        heavy: Dict[str, None] = {}
+        for _ in range(args.repeat):
+            entries = measure(module)
+            total = next((cum for name, _, cum in entries if name == module), 0)
+            samples.append(total / 1000.0)
+            for name in heavy_imports(entries):
+                heavy[name] = None
+        samples.sort()
+        median = samples[len(samples) // 2]
+        print(f"{module:<28}{median:>12.1f}{samples[0]:>12.1f}  {', '.join(heavy) or '-'}")
+        if heavy or median > args.budget_ms:
+            failed = True
+    
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""LLM对冲请求基准
+
+在本地桩服务上模拟重尾（Pareto）延迟分布，分别在关闭与开启
+对冲的网关上发起相同数量的请求，对比 p50/p90/p99 与对冲比例。
+
+用法:
+    python benchmarks/bench_llm_hedging.py [--requests 400] [--concurrency 8]
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "tests"))
+
+from src.core.latency import LatencyHistogram
+from src.core.llm_gateway import LLMGateway
+from llm_stub_server import StubLLMServer
+
+
+def pareto_delay(scale: float, alpha: float, cap: float, seed: int):
+    """
+    生成按请求序号取值的 Pareto 延迟函数
+    
+    Args:
+        scale: 最小延迟（秒）
+        alpha: 形状参数，越小尾部越重
+        cap: 延迟上限（秒）
+        seed: 随机种子
+    
+    Returns:
+        delay(index) 函数
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    
+    def delay(index: int) -> float:
+        with lock:
+            return min(cap, scale * rng.paretovariate(alpha))
+    
+    return delay
+
+
+def run(hedging: Dict[str, Any], args) -> Dict[str, Any]:
+    """
+    在新的桩服务与网关上执行一轮请求
+    
+    Args:
+        hedging: 网关对冲配置
+        args: 命令行参数
+    
+    Returns:
+        端到端延迟摘要、后端请求数与对冲统计
+    """
+    delay = pareto_delay(args.scale, args.alpha, args.cap, args.seed)
+    latencies = LatencyHistogram()
+    with StubLLMServer(delay=delay) as server:
+        gateway = LLMGateway({
+            "backend": "http",
+            "max_concurrency": None,
+            "max_connections": args.concurrency * 2,
+            "coalesce": False,
+            "hedging": hedging,
+        })
+        client = gateway.client("bench-model", base_url=server.base_url)
+        
+        def one(index: int):
+            start_time = time.perf_counter()
+            client.invoke(f"请求{index}")
+            latencies.record(time.perf_counter() - start_time)
+        
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(one, range(args.warmup)))
+            latencies = LatencyHistogram()
+            list(pool.map(one, range(args.warmup, args.warmup + args.requests)))
+        model_stats = gateway.get_stats()["models"]["bench-model"]
+        gateway.close()
+        backend_requests = len(server.requests)
+    
+    summary = latencies.summary()
+    summary["backend_requests"] = backend_requests
+    summary["hedged"] = model_stats.get("hedged", 0)
+    summary["hedge_wins"] = model_stats.get("hedge_wins", 0)
+    return summary
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="LLM对冲请求基准")
+    parser.add_argument("--requests", type=int, default=400, help="计时请求数")
+    parser.add_argument("--warmup", type=int, default=50, help="预热请求数（填充延迟直方图）")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发调用方数量")
+    parser.add_argument("--scale", type=float, default=0.01, help="Pareto最小延迟（秒）")
+    parser.add_argument("--alpha", type=float, default=1.5, help="Pareto形状参数")
+    parser.add_argument("--cap", type=float, default=2.0, help="延迟上限（秒）")
+    parser.add_argument("--percentile", type=float, default=0.95, help="对冲阈值分位")
+    parser.add_argument("--max-rate", type=float, default=0.05, help="对冲比例上限")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    args = parser.parse_args()
+    
+    configs = [
+        ("关闭对冲", {"enabled": False}),
+        ("开启对冲", {"enabled": True, "percentile": args.percentile,
+                  "max_rate": args.max_rate, "min_samples": args.warmup // 2}),
+    ]
+    print(f"{'配置':<10}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}"
+          f"{'后端请求':>10}{'对冲':>8}{'对冲胜出':>10}")
+    for name, hedging in configs:
+        result = run(hedging, args)
+        print(f"{name:<10}{result['p50'] * 1000:>10.1f}{result['p90'] * 1000:>10.1f}"
+              f"{result['p99'] * 1000:>10.1f}{result['max'] * 1000:>10.1f}"
+              f"{result['backend_requests']:>10}{result['hedged']:>8}{result['hedge_wins']:>10}")
+
+
+if __name__ == "__main__":
+    main()
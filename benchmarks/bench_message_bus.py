@@ -0,0 +1,83 @@
+"""消息总线发布吞吐基准
+
+在不同订阅者数量下测量 publish 与 publish_many 的每秒消息数，
+并测量 replay 的耗时。
+
+用法:
+    python benchmarks/bench_message_bus.py [--messages 200000] [--subscribers 0 1 4]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.message_bus import MessageBus
+
+
+def run(mode: str, subscribers: int, args) -> Dict[str, float]:
+    """
+    在新的消息总线上发布一轮消息
+    
+    Args:
+        mode: single（逐条 publish）或 batch（publish_many）
+        subscribers: 每个主题的同步订阅者数量
+        args: 命令行参数
+    
+    Returns:
+        每秒消息数与按主题回放耗时
+    """
+    bus = MessageBus(history_size=args.history)
+    topics = [f"topic-{i}" for i in range(args.topics)]
+    received = [0]
+    
+    def callback(message):
+        received[0] += 1
+    
+    for topic in topics:
+        for _ in range(subscribers):
+            bus.subscribe(topic, callback)
+    
+    payloads = [(topics[i % len(topics)], {"index": i, "data": "x" * 32}) for i in range(args.messages)]
+    start_time = time.perf_counter()
+    if mode == "batch":
+        for offset in range(0, len(payloads), args.batch):
+            bus.publish_many(payloads[offset:offset + args.batch])
+    else:
+        for topic, payload in payloads:
+            bus.publish(topic, payload)
+    elapsed = time.perf_counter() - start_time
+    
+    replay_start = time.perf_counter()
+    bus.replay(topics[0])
+    replay_time = time.perf_counter() - replay_start
+    bus.close()
+    assert received[0] == args.messages * subscribers
+    return {"rate": args.messages / elapsed, "replay_ms": replay_time * 1000}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="消息总线发布吞吐基准")
+    parser.add_argument("--messages", type=int, default=200000, help="发布消息数")
+    parser.add_argument("--topics", type=int, default=8, help="主题数")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[0, 1, 4], help="每个主题的订阅者数量")
+    parser.add_argument("--history", type=int, default=1000, help="内存历史容量")
+    parser.add_argument("--batch", type=int, default=100, help="publish_many 每批条数")
+    args = parser.parse_args()
+    
+    modes = ["single"]
+    if hasattr(MessageBus, "publish_many"):
+        modes.append("batch")
+    print(f"{'模式':<10}{'订阅者':>8}{'消息/秒':>14}{'回放(ms)':>12}")
+    for mode in modes:
+        for subscribers in args.subscribers:
+            result = run(mode, subscribers, args)
+            print(f"{mode:<10}{subscribers:>8}{result['rate']:>14,.0f}{result['replay_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,28 @@
-"""智能体模块"""
-from .base_agent import BaseAgent
-from .planning_agent import PlanningAgent
-from .knowledge_agent import KnowledgeAgent
-from .code_agent import CodeAgent
-from .gui_agent import GUIAgent
-from .evaluation_agent import EvaluationAgent
-from .customer_service_agent import CustomerServiceAgent
+"""智能体模块
+
+子模块按需加载（PEP 562），导入本包不会加载各智能体的依赖。
+"""
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base_agent import BaseAgent
+    from .planning_agent import PlanningAgent
+    from .knowledge_agent import KnowledgeAgent
+    from .code_agent import CodeAgent
+    from .gui_agent import GUIAgent
+    from .evaluation_agent import EvaluationAgent
+    from .customer_service_agent import CustomerServiceAgent
+
+_LAZY_ATTRS = {
+    "BaseAgent": ".base_agent",
+    "PlanningAgent": ".planning_agent",
+    "KnowledgeAgent": ".knowledge_agent",
+    "CodeAgent": ".code_agent",
+    "GUIAgent": ".gui_agent",
+    "EvaluationAgent": ".evaluation_agent",
+    "CustomerServiceAgent": ".customer_service_agent",
+}
 
 __all__ = [
     "BaseAgent",
@@ -16,3 +33,17 @@ __all__ = [
     "EvaluationAgent",
     "CustomerServiceAgent",
 ]
+
+
+def __getattr__(name: str):
+    """首次访问时导入对应子模块"""
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
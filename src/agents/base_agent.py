@@ -1,12 +1,44 @@
 """基础智能体类"""
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import functools
 import logging
 
+from ..core.latency import LatencyRecorder
+from ..core.memory_store import MemoryStore, create_memory_store
+from ..recording.tracing import get_tracer
+
 logger = logging.getLogger(__name__)
 
 
+def measured(operation: str):
+    """
+    装饰智能体方法，把每次调用的耗时记入该智能体的操作延迟直方图，
+    并在追踪链路中记录一个跨度
+    
+    Args:
+        operation: 操作名称
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.measure(operation):
+                    return await func(self, *args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.measure(operation):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 class BaseAgent(ABC):
     """基础智能体类，所有智能体的基类"""
     
@@ -21,13 +53,18 @@ class BaseAgent(ABC):
         self.name = name
         self.config = config
         self.state = "idle"  # idle, working, error
-        self.memory: List[Dict[str, Any]] = []
+        # 记忆后端由 config["memory"] 选择（默认内存环形缓冲区，条数上限为 max_memory）
+        self.memory: MemoryStore = create_memory_store(
+            name, config.get("memory"), default_max_items=config.get("max_memory", 100)
+        )
         self.statistics = {
             "tasks_completed": 0,
             "tasks_failed": 0,
             "average_time": 0.0,
             "total_time": 0.0
         }
+        # 各操作（task、observe、think、act、retrieve、llm 等）的延迟直方图
+        self.latency = LatencyRecorder()
         self.created_at = datetime.now()
         
     @abstractmethod
@@ -43,10 +80,48 @@ class BaseAgent(ABC):
         """
         raise NotImplementedError("子类必须实现process方法")
     
-    def reset(self):
-        """重置智能体状态"""
+    async def aprocess(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步处理输入数据
+        
+        默认在线程池中运行 process，避免阻塞事件循环；
+        有异步LLM调用的子类应覆盖此方法。
+        
+        Args:
+            input_data: 输入数据字典
+            
+        Returns:
+            处理结果字典
+        """
+        return await self.run_in_executor(self.process, input_data)
+    
+    async def run_in_executor(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在事件循环的默认线程池中运行同步（阻塞或CPU密集）方法，
+        方法在调用方的上下文（如截止时间）中执行
+        
+        Args:
+            func: 同步函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+            
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(context.run, func, *args, **kwargs))
+    
+    def reset(self, clear_memory: bool = True):
+        """
+        重置智能体状态
+        
+        Args:
+            clear_memory: 是否清空记忆（持久化记忆可选择保留）
+        """
         self.state = "idle"
-        self.memory = []
+        if clear_memory:
+            self.memory.clear()
         logger.info(f"{self.name} 状态已重置")
     
     def get_status(self) -> Dict[str, Any]:
@@ -61,6 +136,7 @@ class BaseAgent(ABC):
             "state": self.state,
             "memory_length": len(self.memory),
             "statistics": self.statistics,
+            "latency": self.latency.summary(),
             "created_at": self.created_at.isoformat()
         }
     
@@ -81,21 +157,50 @@ class BaseAgent(ABC):
         total_tasks = self.statistics["tasks_completed"] + self.statistics["tasks_failed"]
         if total_tasks > 0:
             self.statistics["average_time"] = self.statistics["total_time"] / total_tasks
+        self.latency.record("task", execution_time)
+    
+    @contextmanager
+    def measure(self, operation: str):
+        """
+        记录代码块耗时的上下文管理器，如 with self.measure("llm"): ...
+        
+        耗时记入操作延迟直方图，并记录名为 "<智能体名称>.<操作>" 的跨度。
+        
+        Args:
+            operation: 操作名称
+        """
+        with get_tracer().span(f"{self.name}.{operation}", agent=self.name, operation=operation), \
+                self.latency.measure(operation):
+            yield
     
-    def add_to_memory(self, item: Dict[str, Any]):
+    def add_to_memory(self, item: Dict[str, Any]) -> Dict[str, Any]:
         """
-        添加到记忆
+        添加到记忆，超过条数上限时淘汰最早的记忆
         
         Args:
-            item: 记忆项
+            item: 记忆项，type 字段用于按类型查询
+        
+        Returns:
+            保存的记忆项（附加 timestamp）
+        """
+        return self.memory.add(item)
+        
+    def search_memory(self, type: Optional[str] = None, since=None, until=None,
+                      keyword: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        item["timestamp"] = datetime.now().isoformat()
-        self.memory.append(item)
+        查询记忆
+        
+        Args:
+            type: 记忆类型
+            since: 起始时间（含），可为时间戳、datetime 或 ISO 字符串
+            until: 结束时间（不含）
+            keyword: 关键词
+            limit: 最多返回最近的多少条
         
-        # 限制记忆长度
-        max_memory = self.config.get("max_memory", 100)
-        if len(self.memory) > max_memory:
-            self.memory = self.memory[-max_memory:]
+        Returns:
+            按写入顺序排列的记忆项
+        """
+        return self.memory.query(type=type, since=since, until=until, keyword=keyword, limit=limit)
     
     def set_state(self, state: str):
         """
@@ -3,7 +3,8 @@ from typing import Dict, Any, Optional
 import logging
 import re
 
-from .base_agent import BaseAgent
+from .base_agent import BaseAgent, measured
+from ..core.llm_gateway import get_llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -25,13 +26,13 @@ class CodeAgent(BaseAgent):
     def _init_llm(self):
         """初始化LLM"""
         try:
-            from langchain_openai import ChatOpenAI
             api_key = self.config.get("openai_api_key")
             if api_key:
-                return ChatOpenAI(
+                return get_llm_gateway().client(
                     model=self.config.get("model", "gpt-4"),
                     temperature=self.config.get("temperature", 0.2),
-                    api_key=api_key
+                    api_key=api_key,
+                    base_url=self.config.get("openai_base_url")
                 )
         except Exception as e:
             logger.warning(f"LLM初始化失败: {e}")
@@ -56,6 +57,20 @@ class CodeAgent(BaseAgent):
         context = input_data.get("context", "")
         return self.generate_code(task, context)
     
+    async def aprocess(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步处理输入数据
+        
+        Args:
+            input_data: 输入数据字典
+            
+        Returns:
+            处理结果
+        """
+        task = input_data.get("task", {})
+        context = input_data.get("context", "")
+        return await self.agenerate_code(task, context)
+    
     def generate_code(self, task: Dict[str, Any], context: str = "") -> Dict[str, Any]:
         """
         生成代码
@@ -74,7 +89,66 @@ class CodeAgent(BaseAgent):
             
             # 使用LLM生成代码（如果可用）
             if self.llm:
-                prompt = f"""
+                try:
+                    with self.measure("llm"):
+                        response = self.llm.invoke(self._build_code_prompt(description, context))
+                    code = self._extract_code(response.content)
+                except Exception as e:
+                    logger.warning(f"LLM代码生成失败: {e}")
+                    code = self._generate_code_rule_based(description)
+            else:
+                code = self._generate_code_rule_based(description)
+            
+            return self._finish_generation(code)
+                
+        except Exception as e:
+            logger.error(f"代码生成失败: {e}")
+            self.set_state("error")
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+    
+    async def agenerate_code(self, task: Dict[str, Any], context: str = "") -> Dict[str, Any]:
+        """
+        异步生成代码，LLM调用不阻塞事件循环
+        
+        Args:
+            task: 任务字典
+            context: 上下文信息
+            
+        Returns:
+            代码生成结果
+        """
+        self.set_state("working")
+        
+        try:
+            description = task.get("description", "")
+            
+            if self.llm:
+                try:
+                    with self.measure("llm"):
+                        response = await self.llm.ainvoke(self._build_code_prompt(description, context))
+                    code = self._extract_code(response.content)
+                except Exception as e:
+                    logger.warning(f"LLM代码生成失败: {e}")
+                    code = self._generate_code_rule_based(description)
+            else:
+                code = self._generate_code_rule_based(description)
+            
+            return self._finish_generation(code)
+            
+        except Exception as e:
+            logger.error(f"代码生成失败: {e}")
+            self.set_state("error")
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+    
+    def _build_code_prompt(self, description: str, context: str) -> str:
+        """构建代码生成Prompt"""
+        return f"""
 根据以下任务和上下文，生成Python代码：
 
 任务: {description}
@@ -88,42 +162,36 @@ class CodeAgent(BaseAgent):
 
 代码：
 """
-                try:
-                    response = self.llm.invoke(prompt)
-                    code = self._extract_code(response.content)
-                except Exception as e:
-                    logger.warning(f"LLM代码生成失败: {e}")
-                    code = self._generate_code_rule_based(description)
-            else:
-                code = self._generate_code_rule_based(description)
-            
-            # 验证代码
-            validation_result = self._validate_code(code)
+    
+    def _finish_generation(self, code: str) -> Dict[str, Any]:
+        """
+        验证生成的代码并构造结果
+        
+        Args:
+            code: 生成的代码
             
-            if validation_result["valid"]:
-                self.set_state("idle")
-                return {
-                    "status": "success",
-                    "code": code,
-                    "validation": validation_result
-                }
-            else:
-                self.set_state("error")
-                return {
-                    "status": "error",
-                    "code": code,
-                    "validation": validation_result,
-                    "message": "代码验证失败"
-                }
-                
-        except Exception as e:
-            logger.error(f"代码生成失败: {e}")
+        Returns:
+            代码生成结果
+        """
+        validation_result = self._validate_code(code)
+        
+        if validation_result["valid"]:
+            self.set_state("idle")
+            return {
+                "status": "success",
+                "code": code,
+                "validation": validation_result
+            }
+        else:
             self.set_state("error")
             return {
                 "status": "error",
-                "message": str(e)
+                "code": code,
+                "validation": validation_result,
+                "message": "代码验证失败"
             }
     
+    @measured("execute_code")
     def execute_code(self, code: str) -> Dict[str, Any]:
         """
         执行代码
@@ -6,6 +6,7 @@ import logging
 import json
 
 from .base_agent import BaseAgent
+from ..core.intent_matcher import get_intent_matcher
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +54,7 @@ class CustomerServiceAgent(BaseAgent):
             }
         super().__init__(name, config)
         self.conversation_history: List[Dict[str, str]] = []
+        self.intents = get_intent_matcher(config.get("intent_tables"))
         
     def _build_rascef_prompt(self, user_message: str) -> str:
         """
@@ -178,37 +180,14 @@ class CustomerServiceAgent(BaseAgent):
             "call_need": None,  # 通话需求（高/中/低）
         }
         
-        message_lower = user_message.lower()
+        # 一次扫描标注身份、预算、流量与通话需求，同一类别取优先级最高的标签
+        tags = self.intents.tag(user_message)
         
-        # 识别身份
-        if any(word in message_lower for word in ["学生", "在校", "大学", "校园"]):
-            needs["identity"] = "在校生"
-        elif any(word in message_lower for word in ["老人", "60", "退休", "年长"]):
-            needs["identity"] = "60岁以上"
-        
-        # 识别预算
-        if any(word in message_lower for word in ["便宜", "经济", "预算有限", "省钱"]):
-            needs["budget"] = "低"
-        elif any(word in message_lower for word in ["高端", "无限", "不差钱"]):
-            needs["budget"] = "高"
-        else:
-            needs["budget"] = "中"
-        
-        # 识别流量需求
-        if any(word in message_lower for word in ["流量多", "流量大", "看视频", "玩游戏"]):
-            needs["data_need"] = "高"
-        elif any(word in message_lower for word in ["流量少", "基本不用"]):
-            needs["data_need"] = "低"
-        else:
-            needs["data_need"] = "中"
-        
-        # 识别通话需求
-        if any(word in message_lower for word in ["电话多", "通话多", "经常打电话"]):
-            needs["call_need"] = "高"
-        elif any(word in message_lower for word in ["很少打电话", "基本不打电话"]):
-            needs["call_need"] = "低"
-        else:
-            needs["call_need"] = "中"
+        identity = tags.get("identity")
+        needs["identity"] = identity[0] if identity else None
+        for category in ("budget", "data_need", "call_need"):
+            labels = tags.get(category)
+            needs[category] = labels[0] if labels else "中"
         
         return needs
     
@@ -3,6 +3,7 @@ from typing import Dict, Any
 import logging
 
 from .base_agent import BaseAgent
+from ..core.llm_gateway import get_llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -23,13 +24,13 @@ class EvaluationAgent(BaseAgent):
     def _init_llm(self):
         """初始化LLM"""
         try:
-            from langchain_openai import ChatOpenAI
             api_key = self.config.get("openai_api_key")
             if api_key:
-                return ChatOpenAI(
+                return get_llm_gateway().client(
                     model=self.config.get("model", "gpt-4"),
                     temperature=0.1,
-                    api_key=api_key
+                    api_key=api_key,
+                    base_url=self.config.get("openai_base_url")
                 )
         except Exception as e:
             logger.warning(f"LLM初始化失败: {e}")
@@ -172,6 +173,14 @@ class EvaluationAgent(BaseAgent):
                 "message": str(error)
             })
         
+        # 检查是否超出时间预算
+        if result.get("deadline_exceeded"):
+            issues.append({
+                "type": "timeout",
+                "severity": "high",
+                "message": "任务超出时间预算，仅完成部分子任务"
+            })
+        
         # 检查执行时间
         execution_time = result.get("execution_time", 0)
         if execution_time > 60:  # 超过60秒
@@ -206,6 +215,11 @@ class EvaluationAgent(BaseAgent):
                     "type": "optimization",
                     "suggestion": "优化执行步骤，减少不必要的操作"
                 })
+            elif issue["type"] == "timeout":
+                suggestions.append({
+                    "type": "budget",
+                    "suggestion": "增加任务时间预算（task_timeout）或拆分任务"
+                })
         
         return suggestions
     
@@ -3,9 +3,11 @@ from typing import Dict, Any, Optional, List
 import logging
 import base64
 from io import BytesIO
-from PIL import Image
 
-from .base_agent import BaseAgent
+from .base_agent import BaseAgent, measured
+from ..core.blob_store import get_blob_store, open_blob
+from ..core.deadline import DeadlineExceeded, current_deadline
+from ..core.llm_gateway import get_llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -41,13 +43,13 @@ class GUIAgent(BaseAgent):
         """初始化视觉语言模型"""
         # 简化实现：实际应该初始化真实的VL模型
         try:
-            from langchain_openai import ChatOpenAI
             api_key = self.config.get("openai_api_key")
             if api_key:
-                return ChatOpenAI(
+                return get_llm_gateway().client(
                     model=self.config.get("vl_model", "gpt-4-vision-preview"),
                     temperature=0.1,
-                    api_key=api_key
+                    api_key=api_key,
+                    base_url=self.config.get("openai_base_url")
                 )
         except Exception as e:
             logger.warning(f"VL模型初始化失败: {e}")
@@ -66,10 +68,13 @@ class GUIAgent(BaseAgent):
         action = input_data.get("action", {})
         return self.execute_action(action)
     
+    @measured("observe")
     def observe(self) -> Dict[str, Any]:
         """
         观察屏幕
         
+        截图写入共享数据存储，观察结果中只保存句柄。
+        
         Returns:
             观察结果
         """
@@ -80,20 +85,21 @@ class GUIAgent(BaseAgent):
             import pyautogui
             screenshot = pyautogui.screenshot()
             
-            # 转换为bytes
+            # 转换为PNG并写入共享数据存储
             img_bytes = BytesIO()
             screenshot.save(img_bytes, format='PNG')
-            screenshot_bytes = img_bytes.getvalue()
+            handle = get_blob_store().put(img_bytes.getbuffer(), content_type="image/png")
             
             return {
                 "status": "success",
-                "screenshot": screenshot_bytes,
+                "screenshot": handle,
                 "size": screenshot.size
             }
         except Exception as e:
             logger.error(f"屏幕观察失败: {e}")
             return {"status": "error", "message": str(e)}
     
+    @measured("think")
     def think(self, observation: Dict[str, Any], task: str) -> Dict[str, Any]:
         """
         思考下一步动作
@@ -113,12 +119,12 @@ class GUIAgent(BaseAgent):
             }
         
         try:
-            screenshot_bytes = observation.get("screenshot")
-            if not screenshot_bytes:
+            screenshot = open_blob(observation.get("screenshot"))
+            if not screenshot:
                 return {"status": "error", "message": "无截图数据", "actions": []}
             
-            # 编码截图
-            screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
+            # 编码截图（直接读取映射的数据，不复制）
+            screenshot_b64 = base64.b64encode(screenshot).decode('utf-8')
             
             # 调用VL模型（简化实现）
             prompt = f"""
@@ -149,6 +155,7 @@ class GUIAgent(BaseAgent):
             logger.error(f"思考过程失败: {e}")
             return {"status": "error", "message": str(e), "actions": []}
     
+    @measured("act")
     def act(self, actions: List[str]) -> Dict[str, Any]:
         """
         执行动作
@@ -171,8 +178,13 @@ class GUIAgent(BaseAgent):
                     return {"status": action, "results": results}
                 
                 if action == "WAIT":
-                    import time
-                    time.sleep(1)
+                    # 等待期间截止时间到期或任务被取消时提前结束
+                    deadline = current_deadline()
+                    if deadline is not None:
+                        deadline.sleep(1)
+                    else:
+                        import time
+                        time.sleep(1)
                     continue
                 
                 # 执行PyAutoGUI命令
@@ -225,6 +237,8 @@ class GUIAgent(BaseAgent):
         """
         执行完整任务
         
+        每一步开始前检查当前截止时间，到期后停止并返回已完成的步数。
+        
         Args:
             task: 任务字典
             
@@ -232,6 +246,9 @@ class GUIAgent(BaseAgent):
             执行结果
         """
         self.set_state("working")
+        deadline = current_deadline()
+        steps = 0
+        obs = None
         
         try:
             instruction = task.get("instruction", "")
@@ -241,6 +258,10 @@ class GUIAgent(BaseAgent):
             obs = self.observe()
             
             for step in range(max_steps):
+                if deadline is not None:
+                    deadline.check()
+                steps = step + 1
+                
                 # 思考
                 think_result = self.think(obs, instruction)
                 actions = think_result.get("actions", [])
@@ -254,20 +275,41 @@ class GUIAgent(BaseAgent):
                 if act_result["status"] in ["DONE", "FAIL"]:
                     break
                 
-                # 更新观察
-                obs = act_result.get("new_observation", obs)
+                # 更新观察，释放上一次的截图
+                new_obs = act_result.get("new_observation")
+                if new_obs is not None and new_obs is not obs:
+                    self._release_observation(obs)
+                    obs = new_obs
             
             self.set_state("idle")
             return {
                 "status": "completed",
-                "steps": step + 1,
+                "steps": steps,
+                "final_observation": obs
+            }
+        
+        except DeadlineExceeded as e:
+            logger.warning(f"GUI任务在第{steps}步后超出截止时间: {e}")
+            self.set_state("idle")
+            return {
+                "status": "partial",
+                "reason": "deadline_exceeded",
+                "message": str(e),
+                "steps": steps,
                 "final_observation": obs
             }
             
         except Exception as e:
             logger.error(f"任务执行失败: {e}")
             self.set_state("error")
+            self._release_observation(obs)
             return {"status": "error", "message": str(e)}
+    
+    @staticmethod
+    def _release_observation(observation: Optional[Dict[str, Any]]):
+        """释放观察结果中的截图"""
+        if observation:
+            get_blob_store().release(observation.get("screenshot"))
 
 
 class ActionParser:
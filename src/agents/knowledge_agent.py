@@ -2,7 +2,8 @@
 from typing import Dict, Any, List, Optional
 import logging
 
-from .base_agent import BaseAgent
+from .base_agent import BaseAgent, measured
+from ..core.deadline import current_deadline
 
 logger = logging.getLogger(__name__)
 
@@ -66,10 +67,14 @@ class KnowledgeAgent(BaseAgent):
         top_k = input_data.get("top_k", 5)
         return self.retrieve(query, top_k)
     
+    @measured("retrieve")
     def retrieve(self, query: str, top_k: int = 5) -> Dict[str, Any]:
         """
         检索知识
         
+        依次查询各数据源，查询每个数据源前检查当前截止时间，到期后
+        跳过剩余数据源，只融合已取得的结果。
+        
         Args:
             query: 查询字符串
             top_k: 返回结果数量
@@ -78,35 +83,46 @@ class KnowledgeAgent(BaseAgent):
             检索结果
         """
         self.set_state("working")
+        deadline = current_deadline()
         
         try:
             results = []
+            sources = []
             
             # 1. 向量检索
             if self.vector_store:
-                vector_results = self._vector_search(query, top_k)
-                results.extend(vector_results)
+                sources.append(lambda: self._vector_search(query, top_k))
             
             # 2. 关键词检索
-            keyword_results = self._keyword_search(query, top_k)
-            results.extend(keyword_results)
+            sources.append(lambda: self._keyword_search(query, top_k))
             
             # 3. 知识图谱查询
             if self.knowledge_graph:
-                kg_results = self._kg_query(query)
-                results.extend(kg_results)
+                sources.append(lambda: self._kg_query(query))
+            
+            skipped = 0
+            for index, source in enumerate(sources):
+                if deadline is not None and deadline.expired:
+                    skipped = len(sources) - index
+                    logger.warning(f"知识检索超出截止时间，跳过 {skipped} 个数据源")
+                    break
+                results.extend(source())
             
             # 4. 结果融合与排序
             merged_results = self._merge_results(results)
             reranked_results = self._rerank(merged_results, query)
             
             self.set_state("idle")
-            return {
-                "status": "success",
+            result = {
+                "status": "partial" if skipped else "success",
                 "query": query,
                 "results": reranked_results[:top_k],
                 "total": len(reranked_results)
             }
+            if skipped:
+                result["reason"] = "deadline_exceeded"
+                result["skipped_sources"] = skipped
+            return result
             
         except Exception as e:
             logger.error(f"知识检索失败: {e}")
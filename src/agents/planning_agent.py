@@ -1,12 +1,132 @@
 """规划智能体"""
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator, Optional
 import logging
 import json
+import time
 
 from .base_agent import BaseAgent
+from ..core.llm_gateway import get_llm_gateway
+from ..core.intent_matcher import get_intent_matcher
+from ..core.plan_templates import PlanTemplateLibrary
+from ..learning.plan_store import PlanStore, adapt_plan
+from ..learning.time_estimator import ExecutionTimeEstimator
 
 logger = logging.getLogger(__name__)
 
+# 各子任务类型依赖的前序子任务类型：
+# 代码生成使用前面检索到的知识；GUI操作共享同一桌面，必须按顺序执行。
+# 类型未知的子任务作为屏障，与前后所有子任务保持顺序。
+TYPE_DEPENDENCIES = {
+    "knowledge_query": (),
+    "code_generation": ("knowledge_query",),
+    "gui_action": ("gui_action",),
+}
+
+# 规划层级：计划库 -> 模板匹配 -> LLM -> 规则方法
+PLANNER_TIERS = ("store", "template", "llm", "rules")
+
+
+class StepStreamParser:
+    """
+    增量步骤解析器
+    
+    逐段接收LLM输出的JSON文本，跟踪字符串与嵌套层级，在顶层对象
+    "steps" 数组中的每个元素完整出现时立即返回，无需等待整个响应。
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self.steps: List[str] = []
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._expect_steps = False
+        self._steps_depth: Optional[int] = None
+        self._element_start: Optional[int] = None
+    
+    def feed(self, chunk: str) -> List[str]:
+        """
+        输入一段文本
+        
+        Args:
+            chunk: LLM输出片段
+        
+        Returns:
+            本次新完成的步骤列表
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+        
+        while self._pos < len(text):
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start:i + 1]
+                continue
+            
+            in_steps = self._steps_depth is not None and self._depth == self._steps_depth
+            if in_steps and ch in ",]":
+                self._emit(i, completed)
+                if ch == "]":
+                    self._steps_depth = None
+                    self._depth -= 1
+                continue
+            if in_steps and self._element_start is None and not ch.isspace():
+                self._element_start = i
+            
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._depth == 1 and self._last_key is not None:
+                self._expect_steps = self._decode(self._last_key) == "steps"
+                self._last_key = None
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._expect_steps and self._depth == 2:
+                    self._steps_depth = self._depth
+                self._expect_steps = False
+            elif ch in "}]":
+                self._depth -= 1
+            elif not ch.isspace():
+                self._expect_steps = False
+        
+        return completed
+    
+    def _emit(self, end: int, completed: List[str]):
+        """解析一个完整的数组元素"""
+        start, self._element_start = self._element_start, None
+        if start is None:
+            return
+        value = self._decode(self.text[start:end])
+        if isinstance(value, dict):
+            value = value.get("description") or value.get("step") or json.dumps(value, ensure_ascii=False)
+        if value is None or value == "":
+            return
+        step = str(value)
+        self.steps.append(step)
+        completed.append(step)
+    
+    @staticmethod
+    def _decode(raw: str) -> Any:
+        """解析JSON片段，失败时返回原文"""
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw.strip()
+
 
 class PlanningAgent(BaseAgent):
     """规划智能体，负责任务分解与执行规划"""
@@ -20,18 +140,35 @@ class PlanningAgent(BaseAgent):
         """
         super().__init__("PlanningAgent", config)
         self.llm = self._init_llm()
+        self.intents = get_intent_matcher(config.get("intent_tables"))
+        self.templates = PlanTemplateLibrary(config.get("plan_templates"))
+        self.template_threshold = config.get("template_threshold", 0.8)
+        self.tier_stats = {tier: 0 for tier in PLANNER_TIERS}
+        self.plan_store = self._init_plan_store()
+        self.time_estimator = ExecutionTimeEstimator.from_settings(config.get("time_estimator", {}))
+    
+    def _init_plan_store(self):
+        """初始化计划库"""
+        settings = self.config.get("plan_store", {})
+        if not settings.get("enabled", True):
+            return None
+        try:
+            return PlanStore.from_settings(settings)
+        except Exception as e:
+            logger.warning(f"计划库初始化失败: {e}")
+            return None
     
     def _init_llm(self):
         """初始化LLM"""
-        # 这里使用简化的实现，实际应该根据配置初始化真实的LLM
+        # 通过共享的LLM网关获取客户端（连接池、限流与并发控制）
         try:
-            from langchain_openai import ChatOpenAI
             api_key = self.config.get("openai_api_key")
             if api_key:
-                return ChatOpenAI(
+                return get_llm_gateway().client(
                     model=self.config.get("model", "gpt-4"),
                     temperature=self.config.get("temperature", 0.1),
-                    api_key=api_key
+                    api_key=api_key,
+                    base_url=self.config.get("openai_base_url")
                 )
         except Exception as e:
             logger.warning(f"LLM初始化失败: {e}，将使用模拟实现")
@@ -44,41 +181,87 @@ class PlanningAgent(BaseAgent):
         
         Args:
             input_data: 输入数据字典
-            
+        
         Returns:
             处理结果
         """
         task = input_data.get("task", {})
         return self.decompose_task(task)
     
+    async def aprocess(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步处理输入数据
+        
+        Args:
+            input_data: 输入数据字典
+        
+        Returns:
+            处理结果
+        """
+        task = input_data.get("task", {})
+        return await self.adecompose_task(task)
+    
     def decompose_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """
         分解任务为子任务
         
         Args:
             task: 任务字典
-            
+        
         Returns:
             分解后的计划
         """
         self.set_state("working")
         
         try:
+            # 0. 复用计划库中相同或近似指令的计划
+            plan = self._reuse_stored_plan(task.get("instruction", ""))
+            if plan is not None:
+                self.set_state("idle")
+                return plan
+            
             # 1. 理解任务
             task_understanding = self._understand_task(task)
             
-            # 2. 分解为子任务
-            subtasks = self._decompose(task_understanding)
+            # 2-4. 分解、分析依赖并生成执行计划
+            plan = self._build_plan(task_understanding)
             
-            # 3. 分析依赖
-            dependencies = self._analyze_dependencies(subtasks)
+            self.set_state("idle")
+            return plan
+        
+        except Exception as e:
+            logger.error(f"任务分解失败: {e}")
+            self.set_state("error")
+            return {
+                "status": "error",
+                "message": str(e),
+                "subtasks": []
+            }
+    
+    async def adecompose_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步分解任务为子任务，LLM调用不阻塞事件循环
+        
+        Args:
+            task: 任务字典
+        
+        Returns:
+            分解后的计划
+        """
+        self.set_state("working")
+        
+        try:
+            plan = self._reuse_stored_plan(task.get("instruction", ""))
+            if plan is not None:
+                self.set_state("idle")
+                return plan
             
-            # 4. 生成执行计划
-            plan = self._generate_plan(subtasks, dependencies)
+            task_understanding = await self._aunderstand_task(task)
+            plan = self._build_plan(task_understanding)
             
             self.set_state("idle")
             return plan
-            
+        
         except Exception as e:
             logger.error(f"任务分解失败: {e}")
             self.set_state("error")
@@ -88,21 +271,295 @@ class PlanningAgent(BaseAgent):
                 "subtasks": []
             }
     
+    def stream_plan(self, task: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        流式分解任务：LLM每输出一个完整步骤，立即产出对应的子任务
+        
+        子任务的依赖只引用之前已产出的子任务，调用方可以在规划完成前
+        开始执行无依赖的子任务。
+        
+        Args:
+            task: 任务字典
+        
+        Yields:
+            {"event": "subtask", "subtask": 子任务}，最后一项为
+            {"event": "plan", "plan": 执行计划}
+        """
+        self.set_state("working")
+        instruction = task.get("instruction", "")
+        subtasks: List[Dict[str, Any]] = []
+        
+        plan = self._reuse_stored_plan(instruction)
+        if plan is not None:
+            for subtask in self._ordered_subtasks(plan):
+                yield {"event": "subtask", "subtask": subtask}
+            self.set_state("idle")
+            yield {"event": "plan", "plan": plan}
+            return
+        
+        def emit(step: str) -> Dict[str, Any]:
+            subtask = self._make_subtask(len(subtasks), step)
+            subtask["dependencies"] = self._dependencies_for(subtask, subtasks)
+            subtasks.append(subtask)
+            return {"event": "subtask", "subtask": subtask}
+        
+        task_understanding = self._understand_task_by_template(instruction)
+        if task_understanding is None and self.llm:
+            parser = StepStreamParser()
+            try:
+                # 只统计等待模型输出的时间，不计入下游处理已产出子任务的时间
+                llm_time = 0.0
+                started = time.perf_counter()
+                for chunk in self.llm.stream(self._build_understanding_prompt(instruction)):
+                    llm_time += time.perf_counter() - started
+                    for step in parser.feed(chunk):
+                        yield emit(step)
+                    started = time.perf_counter()
+                self.latency.record("llm", llm_time + time.perf_counter() - started)
+                task_understanding = self._record_tier("llm", self._parse_llm_response(parser.text))
+            except Exception as e:
+                if subtasks:
+                    logger.error(f"流式规划中断: {e}")
+                    self.set_state("error")
+                    yield {"event": "plan", "plan": {
+                        "status": "error",
+                        "message": str(e),
+                        "subtasks": subtasks
+                    }}
+                    return
+                logger.warning(f"LLM理解失败: {e}，使用规则方法")
+        
+        if task_understanding is None:
+            task_understanding = self._record_tier("rules", self._understand_task_rule_based(instruction))
+        
+        # 流中未识别出的步骤（如响应不是JSON）在结束时补发
+        for step in task_understanding.get("steps", [])[len(subtasks):]:
+            yield emit(step)
+        
+        try:
+            dependencies = {subtask["id"]: subtask["dependencies"] for subtask in subtasks}
+            plan = self._generate_plan(subtasks, dependencies)
+            plan["planner_tier"] = task_understanding.get("tier")
+            self.set_state("idle")
+        except Exception as e:
+            logger.error(f"任务分解失败: {e}")
+            self.set_state("error")
+            plan = {"status": "error", "message": str(e), "subtasks": subtasks}
+        yield {"event": "plan", "plan": plan}
+    
+    def _reuse_stored_plan(self, instruction: str) -> Optional[Dict[str, Any]]:
+        """
+        从计划库查找可复用的计划，近似命中时按指令差异改写子任务描述
+        
+        Args:
+            instruction: 用户指令
+        
+        Returns:
+            执行计划，未命中或改写后子任务类型发生变化时返回None
+        """
+        if self.plan_store is None or not instruction:
+            return None
+        
+        entry = self.plan_store.lookup(instruction)
+        if entry is None:
+            return None
+        
+        plan = entry["plan"]
+        if not entry["exact"]:
+            plan = adapt_plan(plan, entry["instruction"], instruction)
+            # 改写改变了子任务类型时，原有依赖关系不再可靠
+            if any(self._determine_task_type(subtask["description"]) != subtask["type"]
+                   for subtask in plan.get("subtasks", [])):
+                return None
+        
+        self._estimate_time(plan)
+        plan["reused_from"] = entry["instruction"]
+        plan["similarity"] = entry["similarity"]
+        plan["planner_tier"] = "store"
+        self.tier_stats["store"] += 1
+        return plan
+    
+    def record_outcome(self, task: Dict[str, Any], plan: Dict[str, Any],
+                       evaluation: Optional[Dict[str, Any]]) -> bool:
+        """
+        根据评估结果把计划记录到计划库
+        
+        Args:
+            task: 任务字典
+            plan: 执行计划
+            evaluation: EvaluationAgent.evaluate 的结果
+        
+        Returns:
+            是否已记录
+        """
+        if self.plan_store is None or not evaluation or evaluation.get("status") != "success":
+            return False
+        return self.plan_store.record(task.get("instruction", ""), plan,
+                                      evaluation.get("completion_score", 0.0))
+    
+    def record_timing(self, subtask: Dict[str, Any], agent_name: Optional[str], execution_time: float):
+        """
+        记录子任务的实际耗时，用于后续计划的耗时估计
+        
+        Args:
+            subtask: 子任务
+            agent_name: 执行智能体名称
+            execution_time: 耗时（秒）
+        """
+        self.time_estimator.observe(subtask.get("type", "unknown"), agent_name, execution_time)
+    
+    def _estimate_time(self, plan: Dict[str, Any]):
+        """按已学习的耗时分布估计计划的 p50/p95 耗时（关键路径）"""
+        estimate = self.time_estimator.estimate_plan(self._ordered_subtasks(plan))
+        plan["estimated_time"] = estimate["p50"]
+        plan["estimated_time_p95"] = estimate["p95"]
+        plan["critical_path"] = estimate["critical_path"]
+    
+    @staticmethod
+    def _ordered_subtasks(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """按执行顺序排列计划中的子任务"""
+        subtasks_by_id = {subtask["id"]: subtask for subtask in plan.get("subtasks", [])}
+        return [subtasks_by_id[task_id] for task_id in plan.get("execution_order", [])
+                if task_id in subtasks_by_id]
+    
+    def _build_plan(self, task_understanding: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        根据任务理解结果生成执行计划
+        
+        Args:
+            task_understanding: 任务理解结果
+        
+        Returns:
+            执行计划
+        """
+        # 分解为子任务
+        subtasks = self._decompose(task_understanding)
+        
+        # 分析依赖
+        dependencies = self._analyze_dependencies(subtasks)
+        
+        # 生成执行计划
+        plan = self._generate_plan(subtasks, dependencies)
+        plan["planner_tier"] = task_understanding.get("tier")
+        return plan
+    
     def _understand_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """
         理解任务意图
         
         Args:
             task: 任务字典
-            
+        
         Returns:
             任务理解结果
         """
         instruction = task.get("instruction", "")
         
+        # 模板匹配（置信度足够时无需调用LLM）
+        task_understanding = self._understand_task_by_template(instruction)
+        if task_understanding is not None:
+            return task_understanding
+        
         # 使用LLM理解任务（如果可用）
         if self.llm:
-            prompt = f"""
+            try:
+                with self.measure("llm"):
+                    response = self.llm.invoke(self._build_understanding_prompt(instruction))
+                # 解析响应（简化实现）
+                return self._record_tier("llm", self._parse_llm_response(response.content))
+            except Exception as e:
+                logger.warning(f"LLM理解失败: {e}，使用规则方法")
+        
+        # 规则方法（备用）
+        return self._record_tier("rules", self._understand_task_rule_based(instruction))
+    
+    async def _aunderstand_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步理解任务意图
+        
+        Args:
+            task: 任务字典
+        
+        Returns:
+            任务理解结果
+        """
+        instruction = task.get("instruction", "")
+        
+        task_understanding = self._understand_task_by_template(instruction)
+        if task_understanding is not None:
+            return task_understanding
+        
+        if self.llm:
+            try:
+                with self.measure("llm"):
+                    response = await self.llm.ainvoke(self._build_understanding_prompt(instruction))
+                return self._record_tier("llm", self._parse_llm_response(response.content))
+            except Exception as e:
+                logger.warning(f"LLM理解失败: {e}，使用规则方法")
+        
+        return self._record_tier("rules", self._understand_task_rule_based(instruction))
+    
+    def _understand_task_by_template(self, instruction: str) -> Optional[Dict[str, Any]]:
+        """
+        使用模板库理解任务
+        
+        Args:
+            instruction: 用户指令
+        
+        Returns:
+            任务理解结果，未匹配或置信度低于阈值时返回None
+        """
+        match = self.templates.match(instruction)
+        if match is None or match.confidence < self.template_threshold:
+            return None
+        return self._record_tier("template", {
+            "goal": instruction,
+            "steps": match.steps,
+            "resources": [],
+            "expected_result": "任务完成",
+            "keywords": self._extract_keywords(instruction),
+            "template": match.template,
+            "confidence": match.confidence
+        })
+    
+    def _record_tier(self, tier: str, task_understanding: Dict[str, Any]) -> Dict[str, Any]:
+        """记录本次规划使用的层级"""
+        self.tier_stats[tier] += 1
+        task_understanding["tier"] = tier
+        return task_understanding
+    
+    def get_tier_stats(self) -> Dict[str, Any]:
+        """
+        获取各规划层级的命中统计
+        
+        Returns:
+            各层级次数、总次数与命中率
+        """
+        counts = dict(self.tier_stats)
+        total = sum(counts.values())
+        return {
+            "counts": counts,
+            "total": total,
+            "hit_rate": {tier: (count / total if total else 0.0) for tier, count in counts.items()}
+        }
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取智能体状态（含规划层级统计）
+        
+        Returns:
+            状态字典
+        """
+        status = super().get_status()
+        status["planner_tiers"] = self.get_tier_stats()
+        status["time_estimator"] = self.time_estimator.get_stats()
+        if self.plan_store is not None:
+            status["plan_store"] = self.plan_store.get_stats()
+        return status
+    
+    def _build_understanding_prompt(self, instruction: str) -> str:
+        """构建任务理解Prompt"""
+        return f"""
 分析以下任务，提取关键信息：
 任务: {instruction}
 
@@ -115,14 +572,9 @@ class PlanningAgent(BaseAgent):
     "keywords": ["关键词1", "关键词2", ...]
 }}
 """
-            try:
-                response = self.llm.invoke(prompt)
-                # 解析响应（简化实现）
-                return self._parse_llm_response(response.content)
-            except Exception as e:
-                logger.warning(f"LLM理解失败: {e}，使用规则方法")
-        
-        # 规则方法（备用）
+
+    def _understand_task_rule_based(self, instruction: str) -> Dict[str, Any]:
+        """基于规则理解任务"""
         return {
             "goal": instruction,
             "steps": self._extract_steps_rule_based(instruction),
@@ -137,23 +589,21 @@ class PlanningAgent(BaseAgent):
         
         Args:
             task_understanding: 任务理解结果
-            
+        
         Returns:
             子任务列表
         """
         steps = task_understanding.get("steps", [])
-        subtasks = []
-        
-        for i, step in enumerate(steps):
-            subtask = {
-                "id": f"task_{i+1}",
-                "description": step,
-                "type": self._determine_task_type(step),
-                "dependencies": []
-            }
-            subtasks.append(subtask)
-        
-        return subtasks
+        return [self._make_subtask(i, step) for i, step in enumerate(steps)]
+    
+    def _make_subtask(self, index: int, step: str) -> Dict[str, Any]:
+        """根据步骤描述创建子任务"""
+        return {
+            "id": f"task_{index+1}",
+            "description": step,
+            "type": self._determine_task_type(step),
+            "dependencies": []
+        }
     
     def _analyze_dependencies(self, subtasks: List[Dict[str, Any]]) -> Dict[str, List[str]]:
         """
@@ -161,21 +611,60 @@ class PlanningAgent(BaseAgent):
         
         Args:
             subtasks: 子任务列表
-            
+        
         Returns:
             依赖关系字典
         """
         dependencies = {}
         
-        # 简单规则：按顺序依赖
         for i, subtask in enumerate(subtasks):
-            deps = []
-            if i > 0:
-                deps.append(subtasks[i-1]["id"])
-            dependencies[subtask["id"]] = deps
+            dependencies[subtask["id"]] = self._dependencies_for(subtask, subtasks[:i])
         
         return dependencies
     
+    def _dependencies_for(self, subtask: Dict[str, Any],
+                          previous: List[Dict[str, Any]]) -> List[str]:
+        """
+        计算单个子任务对前序子任务的依赖
+        
+        Args:
+            subtask: 子任务
+            previous: 按顺序排列的前序子任务
+        
+        Returns:
+            依赖的子任务ID列表
+        """
+        if not previous:
+            return []
+        
+        # 顺序模式：每个子任务依赖前一个
+        if self.config.get("dependency_mode", "typed") == "sequential":
+            return [previous[-1]["id"]]
+        
+        subtask_type = subtask.get("type", "unknown")
+        required_types = TYPE_DEPENDENCIES.get(subtask_type)
+        deps = []
+        
+        for prev in reversed(previous):
+            prev_type = prev.get("type", "unknown")
+            
+            # 遇到屏障：依赖屏障本身即可，更早的子任务已被屏障覆盖
+            if prev_type not in TYPE_DEPENDENCIES:
+                deps.append(prev["id"])
+                break
+            
+            # 未知类型子任务依赖上一个屏障之后的所有子任务
+            if required_types is None:
+                deps.append(prev["id"])
+            elif prev_type in required_types:
+                deps.append(prev["id"])
+                # 同类型链式依赖，更早的同类子任务已被传递覆盖
+                if prev_type == subtask_type:
+                    break
+        
+        deps.reverse()
+        return deps
+    
     def _generate_plan(self, subtasks: List[Dict[str, Any]], 
                       dependencies: Dict[str, List[str]]) -> Dict[str, Any]:
         """
@@ -184,7 +673,7 @@ class PlanningAgent(BaseAgent):
         Args:
             subtasks: 子任务列表
             dependencies: 依赖关系
-            
+        
         Returns:
             执行计划
         """
@@ -192,15 +681,19 @@ class PlanningAgent(BaseAgent):
         for subtask in subtasks:
             subtask["dependencies"] = dependencies.get(subtask["id"], [])
         
-        # 生成执行顺序（拓扑排序）
-        execution_order = self._topological_sort(subtasks, dependencies)
+        # 生成执行层级（拓扑排序）
+        execution_levels = self._topological_levels(subtasks, dependencies)
+        execution_order = [task_id for level in execution_levels for task_id in level]
         
-        return {
+        plan = {
             "status": "success",
             "subtasks": subtasks,
             "execution_order": execution_order,
-            "estimated_time": len(subtasks) * 5  # 估算时间（秒）
+            "execution_levels": execution_levels
         }
+        # 估算时间（秒）
+        self._estimate_time(plan)
+        return plan
     
     def _topological_sort(self, subtasks: List[Dict[str, Any]], 
                          dependencies: Dict[str, List[str]]) -> List[str]:
@@ -210,12 +703,58 @@ class PlanningAgent(BaseAgent):
         Args:
             subtasks: 子任务列表
             dependencies: 依赖关系
-            
+        
         Returns:
             执行顺序
         """
-        # 简化实现：按顺序执行
-        return [task["id"] for task in subtasks]
+        levels = self._topological_levels(subtasks, dependencies)
+        return [task_id for level in levels for task_id in level]
+    
+    def _topological_levels(self, subtasks: List[Dict[str, Any]],
+                            dependencies: Dict[str, List[str]]) -> List[List[str]]:
+        """
+        按层级拓扑排序（Kahn算法），同一层级的子任务互不依赖
+        
+        Args:
+            subtasks: 子任务列表
+            dependencies: 依赖关系
+        
+        Returns:
+            执行层级列表，每层保持子任务原始顺序
+        """
+        task_ids = [task["id"] for task in subtasks]
+        known = set(task_ids)
+        indegree = {task_id: 0 for task_id in task_ids}
+        dependents: Dict[str, List[str]] = {task_id: [] for task_id in task_ids}
+        
+        for task_id in task_ids:
+            for dep in dependencies.get(task_id, []):
+                if dep not in known:
+                    logger.warning(f"子任务 {task_id} 依赖未知子任务 {dep}，已忽略")
+                    continue
+                indegree[task_id] += 1
+                dependents[dep].append(task_id)
+        
+        position = {task_id: i for i, task_id in enumerate(task_ids)}
+        levels = []
+        current = [task_id for task_id in task_ids if indegree[task_id] == 0]
+        visited = 0
+        
+        while current:
+            levels.append(current)
+            visited += len(current)
+            next_level = []
+            for task_id in current:
+                for dependent in dependents[task_id]:
+                    indegree[dependent] -= 1
+                    if indegree[dependent] == 0:
+                        next_level.append(dependent)
+            current = sorted(next_level, key=position.get)
+        
+        if visited != len(task_ids):
+            raise ValueError("子任务依赖存在循环")
+        
+        return levels
     
     def _determine_task_type(self, description: str) -> str:
         """
@@ -223,20 +762,11 @@ class PlanningAgent(BaseAgent):
         
         Args:
             description: 任务描述
-            
+        
         Returns:
             任务类型
         """
-        description_lower = description.lower()
-        
-        if any(keyword in description_lower for keyword in ["搜索", "查找", "检索"]):
-            return "knowledge_query"
-        elif any(keyword in description_lower for keyword in ["代码", "生成", "编写"]):
-            return "code_generation"
-        elif any(keyword in description_lower for keyword in ["点击", "输入", "打开", "移动"]):
-            return "gui_action"
-        else:
-            return "unknown"
+        return self.intents.classify(description, "task_type", default="unknown")
     
     def _extract_steps_rule_based(self, instruction: str) -> List[str]:
         """基于规则提取步骤"""
@@ -250,13 +780,7 @@ class PlanningAgent(BaseAgent):
     
     def _extract_keywords(self, text: str) -> List[str]:
         """提取关键词"""
-        # 简单实现
-        keywords = []
-        common_keywords = ["打开", "搜索", "保存", "生成", "点击", "输入"]
-        for keyword in common_keywords:
-            if keyword in text:
-                keywords.append(keyword)
-        return keywords
+        return self.intents.tag(text).get("task_keyword", [])
     
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         """解析LLM响应"""
@@ -1,8 +1,22 @@
-"""核心模块"""
-from .agent_manager import AgentManager
-from .task_planner import TaskPlanner
-from .task_executor import TaskExecutor
-from .knowledge_base import KnowledgeBase
+"""核心模块
+
+子模块按需加载（PEP 562），导入本包不会加载智能体及其依赖。
+"""
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .agent_manager import AgentManager
+    from .task_planner import TaskPlanner
+    from .task_executor import TaskExecutor
+    from .knowledge_base import KnowledgeBase
+
+_LAZY_ATTRS = {
+    "AgentManager": ".agent_manager",
+    "TaskPlanner": ".task_planner",
+    "TaskExecutor": ".task_executor",
+    "KnowledgeBase": ".knowledge_base",
+}
 
 __all__ = [
     "AgentManager",
@@ -11,3 +25,16 @@ __all__ = [
     "KnowledgeBase",
 ]
 
+
+def __getattr__(name: str):
+    """首次访问时导入对应子模块"""
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
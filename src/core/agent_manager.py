@@ -1,58 +1,54 @@
 """多智能体管理器"""
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterable, TYPE_CHECKING
+import asyncio
+import importlib
 import logging
-from collections import defaultdict
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from ..agents.base_agent import BaseAgent
-from ..agents.planning_agent import PlanningAgent
-from ..agents.knowledge_agent import KnowledgeAgent
-from ..agents.code_agent import CodeAgent
-from ..agents.gui_agent import GUIAgent
-from ..agents.evaluation_agent import EvaluationAgent
+from .blob_store import configure_blob_store
+from .latency import LatencyRecorder
+from .llm_gateway import configure_llm_gateway
+from .message_bus import MessageBus
+from .bus_transport import open_transport
+from .metrics_exporter import start_metrics_server
+from ..recording.tracing import configure_tracer
+
+if TYPE_CHECKING:
+    from ..agents.base_agent import BaseAgent
+    from ..agents.planning_agent import PlanningAgent
+    from ..agents.knowledge_agent import KnowledgeAgent
+    from ..agents.code_agent import CodeAgent
+    from ..agents.gui_agent import GUIAgent
+    from ..agents.evaluation_agent import EvaluationAgent
 
 logger = logging.getLogger(__name__)
 
+# 配置名称到智能体类的映射（按初始化顺序），以 "模块:类名" 形式延迟导入
+AGENT_CLASSES = {
+    "planning": "..agents.planning_agent:PlanningAgent",
+    "knowledge": "..agents.knowledge_agent:KnowledgeAgent",
+    "code": "..agents.code_agent:CodeAgent",
+    "gui": "..agents.gui_agent:GUIAgent",
+    "evaluation": "..agents.evaluation_agent:EvaluationAgent",
+}
 
-class MessageBus:
-    """消息总线，用于智能体间通信"""
-    
-    def __init__(self):
-        self.subscribers: Dict[str, List[callable]] = defaultdict(list)
-        self.message_history: List[Dict[str, Any]] = []
-    
-    def publish(self, topic: str, message: Dict[str, Any]):
-        """
-        发布消息
-        
-        Args:
-            topic: 主题
-            message: 消息内容
-        """
-        message["topic"] = topic
-        message["timestamp"] = self._get_timestamp()
-        self.message_history.append(message)
-        
-        # 通知订阅者
-        for callback in self.subscribers.get(topic, []):
-            try:
-                callback(message)
-            except Exception as e:
-                logger.error(f"消息回调执行失败: {e}")
+
+def _load_agent_class(spec):
+    """
+    解析智能体类
     
-    def subscribe(self, topic: str, callback: callable):
-        """
-        订阅消息
+    Args:
+        spec: 智能体类，或 "模块:类名" 字符串
         
-        Args:
-            topic: 主题
-            callback: 回调函数
-        """
-        self.subscribers[topic].append(callback)
-    
-    def _get_timestamp(self) -> str:
-        """获取时间戳"""
-        from datetime import datetime
-        return datetime.now().isoformat()
+    Returns:
+        智能体类
+    """
+    if not isinstance(spec, str):
+        return spec
+    module_name, class_name = spec.split(":")
+    module = importlib.import_module(module_name, __package__)
+    return getattr(module, class_name)
 
 
 class AgentManager:
@@ -61,44 +57,84 @@ class AgentManager:
     def __init__(self, config: Dict[str, Any]):
         """
         初始化智能体管理器
-        
+
+        智能体采用延迟构造：仅记录配置，首次 get_agent() 时才实例化。
+
         Args:
             config: 配置字典
         """
         self.config = config
-        self.agents: Dict[str, BaseAgent] = {}
-        self.message_bus = MessageBus()
+        self.agents: Dict[str, "BaseAgent"] = {}
+        self.message_bus = MessageBus.from_settings(config.get("message_bus", {}))
+        # 配置了 listen/connect 时与其他进程中的消息总线互通
+        self.bus_transport = open_transport(self.message_bus, config.get("message_bus", {}))
+        self._agent_configs: Dict[str, Dict[str, Any]] = {}
+        self._agents_lock = threading.Lock()
+        self._agent_locks: Dict[str, threading.Lock] = {}
+        if "llm_gateway" in config:
+            configure_llm_gateway(config["llm_gateway"])
+        if "blob_store" in config:
+            configure_blob_store(config["blob_store"])
+        if "tracing" in config:
+            configure_tracer(config["tracing"])
         self._initialize_agents()
+        # 配置了 metrics.port 时以 Prometheus 格式导出已加载智能体的延迟直方图（抓取时不构造智能体）；
+        # 导出服务只弱引用本管理器，管理器被回收后其智能体不再导出
+        self.metrics_server = start_metrics_server(self._loaded_agents, config.get("metrics", {}))
     
     def _initialize_agents(self):
-        """初始化所有智能体"""
+        """登记已配置的智能体（不立即构造）"""
         agent_configs = self.config.get("agents", {})
         
-        # 初始化规划智能体
-        if "planning" in agent_configs:
-            self.agents["planning"] = PlanningAgent(agent_configs["planning"])
+        for name in AGENT_CLASSES:
+            if name in agent_configs:
+                self._agent_configs[name] = agent_configs[name]
+                self._agent_locks[name] = threading.Lock()
         
-        # 初始化知识智能体
-        if "knowledge" in agent_configs:
-            self.agents["knowledge"] = KnowledgeAgent(agent_configs["knowledge"])
-        
-        # 初始化代码智能体
-        if "code" in agent_configs:
-            self.agents["code"] = CodeAgent(agent_configs["code"])
+        logger.info(f"已登记 {len(self._agent_configs)} 个智能体: {list(self._agent_configs.keys())}")
+    
+    def _create_agent(self, agent_name: str) -> Optional["BaseAgent"]:
+        """
+        构造智能体（线程安全，每个智能体只构造一次）
         
-        # 初始化GUI智能体
-        if "gui" in agent_configs:
-            self.agents["gui"] = GUIAgent(agent_configs["gui"])
+        Args:
+            agent_name: 智能体名称
+            
+        Returns:
+            智能体实例，如果未配置返回None
+        """
+        lock = self._agent_locks.get(agent_name)
+        if lock is None:
+            return None
         
-        # 初始化评估智能体
-        if "evaluation" in agent_configs:
-            self.agents["evaluation"] = EvaluationAgent(agent_configs["evaluation"])
+        with lock:
+            agent = self.agents.get(agent_name)
+            if agent is None:
+                agent_class = _load_agent_class(AGENT_CLASSES[agent_name])
+                agent = agent_class(self._agent_configs[agent_name])
+                with self._agents_lock:
+                    self.agents[agent_name] = agent
+                logger.info(f"已初始化智能体: {agent_name}")
+            return agent
+    
+    def get_agent(self, agent_name: str) -> Optional["BaseAgent"]:
+        """
+        获取智能体，首次访问时构造
         
-        logger.info(f"已初始化 {len(self.agents)} 个智能体: {list(self.agents.keys())}")
+        Args:
+            agent_name: 智能体名称
+            
+        Returns:
+            智能体实例，如果不存在返回None
+        """
+        agent = self.agents.get(agent_name)
+        if agent is not None:
+            return agent
+        return self._create_agent(agent_name)
     
-    def get_agent(self, agent_name: str) -> Optional[BaseAgent]:
+    async def aget_agent(self, agent_name: str) -> Optional["BaseAgent"]:
         """
-        获取智能体
+        异步获取智能体，首次构造在线程池中进行以免阻塞事件循环
         
         Args:
             agent_name: 智能体名称
@@ -106,9 +142,42 @@ class AgentManager:
         Returns:
             智能体实例，如果不存在返回None
         """
-        return self.agents.get(agent_name)
+        agent = self.agents.get(agent_name)
+        if agent is not None:
+            return agent
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._create_agent, agent_name)
+    
+    def warmup(self, agent_names: Optional[Iterable[str]] = None,
+               max_workers: Optional[int] = None) -> Dict[str, "BaseAgent"]:
+        """
+        并行预加载智能体
+        
+        Args:
+            agent_names: 需要预加载的智能体名称，默认全部已配置的智能体
+            max_workers: 最大并行线程数
+            
+        Returns:
+            已加载的智能体字典
+        """
+        # 名称会被读取两次，生成器需先转换为列表
+        agent_names = list(self._agent_configs.keys() if agent_names is None else agent_names)
+        pending = [name for name in agent_names
+                   if name in self._agent_configs and name not in self.agents]
+        
+        if pending:
+            workers = max_workers or len(pending)
+            with ThreadPoolExecutor(max_workers=workers,
+                                    thread_name_prefix="agent-warmup") as pool:
+                for name, future in [(n, pool.submit(self._create_agent, n)) for n in pending]:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"智能体预加载失败: {name}, 错误: {e}")
+        
+        return {name: self.agents[name] for name in agent_names if name in self.agents}
     
-    def register_agent(self, name: str, agent: BaseAgent):
+    def register_agent(self, name: str, agent: "BaseAgent"):
         """
         注册智能体
         
@@ -116,16 +185,33 @@ class AgentManager:
             name: 智能体名称
             agent: 智能体实例
         """
-        self.agents[name] = agent
+        with self._agents_lock:
+            self.agents[name] = agent
         logger.info(f"已注册智能体: {name}")
     
-    def get_all_agents(self) -> Dict[str, BaseAgent]:
+    def get_agent_names(self) -> List[str]:
         """
-        获取所有智能体
+        获取所有可用智能体名称（包括尚未构造的）
+        
+        Returns:
+            智能体名称列表
+        """
+        names = list(self._agent_configs.keys())
+        names.extend(name for name in self.agents if name not in self._agent_configs)
+        return names
+    
+    def _loaded_agents(self) -> Dict[str, "BaseAgent"]:
+        """已加载的智能体（不构造尚未加载的智能体）"""
+        return dict(self.agents)
+    
+    def get_all_agents(self) -> Dict[str, "BaseAgent"]:
+        """
+        获取所有智能体（会构造尚未加载的智能体）
         
         Returns:
             智能体字典
         """
+        self.warmup()
         return self.agents.copy()
     
     def get_agent_status(self) -> Dict[str, Any]:
@@ -135,14 +221,30 @@ class AgentManager:
         Returns:
             状态字典
         """
-        return {
-            name: agent.get_status()
-            for name, agent in self.agents.items()
-        }
+        status = {}
+        for name in self.get_agent_names():
+            agent = self.agents.get(name)
+            if agent is not None:
+                status[name] = agent.get_status()
+            else:
+                status[name] = {"name": name, "state": "unloaded"}
+        return status
+    
+    def get_latency_summary(self) -> Dict[str, Any]:
+        """
+        获取合并所有已加载智能体后的各操作延迟
+        
+        Returns:
+            操作名称 -> 次数、均值与 p50/p90/p99
+        """
+        merged = LatencyRecorder()
+        for agent in list(self.agents.values()):
+            merged.merge(agent.latency)
+        return merged.summary()
     
     def reset_all_agents(self):
-        """重置所有智能体"""
-        for agent in self.agents.values():
+        """重置所有已加载的智能体"""
+        for agent in list(self.agents.values()):
             agent.reset()
         logger.info("所有智能体已重置")
     
@@ -213,27 +315,27 @@ class AgentManager:
         return {"status": "error", "message": f"未知的子任务类型: {subtask_type}"}
     
     @property
-    def planning_agent(self) -> Optional[PlanningAgent]:
+    def planning_agent(self) -> Optional["PlanningAgent"]:
         """获取规划智能体"""
         return self.get_agent("planning")
     
     @property
-    def knowledge_agent(self) -> Optional[KnowledgeAgent]:
+    def knowledge_agent(self) -> Optional["KnowledgeAgent"]:
         """获取知识智能体"""
         return self.get_agent("knowledge")
     
     @property
-    def code_agent(self) -> Optional[CodeAgent]:
+    def code_agent(self) -> Optional["CodeAgent"]:
         """获取代码智能体"""
         return self.get_agent("code")
     
     @property
-    def gui_agent(self) -> Optional[GUIAgent]:
+    def gui_agent(self) -> Optional["GUIAgent"]:
         """获取GUI智能体"""
         return self.get_agent("gui")
     
     @property
-    def evaluation_agent(self) -> Optional[EvaluationAgent]:
+    def evaluation_agent(self) -> Optional["EvaluationAgent"]:
         """获取评估智能体"""
         return self.get_agent("evaluation")
 
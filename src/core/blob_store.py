@@ -0,0 +1,300 @@
+"""大块二进制数据存储
+
+截图等较大的二进制数据写入共享内存文件系统（/dev/shm，不可用时
+退回临时目录）中的文件，结果字典与消息总线中只传递很小的句柄。
+读取方通过 mmap 得到只读 memoryview，不复制数据；其他进程也可以
+凭句柄中的路径直接映射同一文件。
+
+写入方持有引用计数：release 到0时删除文件；总大小超过上限时
+淘汰最早写入的数据，避免遗忘释放的句柄占满内存。
+"""
+from typing import Dict, Any, List, Optional, Union
+from collections import OrderedDict
+import atexit
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# 默认存储配置
+DEFAULT_BLOB_STORE_SETTINGS = {
+    "directory": None,  # 存放目录，None表示 /dev/shm（不可用时为临时目录）下的进程专属子目录
+    "max_bytes": 512 * 1024 * 1024,  # 总大小上限，超过后淘汰最早写入的数据
+}
+
+
+class BlobHandle:
+    """数据句柄，可跨进程传递（pickle 或 to_dict）"""
+    
+    __slots__ = ("blob_id", "path", "size", "content_type")
+    
+    def __init__(self, blob_id: str, path: str, size: int, content_type: str = "application/octet-stream"):
+        """
+        初始化句柄
+        
+        Args:
+            blob_id: 数据ID
+            path: 数据文件路径
+            size: 字节数
+            content_type: 数据类型
+        """
+        self.blob_id = blob_id
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+    
+    def open(self) -> memoryview:
+        """
+        只读映射数据
+        
+        Returns:
+            memoryview（不复制数据）
+        
+        Raises:
+            FileNotFoundError: 数据已被释放或淘汰
+        """
+        if self.size == 0:
+            return memoryview(b"")
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # memoryview 持有映射的引用，最后一个视图释放后映射随之关闭
+        return memoryview(mapped)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可 JSON 序列化的字典"""
+        return {"blob_id": self.blob_id, "path": self.path, "size": self.size,
+                "content_type": self.content_type}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BlobHandle":
+        """从 to_dict 的结果恢复句柄"""
+        return cls(data["blob_id"], data["path"], data["size"], data.get("content_type", "application/octet-stream"))
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BlobHandle) and other.blob_id == self.blob_id
+    
+    def __hash__(self) -> int:
+        return hash(self.blob_id)
+    
+    def __repr__(self) -> str:
+        return f"BlobHandle({self.blob_id!r}, size={self.size}, content_type={self.content_type!r})"
+
+
+def open_blob(value: Union[BlobHandle, bytes, bytearray, memoryview, None]) -> Optional[memoryview]:
+    """
+    读取句柄或普通字节数据
+    
+    Args:
+        value: 句柄或字节数据
+    
+    Returns:
+        memoryview，value 为None或数据已被释放时返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, BlobHandle):
+        try:
+            return value.open()
+        except FileNotFoundError:
+            logger.warning(f"数据已被释放: {value.blob_id}")
+            return None
+    return memoryview(value)
+
+
+def _default_directory() -> str:
+    """优先使用共享内存文件系统"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+    return os.path.join(base, f"manus-blobs-{os.getpid()}")
+
+
+class BlobStore:
+    """写入方的数据存储，管理引用计数与总大小"""
+    
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """
+        初始化存储
+        
+        Args:
+            settings: 存储配置，未提供的项使用 DEFAULT_BLOB_STORE_SETTINGS
+        """
+        merged = dict(DEFAULT_BLOB_STORE_SETTINGS)
+        merged.update(settings or {})
+        self.settings = merged
+        self.directory = merged["directory"] or _default_directory()
+        self.max_bytes = merged["max_bytes"]
+        os.makedirs(self.directory, exist_ok=True)
+        # 数据ID -> [句柄, 引用计数]，按写入顺序排列
+        self._blobs: "OrderedDict[str, list]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"puts": 0, "released": 0, "evicted": 0}
+    
+    def put(self, data: Union[bytes, bytearray, memoryview],
+            content_type: str = "application/octet-stream") -> BlobHandle:
+        """
+        写入数据
+        
+        Args:
+            data: 字节数据
+            content_type: 数据类型
+        
+        Returns:
+            句柄（引用计数为1）
+        """
+        blob_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, f"{blob_id}.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        handle = BlobHandle(blob_id, path, memoryview(data).nbytes, content_type)
+        
+        with self._lock:
+            self._blobs[blob_id] = [handle, 1]
+            self._bytes += handle.size
+            self.stats["puts"] += 1
+            evicted = self._evict()
+        for old in evicted:
+            self._unlink(old)
+        return handle
+    
+    def retain(self, handle: BlobHandle) -> BlobHandle:
+        """
+        增加引用计数
+        
+        Args:
+            handle: 句柄
+        
+        Returns:
+            同一句柄
+        """
+        with self._lock:
+            entry = self._blobs.get(handle.blob_id)
+            if entry is not None:
+                entry[1] += 1
+        return handle
+    
+    def release(self, handle: Any) -> bool:
+        """
+        减少引用计数，到0时删除数据
+        
+        Args:
+            handle: 句柄，不是句柄时忽略
+        
+        Returns:
+            数据是否已被删除
+        """
+        if not isinstance(handle, BlobHandle):
+            return False
+        with self._lock:
+            entry = self._blobs.get(handle.blob_id)
+            if entry is None:
+                return False
+            entry[1] -= 1
+            if entry[1] > 0:
+                return False
+            del self._blobs[handle.blob_id]
+            self._bytes -= handle.size
+            self.stats["released"] += 1
+        self._unlink(handle)
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取存储统计
+        
+        Returns:
+            当前数据条数、总字节数与写入/释放/淘汰次数
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["blobs"] = len(self._blobs)
+            stats["bytes"] = self._bytes
+        return stats
+    
+    def close(self):
+        """删除全部数据"""
+        with self._lock:
+            handles = [entry[0] for entry in self._blobs.values()]
+            self._blobs.clear()
+            self._bytes = 0
+        for handle in handles:
+            self._unlink(handle)
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
+    
+    def _evict(self) -> list:
+        """超过总大小上限时淘汰最早写入的数据（不论引用计数，至少保留最新一条）"""
+        evicted = []
+        while self._bytes > self.max_bytes and len(self._blobs) > 1:
+            _, (handle, refs) = self._blobs.popitem(last=False)
+            self._bytes -= handle.size
+            self.stats["evicted"] += 1
+            logger.warning(f"数据存储超出上限，淘汰仍有 {refs} 个引用的数据: {handle.blob_id}")
+            evicted.append(handle)
+        return evicted
+    
+    @staticmethod
+    def _unlink(handle: BlobHandle):
+        """删除数据文件；已映射的读取方在取消映射前仍可读取"""
+        try:
+            os.unlink(handle.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除数据文件失败: {handle.path}, 错误: {e}")
+
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+# 被替换时仍有数据的存储，进程退出时再清理
+_retired: List[BlobStore] = []
+
+
+def get_blob_store() -> BlobStore:
+    """获取进程内共享的数据存储（首次调用时使用默认配置创建）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore()
+        return _store
+
+
+def configure_blob_store(settings: Dict[str, Any]) -> BlobStore:
+    """
+    使用指定配置重建共享的数据存储，配置未变化时沿用当前存储
+    
+    旧存储中仍有数据时不删除（进行中的任务与结果可能还持有句柄），
+    留到进程退出时清理。
+    
+    Args:
+        settings: 存储配置
+    
+    Returns:
+        共享的存储
+    """
+    global _store
+    merged = dict(DEFAULT_BLOB_STORE_SETTINGS)
+    merged.update(settings)
+    with _store_lock:
+        if _store is not None and _store.settings == merged:
+            return _store
+        old, _store = _store, BlobStore(settings)
+        if old is not None and old.get_stats()["blobs"]:
+            _retired.append(old)
+            old = None
+    if old is not None:
+        old.close()
+    return _store
+
+
+@atexit.register
+def _close_blob_store():
+    """进程退出时删除共享存储及被替换的存储中的数据"""
+    for store in _retired + [_store]:
+        if store is not None:
+            store.close()
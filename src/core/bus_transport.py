@@ -0,0 +1,565 @@
+"""消息总线跨进程传输
+
+把多个进程中的 MessageBus 连接起来：一个进程运行 BusHub 监听本地
+套接字（Unix 域套接字路径或 localhost TCP 地址），其他进程用 BusLink
+连接。各进程继续使用原有的 subscribe/publish 接口，消息会转发给所有
+订阅了匹配主题的进程。
+
+帧格式（大端）：4字节正文长度 + 1字节帧类型 + 正文。发布帧的正文是
+一批消息：4字节条数，随后每条为 2字节主题长度 + 4字节负载长度 +
+UTF-8 主题 + JSON 负载。负载中的 BlobHandle 按句柄传递，大块数据
+不经过套接字。发送线程每次把排队中的消息合并为一帧，
+负载较小而发布频繁时可显著减少系统调用次数。
+"""
+from typing import Dict, Any, List, Optional, Tuple, Union
+from collections import deque
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+
+from .blob_store import BlobHandle
+from .message_bus import DEFAULT_MESSAGE_BUS_SETTINGS, Message, MessageBus
+from .topic_router import TopicRouter
+
+logger = logging.getLogger(__name__)
+
+Address = Union[str, Tuple[str, int]]
+
+FRAME_PUBLISH = 1
+FRAME_SUBSCRIBE = 2
+FRAME_UNSUBSCRIBE = 3
+
+_HEADER = struct.Struct("!IB")
+_COUNT = struct.Struct("!I")
+_RECORD = struct.Struct("!HI")
+
+# 单帧正文上限，防止异常数据导致分配过大的缓冲区
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def encode_batch(records: List[Tuple[str, bytes]]) -> bytes:
+    """
+    编码发布帧正文
+    
+    Args:
+        records: (主题, JSON负载字节) 列表
+    
+    Returns:
+        正文字节
+    """
+    parts = [_COUNT.pack(len(records))]
+    for topic, payload in records:
+        topic_bytes = topic.encode("utf-8")
+        parts.append(_RECORD.pack(len(topic_bytes), len(payload)))
+        parts.append(topic_bytes)
+        parts.append(payload)
+    return b"".join(parts)
+
+
+def decode_batch(body: bytes) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    解码发布帧正文
+    
+    Args:
+        body: 正文字节
+    
+    Returns:
+        (主题, 负载) 列表
+    """
+    view = memoryview(body)
+    (count,) = _COUNT.unpack_from(view, 0)
+    offset = _COUNT.size
+    records = []
+    for _ in range(count):
+        topic_length, payload_length = _RECORD.unpack_from(view, offset)
+        offset += _RECORD.size
+        topic = str(view[offset:offset + topic_length], "utf-8")
+        offset += topic_length
+        payload = json.loads(str(view[offset:offset + payload_length], "utf-8"), object_hook=_decode_object)
+        offset += payload_length
+        records.append((topic, payload))
+    return records
+
+
+def encode_frame(kind: int, body: bytes) -> bytes:
+    """
+    编码一帧
+    
+    Args:
+        kind: 帧类型
+        body: 正文
+    
+    Returns:
+        帧字节
+    """
+    return _HEADER.pack(len(body), kind) + body
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """读取指定字节数，连接关闭时返回None"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return None
+        received += n
+    return bytes(buffer)
+
+
+def read_frame(sock: socket.socket) -> Optional[Tuple[int, bytes]]:
+    """
+    读取一帧
+    
+    Args:
+        sock: 套接字
+    
+    Returns:
+        (帧类型, 正文)，连接关闭时返回None
+    """
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    length, kind = _HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"帧过大: {length} 字节")
+    body = _recv_exact(sock, length) if length else b""
+    if body is None:
+        return None
+    return kind, body
+
+
+def _socket_family(address: Address) -> int:
+    """字符串地址为 Unix 域套接字路径，元组为 TCP 地址"""
+    return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+
+def _encode_object(value: Any) -> Any:
+    """JSON 无法直接表示的对象：数据句柄保留类型，其他转为字符串"""
+    if isinstance(value, BlobHandle):
+        return {"__blob__": value.to_dict()}
+    return str(value)
+
+
+def _decode_object(data: Dict[str, Any]) -> Any:
+    """恢复数据句柄"""
+    if "__blob__" in data and len(data) == 1:
+        return BlobHandle.from_dict(data["__blob__"])
+    return data
+
+
+def _encode_payload(payload: Dict[str, Any]) -> bytes:
+    """把负载编码为紧凑的 JSON"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_encode_object).encode("utf-8")
+
+
+class _Connection:
+    """
+    一条双向连接：接收线程读取帧并回调，发送线程把排队的消息合并成批
+    """
+    
+    def __init__(self, sock: socket.socket, on_frame, on_close, name: str,
+                 batch_size: int = 256, max_pending: int = 10000):
+        """
+        初始化连接
+        
+        Args:
+            sock: 已连接的套接字
+            on_frame: on_frame(帧类型, 正文)
+            on_close: 连接关闭时的回调
+            name: 线程名前缀
+            batch_size: 每帧最多合并的消息数
+            max_pending: 发送队列上限，满时发布方阻塞等待
+        """
+        self.sock = sock
+        self.on_frame = on_frame
+        self.on_close = on_close
+        self.batch_size = max(1, batch_size)
+        self.max_pending = max(1, max_pending)
+        self.closed = False
+        self.stats = {"frames_sent": 0, "messages_sent": 0, "frames_received": 0, "messages_received": 0}
+        # 待发送项：("msg", (主题, 负载字节)) 或 ("ctl", 帧字节)
+        self._outbox: deque = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._reader = threading.Thread(target=self._read_loop, name=f"{name}-reader", daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, name=f"{name}-writer", daemon=True)
+    
+    def start(self):
+        """启动收发线程"""
+        self._reader.start()
+        self._writer.start()
+    
+    def send_message(self, topic: str, payload: Dict[str, Any]):
+        """
+        排队发送一条消息
+        
+        Args:
+            topic: 主题
+            payload: 负载
+        """
+        self._enqueue(("msg", (topic, _encode_payload(payload))))
+    
+    def send_control(self, kind: int, pattern: str):
+        """
+        排队发送订阅/取消订阅帧（与消息保持先后顺序）
+        
+        Args:
+            kind: 帧类型
+            pattern: 订阅模式
+        """
+        self._enqueue(("ctl", encode_frame(kind, pattern.encode("utf-8"))))
+    
+    def close(self):
+        """发送完已排队的数据后关闭连接"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if threading.current_thread() is not self._writer:
+            self._writer.join(timeout=5)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+    
+    def _enqueue(self, item):
+        """写入发送队列"""
+        with self._lock:
+            self._not_full.wait_for(lambda: self.closed or len(self._outbox) < self.max_pending)
+            if self.closed:
+                return
+            self._outbox.append(item)
+            self._not_empty.notify()
+    
+    def _write_loop(self):
+        """把排队中的连续消息合并为一个发布帧发送"""
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self.closed or self._outbox)
+                if not self._outbox:
+                    return
+                items = []
+                while self._outbox and len(items) < self.batch_size:
+                    items.append(self._outbox.popleft())
+                self._not_full.notify_all()
+            
+            # 连续的消息合并为一个发布帧，控制帧保持原有顺序
+            frames, records, sent = [], [], 0
+            for kind, item in items:
+                if kind == "msg":
+                    records.append(item)
+                    continue
+                if records:
+                    frames.append(encode_frame(FRAME_PUBLISH, encode_batch(records)))
+                    sent, records = sent + len(records), []
+                frames.append(item)
+            if records:
+                frames.append(encode_frame(FRAME_PUBLISH, encode_batch(records)))
+                sent += len(records)
+            try:
+                self.sock.sendall(b"".join(frames))
+            except OSError as e:
+                logger.warning(f"消息总线连接发送失败: {e}")
+                self._shutdown()
+                return
+            self.stats["frames_sent"] += len(frames)
+            self.stats["messages_sent"] += sent
+    
+    def _read_loop(self):
+        """读取帧并回调"""
+        try:
+            while True:
+                frame = read_frame(self.sock)
+                if frame is None:
+                    break
+                self.stats["frames_received"] += 1
+                try:
+                    self.on_frame(*frame)
+                except Exception as e:
+                    logger.error(f"处理消息总线帧失败: {e}")
+        except (OSError, ValueError) as e:
+            if not self.closed:
+                logger.warning(f"消息总线连接接收失败: {e}")
+        self._shutdown()
+    
+    def _shutdown(self):
+        """连接断开：停止发送并通知上层"""
+        with self._lock:
+            was_closed = self.closed
+            self.closed = True
+            self._outbox.clear()
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if not was_closed:
+            self.sock.close()
+            self.on_close()
+
+
+class _Inbound(threading.local):
+    """当前线程正在投递的远端消息负载，转发时据此避免回传给来源"""
+    
+    def __init__(self):
+        self.origin = None
+        self.payload_ids = frozenset()
+
+
+class BusHub:
+    """消息总线中心：接受其他进程的连接，在本进程总线与各连接之间转发消息"""
+    
+    def __init__(self, bus: MessageBus, address: Address, batch_size: int = 256):
+        """
+        启动监听
+        
+        Args:
+            bus: 本进程的消息总线
+            address: Unix 域套接字路径，或 (主机, 端口)（端口为0时自动分配）
+            batch_size: 每帧最多合并的消息数
+        """
+        self.bus = bus
+        self.batch_size = batch_size
+        self.peers: List["_Peer"] = []
+        self.closed = False
+        self._inbound = _Inbound()
+        self._lock = threading.Lock()
+        
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self._server = socket.socket(_socket_family(address), socket.SOCK_STREAM)
+        if not isinstance(address, str):
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(address)
+        self._server.listen()
+        self.address = self._server.getsockname()
+        # 本进程发布的消息与各进程发来的消息都经此转发给订阅了匹配主题的连接
+        self._forwarder = bus.subscribe("#", self._forward, dispatch="sync")
+        self._acceptor = threading.Thread(target=self._accept_loop, name="bus-hub", daemon=True)
+        self._acceptor.start()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取传输统计
+        
+        Returns:
+            各连接的帧数、消息数与订阅模式数
+        """
+        with self._lock:
+            peers = list(self.peers)
+        return {"peers": [dict(peer.connection.stats, patterns=len(peer.patterns)) for peer in peers]}
+    
+    def close(self):
+        """停止监听并关闭所有连接"""
+        self.closed = True
+        self.bus.unsubscribe(self._forwarder)
+        try:
+            self._server.close()
+        except OSError:
+            pass
+        with self._lock:
+            peers = list(self.peers)
+        for peer in peers:
+            peer.connection.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+    
+    def _accept_loop(self):
+        """接受连接"""
+        while not self.closed:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            if sock.family != socket.AF_UNIX:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            peer = _Peer(self, sock)
+            with self._lock:
+                self.peers = self.peers + [peer]
+            peer.connection.start()
+    
+    def _forward(self, message: Message):
+        """把消息转发给订阅了匹配主题的连接（不回传给来源连接）"""
+        inbound = self._inbound
+        origin = inbound.origin if id(message.payload) in inbound.payload_ids else None
+        for peer in self.peers:
+            if peer is not origin and peer.router.route(message.topic):
+                peer.connection.send_message(message.topic, message.payload)
+    
+    def _remove_peer(self, peer: "_Peer"):
+        """连接断开"""
+        with self._lock:
+            if peer in self.peers:
+                self.peers = [p for p in self.peers if p is not peer]
+
+
+class _Peer:
+    """BusHub 一侧的远端连接及其订阅模式（按模式引用计数）"""
+    
+    def __init__(self, hub: BusHub, sock: socket.socket):
+        self.hub = hub
+        self.router = TopicRouter()
+        # 模式 -> [注册到路由的对象, 引用计数]；路由按对象身份注销，需保留注册时的对象
+        self.patterns: Dict[str, list] = {}
+        self.connection = _Connection(sock, self._on_frame, lambda: hub._remove_peer(self),
+                                      "bus-peer", batch_size=hub.batch_size)
+    
+    def _on_frame(self, kind: int, body: bytes):
+        """处理远端发来的帧"""
+        if kind == FRAME_PUBLISH:
+            records = decode_batch(body)
+            self.connection.stats["messages_received"] += len(records)
+            _publish_inbound(self.hub.bus, self.hub._inbound, self, records)
+        elif kind == FRAME_SUBSCRIBE:
+            pattern = body.decode("utf-8")
+            entry = self.patterns.get(pattern)
+            if entry is None:
+                self.patterns[pattern] = [pattern, 1]
+                self.router.add(pattern, pattern)
+            else:
+                entry[1] += 1
+        elif kind == FRAME_UNSUBSCRIBE:
+            entry = self.patterns.get(body.decode("utf-8"))
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.patterns[entry[0]]
+                self.router.remove(entry[0], entry[0])
+
+
+def _publish_inbound(bus: MessageBus, inbound: _Inbound, origin, records: List[Tuple[str, Dict[str, Any]]]):
+    """把远端消息发布到本进程总线，并标记来源以免被转发回去"""
+    inbound.origin = origin
+    inbound.payload_ids = frozenset(id(payload) for _, payload in records)
+    try:
+        bus.publish_many(records)
+    finally:
+        inbound.origin = None
+        inbound.payload_ids = frozenset()
+
+
+class BusLink:
+    """把本进程的消息总线连接到其他进程中的 BusHub"""
+    
+    def __init__(self, bus: MessageBus, address: Address, batch_size: int = 256, timeout: float = 5.0):
+        """
+        连接到 BusHub
+        
+        Args:
+            bus: 本进程的消息总线
+            address: BusHub 的 Unix 域套接字路径或 (主机, 端口)
+            batch_size: 每帧最多合并的消息数
+            timeout: 建立连接的超时时间（秒）
+        """
+        self.bus = bus
+        self._inbound = _Inbound()
+        if isinstance(address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(address)
+        else:
+            sock = socket.create_connection(address, timeout=timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(None)
+        self.connection = _Connection(sock, self._on_frame, self._on_close, "bus-link", batch_size=batch_size)
+        
+        # 本进程发布的消息全部交给中心，由中心按订阅关系转发
+        self._forwarder = bus.subscribe("#", self._forward, dispatch="sync")
+        bus.add_subscription_listener(self._on_subscription)
+        for pattern, subscriptions in list(bus.subscriptions.items()):
+            for subscription in subscriptions:
+                if subscription is not self._forwarder:
+                    self.connection.send_control(FRAME_SUBSCRIBE, pattern)
+        self.connection.start()
+    
+    @property
+    def connected(self) -> bool:
+        """连接是否仍然可用"""
+        return not self.connection.closed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取传输统计
+        
+        Returns:
+            帧数与消息数
+        """
+        return dict(self.connection.stats)
+    
+    def close(self):
+        """发送完已排队的消息后断开"""
+        self.bus.remove_subscription_listener(self._on_subscription)
+        self.bus.unsubscribe(self._forwarder)
+        self.connection.close()
+    
+    def _forward(self, message: Message):
+        """转发本进程发布的消息（不回传从中心收到的消息）"""
+        if self._inbound.origin is self and id(message.payload) in self._inbound.payload_ids:
+            return
+        self.connection.send_message(message.topic, message.payload)
+    
+    def _on_subscription(self, pattern: str, added: bool):
+        """本进程订阅变更时通知中心"""
+        self.connection.send_control(FRAME_SUBSCRIBE if added else FRAME_UNSUBSCRIBE, pattern)
+    
+    def _on_frame(self, kind: int, body: bytes):
+        """处理中心发来的消息"""
+        if kind == FRAME_PUBLISH:
+            records = decode_batch(body)
+            self.connection.stats["messages_received"] += len(records)
+            _publish_inbound(self.bus, self._inbound, self, records)
+    
+    def _on_close(self):
+        """连接断开"""
+        logger.warning("消息总线与中心的连接已断开")
+
+
+# 本进程中按配置地址登记的 BusHub
+_hubs: Dict[Address, BusHub] = {}
+_hubs_lock = threading.Lock()
+
+
+def open_transport(bus: MessageBus, settings: Dict[str, Any]) -> Optional[Union[BusHub, BusLink]]:
+    """
+    根据配置为消息总线开启跨进程传输
+    
+    Args:
+        bus: 消息总线
+        settings: 消息总线配置，listen 为监听地址，connect 为中心地址；
+            地址为字符串时表示 Unix 域套接字路径，为 [主机, 端口] 时表示 TCP。
+            本进程已在 listen 地址监听时，改为连接到该中心
+    
+    Returns:
+        BusHub、BusLink，未配置时返回None
+    """
+    merged = dict(DEFAULT_MESSAGE_BUS_SETTINGS)
+    merged.update(settings)
+    batch_size = merged["transport_batch_size"]
+    if settings.get("listen"):
+        address = _to_address(settings["listen"])
+        with _hubs_lock:
+            hub = _hubs.get(address)
+            if hub is None or hub.closed:
+                hub = BusHub(bus, address, batch_size=batch_size)
+                # 端口为0时每次自动分配新端口，不会冲突
+                if isinstance(address, str) or address[1]:
+                    _hubs[address] = hub
+                return hub
+        # 本进程已在该地址监听（如创建了多个 AgentManager），连接到已有的中心而不是重新绑定
+        logger.info(f"本进程已在 {address} 监听消息总线，改为连接到已有的中心")
+        return BusLink(bus, hub.address, batch_size=batch_size)
+    if settings.get("connect"):
+        return BusLink(bus, _to_address(settings["connect"]), batch_size=batch_size)
+    return None
+
+
+def _to_address(value) -> Address:
+    """配置中的地址（YAML 列表）转换为套接字地址"""
+    return value if isinstance(value, str) else (value[0], int(value[1]))
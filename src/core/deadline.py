@@ -0,0 +1,151 @@
+"""截止时间与协作式取消
+
+任务级截止时间通过 contextvars 向下传递：调度器在工作线程中复制
+调用方的上下文，智能体在循环中（GUI步骤、检索数据源、LLM调用）
+检查当前截止时间，到期后尽快返回已有的部分结果。
+"""
+from typing import Optional, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+import weakref
+
+
+class DeadlineExceeded(TimeoutError):
+    """截止时间已到或已被取消"""
+
+
+class Deadline:
+    """截止时间，可派生更短的子截止时间，取消会传递给所有子截止时间"""
+    
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["Deadline"] = None,
+                 clock=time.monotonic):
+        """
+        初始化截止时间
+        
+        Args:
+            timeout: 从现在起的时间预算（秒），None表示不限时
+            parent: 父截止时间，子截止时间不会晚于父截止时间
+            clock: 单调时钟
+        """
+        self.parent = parent
+        self._clock = clock
+        self.expires_at = None if timeout is None else clock() + max(0.0, timeout)
+        if parent is not None and parent.expires_at is not None:
+            if self.expires_at is None or parent.expires_at < self.expires_at:
+                self.expires_at = parent.expires_at
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+        self._children: "weakref.WeakSet[Deadline]" = weakref.WeakSet()
+        if parent is not None:
+            parent._children.add(self)
+            if parent.cancelled:
+                self.cancel(parent.reason)
+    
+    def child(self, timeout: Optional[float] = None) -> "Deadline":
+        """
+        派生子截止时间
+        
+        Args:
+            timeout: 子截止时间的时间预算（秒），None表示与父截止时间相同
+        
+        Returns:
+            子截止时间
+        """
+        return Deadline(timeout, parent=self, clock=self._clock)
+    
+    def remaining(self) -> Optional[float]:
+        """剩余时间（秒），不限时返回None，已取消返回0"""
+        if self.cancelled:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - self._clock())
+    
+    @property
+    def cancelled(self) -> bool:
+        """是否已被取消"""
+        return self._cancelled.is_set()
+    
+    @property
+    def expired(self) -> bool:
+        """是否已到期（含被取消）"""
+        return self.remaining() == 0.0
+    
+    def cancel(self, reason: Optional[str] = None):
+        """
+        取消截止时间及其所有子截止时间
+        
+        Args:
+            reason: 取消原因
+        """
+        if self.cancelled:
+            return
+        self.reason = reason or "已取消"
+        self._cancelled.set()
+        for child in list(self._children):
+            child.cancel(self.reason)
+    
+    def check(self):
+        """已到期时抛出 DeadlineExceeded"""
+        if self.expired:
+            raise DeadlineExceeded(self.reason or "已超出截止时间")
+    
+    def clamp(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        把超时时间限制在剩余时间内
+        
+        Args:
+            timeout: 原超时时间（秒），None表示不限时
+        
+        Returns:
+            两者中较短的一个
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+    
+    def sleep(self, seconds: float):
+        """
+        等待指定时间，到期或被取消时提前结束并抛出 DeadlineExceeded
+        
+        Args:
+            seconds: 等待时间（秒）
+        """
+        self._cancelled.wait(self.clamp(seconds))
+        self.check()
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """当前上下文的截止时间，没有时返回None"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    在上下文中设置当前截止时间
+    
+    Args:
+        deadline: 截止时间，None表示不限时
+    
+    Yields:
+        截止时间
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def check_deadline():
+    """当前截止时间已到期时抛出 DeadlineExceeded"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check()
@@ -0,0 +1,192 @@
+"""意图关键词匹配
+
+由关键词表构建 Aho–Corasick 自动机，一次扫描文本即可标注所有
+类别并给出匹配位置，耗时与关键词数量无关。
+"""
+from typing import Dict, List, Optional, NamedTuple
+from collections import deque
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 默认关键词表：类别 -> 标签 -> 关键词列表，标签顺序即优先级
+DEFAULT_INTENT_TABLES = {
+    # 规划智能体：子任务类型
+    "task_type": {
+        "knowledge_query": ["搜索", "查找", "检索"],
+        "code_generation": ["代码", "生成", "编写"],
+        "gui_action": ["点击", "输入", "打开", "移动"],
+    },
+    # 规划智能体：任务关键词
+    "task_keyword": {
+        "打开": ["打开"],
+        "搜索": ["搜索"],
+        "保存": ["保存"],
+        "生成": ["生成"],
+        "点击": ["点击"],
+        "输入": ["输入"],
+    },
+    # 客服智能体：用户需求
+    "identity": {
+        "在校生": ["学生", "在校", "大学", "校园"],
+        "60岁以上": ["老人", "60", "退休", "年长"],
+    },
+    "budget": {
+        "低": ["便宜", "经济", "预算有限", "省钱"],
+        "高": ["高端", "无限", "不差钱"],
+    },
+    "data_need": {
+        "高": ["流量多", "流量大", "看视频", "玩游戏"],
+        "低": ["流量少", "基本不用"],
+    },
+    "call_need": {
+        "高": ["电话多", "通话多", "经常打电话"],
+        "低": ["很少打电话", "基本不打电话"],
+    },
+}
+
+
+class IntentMatch(NamedTuple):
+    """一次关键词命中"""
+    start: int
+    end: int
+    keyword: str
+    category: str
+    label: str
+
+
+class IntentMatcher:
+    """多模式意图匹配器（Aho–Corasick）"""
+    
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]]):
+        """
+        构建自动机
+        
+        Args:
+            tables: 关键词表，类别 -> 标签 -> 关键词列表（标签顺序即优先级）
+        """
+        self.tables = tables
+        self._priority: Dict[str, Dict[str, int]] = {
+            category: {label: i for i, label in enumerate(labels)}
+            for category, labels in tables.items()
+        }
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[tuple]] = [[]]
+        
+        for category, labels in tables.items():
+            for label, keywords in labels.items():
+                for keyword in keywords:
+                    if keyword:
+                        self._insert(keyword.lower(), (keyword.lower(), category, label))
+        self._build_failure_links()
+    
+    def find_all(self, text: str) -> List[IntentMatch]:
+        """
+        查找所有关键词命中（包括相互重叠的命中）
+        
+        Args:
+            text: 待匹配文本（不区分大小写）
+        
+        Returns:
+            按结束位置排列的命中列表
+        """
+        matches = []
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, ch in enumerate(text.lower()):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword, category, label in output[state]:
+                matches.append(IntentMatch(i + 1 - len(keyword), i + 1, keyword, category, label))
+        return matches
+    
+    def tag(self, text: str) -> Dict[str, List[str]]:
+        """
+        标注文本命中的所有类别
+        
+        Args:
+            text: 待匹配文本
+        
+        Returns:
+            类别 -> 命中的标签列表（按优先级排列）
+        """
+        found: Dict[str, set] = {}
+        for match in self.find_all(text):
+            found.setdefault(match.category, set()).add(match.label)
+        return {
+            category: sorted(labels, key=self._priority[category].get)
+            for category, labels in found.items()
+        }
+    
+    def classify(self, text: str, category: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        返回某个类别中优先级最高的命中标签
+        
+        Args:
+            text: 待匹配文本
+            category: 类别
+            default: 未命中时的返回值
+        
+        Returns:
+            标签
+        """
+        labels = self.tag(text).get(category)
+        return labels[0] if labels else default
+    
+    def _insert(self, keyword: str, entry: tuple):
+        """把关键词加入字典树"""
+        state = 0
+        for ch in keyword:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][ch] = next_state
+            state = next_state
+        self._output[state].append(entry)
+    
+    def _build_failure_links(self):
+        """按层次遍历建立失败指针，并合并后缀节点的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+
+_default_matcher: Optional[IntentMatcher] = None
+_default_lock = threading.Lock()
+
+
+def get_intent_matcher(overrides: Optional[Dict[str, Dict[str, List[str]]]] = None) -> IntentMatcher:
+    """
+    获取意图匹配器
+    
+    没有覆盖配置时返回进程内共享的默认匹配器；有覆盖配置时按类别
+    替换默认关键词表后构建新的匹配器。
+    
+    Args:
+        overrides: 需要替换的类别关键词表
+    
+    Returns:
+        意图匹配器
+    """
+    global _default_matcher
+    if overrides:
+        tables = dict(DEFAULT_INTENT_TABLES)
+        tables.update(overrides)
+        return IntentMatcher(tables)
+    with _default_lock:
+        if _default_matcher is None:
+            _default_matcher = IntentMatcher(DEFAULT_INTENT_TABLES)
+        return _default_matcher
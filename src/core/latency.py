@@ -0,0 +1,267 @@
+"""延迟直方图
+
+按对数间隔分桶记录耗时，内存占用固定，可合并，并能在常数
+时间内给出任意分位数的近似值（相对误差不超过桶宽）。
+直方图可转换为字典，便于汇总其他进程（工作进程）中的统计。
+"""
+from typing import Dict, Any, Optional, List, Sequence
+from contextlib import contextmanager
+import math
+import threading
+import time
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图"""
+    
+    def __init__(self, min_value: float = 1e-4, growth: float = 1.1):
+        """
+        初始化直方图
+        
+        Args:
+            min_value: 最小分辨率（秒），更小的值归入第一个桶
+            growth: 相邻桶边界的倍数，决定分位数的相对误差
+        """
+        self.min_value = min_value
+        self.growth = growth
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._log_growth = math.log(growth)
+        self._buckets: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, value: float):
+        """
+        记录一次耗时
+        
+        Args:
+            value: 耗时（秒）
+        """
+        index = self._index(value)
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        计算分位数
+        
+        Args:
+            q: 分位（0~1），如 0.99
+        
+        Returns:
+            分位数的近似值（所在桶的上边界，不超过观测最大值），无数据时返回None
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, math.ceil(q * self.count))
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= rank:
+                    return min(self._upper(index), self.max)
+            return self.max
+    
+    def merge(self, other: "LatencyHistogram"):
+        """
+        合并另一个直方图（分桶参数需相同）
+        
+        Args:
+            other: 另一个直方图
+        """
+        if (other.min_value, other.growth) != (self.min_value, self.growth):
+            raise ValueError("分桶参数不同的直方图不能合并")
+        with other._lock:
+            buckets = dict(other._buckets)
+            count, total, low, high = other.count, other.total, other.min, other.max
+        with self._lock:
+            for index, n in buckets.items():
+                self._buckets[index] = self._buckets.get(index, 0) + n
+            self.count += count
+            self.total += total
+            if low is not None:
+                self.min = low if self.min is None else min(self.min, low)
+                self.max = high if self.max is None else max(self.max, high)
+    
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """
+        一次遍历计算多个分位数（与 percentile 的结果一致）
+        
+        Args:
+            qs: 分位（0~1）列表，无需排序
+        
+        Returns:
+            与 qs 一一对应的分位数近似值，无数据时均为None
+        """
+        with self._lock:
+            if not self.count:
+                return [None] * len(qs)
+            buckets = sorted(self._buckets.items())
+            results: List[Optional[float]] = [self.max] * len(qs)
+            seen = 0
+            position = 0
+            for i in sorted(range(len(qs)), key=qs.__getitem__):
+                rank = max(1, math.ceil(qs[i] * self.count))
+                while seen < rank and position < len(buckets):
+                    seen += buckets[position][1]
+                    position += 1
+                if seen >= rank:
+                    results[i] = min(self._upper(buckets[position - 1][0]), self.max)
+            return results
+    
+    def cumulative_counts(self, bounds: Sequence[float]) -> List[int]:
+        """
+        统计不超过各边界的次数（用于导出固定边界的直方图）
+        
+        Args:
+            bounds: 升序排列的边界（秒）
+        
+        Returns:
+            与 bounds 一一对应的累计次数，桶跨越边界时按桶的上边界计入
+        """
+        with self._lock:
+            buckets = sorted(self._buckets.items())
+        counts = []
+        seen = 0
+        position = 0
+        for bound in bounds:
+            while position < len(buckets) and self._upper(buckets[position][0]) <= bound * (1 + 1e-9):
+                seen += buckets[position][1]
+                position += 1
+            counts.append(seen)
+        return counts
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可 JSON 序列化的字典"""
+        with self._lock:
+            return {
+                "min_value": self.min_value,
+                "growth": self.growth,
+                "count": self.count,
+                "total": self.total,
+                "min": self.min,
+                "max": self.max,
+                "buckets": {str(index): n for index, n in self._buckets.items()},
+            }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        """从 to_dict 的结果恢复直方图"""
+        histogram = cls(data["min_value"], data["growth"])
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram._buckets = {int(index): n for index, n in data["buckets"].items()}
+        return histogram
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        获取摘要
+        
+        Returns:
+            次数、均值、最小/最大值与 p50/p90/p99
+        """
+        with self._lock:
+            count, total, low, high = self.count, self.total, self.min, self.max
+        return {
+            "count": count,
+            "mean": total / count if count else 0.0,
+            "min": low or 0.0,
+            "max": high or 0.0,
+            "p50": self.percentile(0.5) or 0.0,
+            "p90": self.percentile(0.9) or 0.0,
+            "p99": self.percentile(0.99) or 0.0,
+        }
+    
+    def _index(self, value: float) -> int:
+        """计算值所在的桶"""
+        if value <= self.min_value:
+            return 0
+        return int(math.log(value / self.min_value) / self._log_growth) + 1
+    
+    def _upper(self, index: int) -> float:
+        """桶的上边界"""
+        return self.min_value * self.growth ** index
+
+
+class LatencyRecorder:
+    """按操作名称分别记录延迟直方图"""
+    
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, operation: str, seconds: float):
+        """
+        记录一次操作耗时
+        
+        Args:
+            operation: 操作名称，如 observe、think、act、retrieve、llm
+            seconds: 耗时（秒）
+        """
+        self.histogram(operation).record(seconds)
+    
+    @contextmanager
+    def measure(self, operation: str):
+        """
+        记录代码块耗时（出现异常时同样记录）
+        
+        Args:
+            operation: 操作名称
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(operation, time.perf_counter() - start)
+    
+    def histogram(self, operation: str) -> LatencyHistogram:
+        """获取（必要时创建）操作的直方图"""
+        histogram = self._histograms.get(operation)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(operation, LatencyHistogram())
+        return histogram
+    
+    def histograms(self) -> Dict[str, LatencyHistogram]:
+        """获取全部操作的直方图"""
+        with self._lock:
+            return dict(self._histograms)
+    
+    def merge(self, other: "LatencyRecorder"):
+        """
+        合并另一个记录器（如其他智能体或工作进程的统计）
+        
+        Args:
+            other: 另一个记录器
+        """
+        for operation, histogram in other.histograms().items():
+            self.histogram(operation).merge(histogram)
+    
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各操作的摘要
+        
+        Returns:
+            操作名称 -> 次数、均值与 p50/p90/p99
+        """
+        return {operation: histogram.summary() for operation, histogram in sorted(self.histograms().items())}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可 JSON 序列化的字典"""
+        return {operation: histogram.to_dict() for operation, histogram in self.histograms().items()}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyRecorder":
+        """从 to_dict 的结果恢复记录器"""
+        recorder = cls()
+        for operation, histogram in data.items():
+            recorder._histograms[operation] = LatencyHistogram.from_dict(histogram)
+        return recorder
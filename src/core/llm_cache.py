@@ -0,0 +1,180 @@
+"""LLM响应缓存
+
+以 (模型, 温度, 消息) 的哈希为键，将响应持久化到SQLite，
+按总大小做LRU淘汰，并统计命中率与节省的延迟。
+"""
+from typing import Dict, Any, List, Optional
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存配置
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": False,
+    "path": ":memory:",
+    "max_bytes": 64 * 1024 * 1024,
+    "cache_nonzero_temperature": True,
+}
+
+
+class LLMResponseCache:
+    """SQLite支持的LLM响应缓存"""
+    
+    def __init__(self, path: str = ":memory:", max_bytes: int = 64 * 1024 * 1024,
+                 cache_nonzero_temperature: bool = True):
+        """
+        初始化响应缓存
+        
+        Args:
+            path: SQLite数据库路径，":memory:" 表示仅内存
+            max_bytes: 缓存内容总大小上限，超过后淘汰最久未访问的条目
+            cache_nonzero_temperature: 是否缓存温度大于0的请求
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.cache_nonzero_temperature = cache_nonzero_temperature
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, model TEXT, content TEXT, usage TEXT, "
+            "latency REAL, size INTEGER, created REAL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_lru ON llm_cache (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_latency": 0.0,
+        }
+    
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "LLMResponseCache":
+        """根据配置创建缓存"""
+        merged = dict(DEFAULT_CACHE_SETTINGS)
+        merged.update(settings)
+        return cls(merged["path"], merged["max_bytes"], merged["cache_nonzero_temperature"])
+    
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: List[Dict[str, str]]) -> str:
+        """
+        计算缓存键
+        
+        Args:
+            model: 模型名称
+            temperature: 温度
+            messages: 消息列表
+        
+        Returns:
+            SHA-256十六进制摘要
+        """
+        raw = json.dumps([model, temperature, messages], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def cacheable(self, temperature: float) -> bool:
+        """该温度的请求是否允许缓存"""
+        return temperature <= 0 or self.cache_nonzero_temperature
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            包含 content、usage、latency 的字典，未命中返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, usage, latency FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            self.stats["saved_latency"] += row[2]
+        return {"content": row[0], "usage": json.loads(row[1]), "latency": row[2]}
+    
+    def put(self, key: str, model: str, content: str, usage: Dict[str, int], latency: float):
+        """
+        写入缓存并按大小淘汰
+        
+        Args:
+            key: 缓存键
+            model: 模型名称
+            content: 响应内容
+            usage: Token用量
+            latency: 原始调用延迟（秒）
+        """
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, content, json.dumps(usage), latency, size, now, now)
+            )
+            self._size += size - (old[0] if old else 0)
+            self.stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._size = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+        
+        Returns:
+            命中、未命中、命中率、节省延迟、条目数与大小
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["entries"] = entries
+        stats["size_bytes"] = self._size
+        return stats
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+    
+    def _evict(self):
+        """淘汰最久未访问的条目直到总大小不超过上限（需持有锁）"""
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY last_access LIMIT 16"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._size -= size
+                self.stats["evictions"] += 1
+                if self._size <= self.max_bytes:
+                    break
@@ -0,0 +1,1099 @@
+"""LLM网关
+
+所有智能体共用的LLM调用入口：每个模型一个带连接池的客户端，
+全局的请求/Token速率限制（令牌桶）与并发上限。
+"""
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Union
+from collections import deque
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import asyncio
+import http.client
+import importlib.util
+import json
+import logging
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .deadline import DeadlineExceeded, check_deadline, current_deadline
+from .latency import LatencyHistogram
+from .llm_cache import LLMResponseCache
+from .singleflight import SingleFlight
+from ..recording.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+# 默认网关配置，None 表示不限制
+DEFAULT_GATEWAY_SETTINGS = {
+    "backend": "langchain",  # langchain | http
+    "requests_per_minute": None,
+    "tokens_per_minute": None,
+    "burst_seconds": 1.0,
+    "max_concurrency": 16,
+    "max_connections": 16,
+    "timeout": 60.0,
+    "max_retries": 2,
+    "completion_token_estimate": 256,
+    "models": {},
+    "cache": {},  # 响应缓存配置，见 llm_cache.DEFAULT_CACHE_SETTINGS
+    "coalesce": True,  # 合并并发的相同请求
+    "hedging": {},  # 对冲请求配置，见 DEFAULT_HEDGING_SETTINGS
+}
+
+# 默认对冲配置：调用超过该模型延迟的 percentile 分位仍未返回时发出重复请求
+DEFAULT_HEDGING_SETTINGS = {
+    "enabled": False,
+    "percentile": 0.95,
+    "min_samples": 20,  # 延迟样本不足时不对冲
+    "min_delay": 0.0,  # 对冲等待时间下限（秒）
+    "max_rate": 0.05,  # 对冲请求占调用数的比例上限
+    "max_workers": 32,  # 同步调用对冲所用线程池大小
+}
+
+Messages = Union[str, List[Dict[str, str]]]
+
+
+@dataclass
+class LLMResponse:
+    """LLM响应"""
+    content: str
+    model: str
+    usage: Dict[str, int] = field(default_factory=dict)
+    latency: float = 0.0
+    cached: bool = False
+    coalesced: bool = False
+
+
+class RateLimitError(Exception):
+    """服务端返回429"""
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    令牌桶
+    
+    采用预约方式：取令牌时立即扣减（余额可为负），调用方按返回的
+    等待时间休眠。这样请求按到达顺序排队，长期速率恰好等于配额。
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None, clock=time.monotonic):
+        """
+        初始化令牌桶
+        
+        Args:
+            rate_per_minute: 每分钟补充的令牌数
+            capacity: 桶容量（允许的突发量），默认一秒的补充量
+            clock: 时钟函数（便于测试）
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        预约令牌
+        
+        Args:
+            amount: 令牌数量
+        
+        Returns:
+            需要等待的秒数
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def adjust(self, amount: float):
+        """
+        调整余额（实际消耗与预估不同时对账，正数表示多消耗）
+        
+        Args:
+            amount: 需要额外扣减的令牌数，负数表示退还
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+    
+    def acquire(self, amount: float = 1.0) -> float:
+        """阻塞直到获得令牌，返回等待时间"""
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    async def aacquire(self, amount: float = 1.0) -> float:
+        """异步等待直到获得令牌，返回等待时间"""
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+    
+    def _refill(self):
+        """按时间补充令牌（需持有锁）"""
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class ConcurrencyLimiter:
+    """同时支持线程与协程的并发上限（按到达顺序授予）"""
+    
+    def __init__(self, limit: Optional[int]):
+        """
+        初始化并发限制器
+        
+        Args:
+            limit: 并发上限，None表示不限制
+        """
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters: deque = deque()
+    
+    def acquire(self):
+        """阻塞获取一个并发名额"""
+        with self._lock:
+            if self._try_acquire():
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+    
+    def try_acquire(self) -> bool:
+        """
+        不等待地获取一个并发名额
+        
+        Returns:
+            是否获取成功
+        """
+        with self._lock:
+            return self._try_acquire()
+    
+    async def aacquire(self):
+        """异步获取一个并发名额"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        await future
+    
+    def release(self):
+        """释放并发名额，优先交给等待者"""
+        with self._lock:
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._grant, future)
+    
+    def _try_acquire(self) -> bool:
+        """尝试直接获取名额（需持有锁）"""
+        if self.limit is None or (self.in_flight < self.limit and not self._waiters):
+            self.in_flight += 1
+            return True
+        return False
+    
+    def _grant(self, future: asyncio.Future):
+        """在事件循环中把名额交给协程，已取消则继续转交"""
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(True)
+
+
+class LangChainBackend:
+    """基于 langchain_openai.ChatOpenAI 的后端，同一模型共享HTTP连接池"""
+    
+    def __init__(self, model: str, api_key: Optional[str], base_url: Optional[str],
+                 settings: Dict[str, Any]):
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.settings = settings
+        self._chats: Dict[float, Any] = {}
+        self._http_client = None
+        self._http_async_client = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def available() -> bool:
+        """依赖是否已安装（不导入模块）"""
+        return importlib.util.find_spec("langchain_openai") is not None
+    
+    def _get_chat(self, temperature: float):
+        """获取指定温度的ChatOpenAI实例（共享连接池）"""
+        with self._lock:
+            chat = self._chats.get(temperature)
+            if chat is None:
+                import httpx
+                from langchain_openai import ChatOpenAI
+                
+                if self._http_client is None:
+                    limits = httpx.Limits(max_connections=self.settings["max_connections"],
+                                          max_keepalive_connections=self.settings["max_connections"])
+                    self._http_client = httpx.Client(limits=limits, timeout=self.settings["timeout"])
+                    self._http_async_client = httpx.AsyncClient(limits=limits, timeout=self.settings["timeout"])
+                chat = ChatOpenAI(
+                    model=self.model,
+                    temperature=temperature,
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    max_retries=0,
+                    http_client=self._http_client,
+                    http_async_client=self._http_async_client,
+                )
+                self._chats[temperature] = chat
+            return chat
+    
+    def invoke(self, messages: List[Dict[str, str]], temperature: float) -> Tuple[str, Dict[str, int]]:
+        try:
+            response = self._get_chat(temperature).invoke(self._to_langchain(messages))
+        except Exception as e:
+            raise self._translate_error(e)
+        return response.content, self._usage(response)
+    
+    async def ainvoke(self, messages: List[Dict[str, str]], temperature: float) -> Tuple[str, Dict[str, int]]:
+        try:
+            response = await self._get_chat(temperature).ainvoke(self._to_langchain(messages))
+        except Exception as e:
+            raise self._translate_error(e)
+        return response.content, self._usage(response)
+    
+    def stream(self, messages: List[Dict[str, str]], temperature: float) -> Iterator[str]:
+        try:
+            for chunk in self._get_chat(temperature).stream(self._to_langchain(messages)):
+                if chunk.content:
+                    yield chunk.content
+        except Exception as e:
+            raise self._translate_error(e)
+    
+    def close(self):
+        if self._http_client is not None:
+            self._http_client.close()
+    
+    @staticmethod
+    def _to_langchain(messages: List[Dict[str, str]]) -> List[Tuple[str, str]]:
+        return [(message["role"], message["content"]) for message in messages]
+    
+    @staticmethod
+    def _usage(response) -> Dict[str, int]:
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage:
+            return {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            }
+        metadata = getattr(response, "response_metadata", None) or {}
+        return dict(metadata.get("token_usage") or {})
+    
+    @staticmethod
+    def _translate_error(error: Exception) -> Exception:
+        if getattr(error, "status_code", None) == 429 or "RateLimit" in type(error).__name__:
+            return RateLimitError(str(error))
+        return error
+
+
+class HTTPBackend:
+    """
+    标准库实现的 OpenAI 兼容 Chat Completions 后端
+    
+    维护一个长连接池，不依赖第三方库，便于对接本地桩服务测试。
+    """
+    
+    def __init__(self, model: str, api_key: Optional[str], base_url: Optional[str],
+                 settings: Dict[str, Any]):
+        parts = urlsplit(base_url or "https://api.openai.com/v1")
+        self.model = model
+        self.api_key = api_key
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip("/") + "/chat/completions"
+        self.timeout = settings["timeout"]
+        self.max_connections = settings["max_connections"]
+        self.connections_created = 0
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+    
+    @staticmethod
+    def available() -> bool:
+        return True
+    
+    def invoke(self, messages: List[Dict[str, str]], temperature: float) -> Tuple[str, Dict[str, int]]:
+        body = self._request(messages, temperature, stream=False)
+        data = json.loads(body)
+        content = data["choices"][0]["message"].get("content") or ""
+        return content, data.get("usage") or {}
+    
+    async def ainvoke(self, messages: List[Dict[str, str]], temperature: float) -> Tuple[str, Dict[str, int]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.invoke, messages, temperature)
+    
+    def stream(self, messages: List[Dict[str, str]], temperature: float) -> Iterator[str]:
+        connection, response = self._open(messages, temperature, stream=True)
+        reusable = False
+        try:
+            for raw_line in response:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                delta = json.loads(payload)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+            response.read()
+            reusable = True
+        finally:
+            self._release(connection, reusable)
+    
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def _request(self, messages: List[Dict[str, str]], temperature: float, stream: bool) -> bytes:
+        connection, response = self._open(messages, temperature, stream)
+        reusable = False
+        try:
+            body = response.read()
+            reusable = True
+            return body
+        finally:
+            self._release(connection, reusable)
+    
+    def _open(self, messages: List[Dict[str, str]], temperature: float, stream: bool):
+        """发送请求，返回 (连接, 响应)；失败时释放连接"""
+        payload = json.dumps({
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": stream,
+        }).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        
+        connection = self._acquire()
+        try:
+            try:
+                connection.request("POST", self.path, body=payload, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # 空闲连接已被服务端关闭，重建后重试一次
+                connection.close()
+                connection.request("POST", self.path, body=payload, headers=headers)
+                response = connection.getresponse()
+            
+            if response.status == 429:
+                retry_after = response.getheader("Retry-After")
+                response.read()
+                raise RateLimitError("HTTP 429", float(retry_after) if retry_after else None)
+            if response.status >= 400:
+                detail = response.read().decode("utf-8", "replace")
+                raise RuntimeError(f"HTTP {response.status}: {detail[:200]}")
+            return connection, response
+        except RateLimitError:
+            self._release(connection, True)
+            raise
+        except Exception:
+            self._release(connection, False)
+            raise
+    
+    def _acquire(self) -> http.client.HTTPConnection:
+        """从连接池获取连接，池满时等待"""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            self.connections_created += 1
+            connection_class = (http.client.HTTPSConnection if self.scheme == "https"
+                                else http.client.HTTPConnection)
+            return connection_class(self.host, self.port, timeout=self.timeout)
+    
+    def _release(self, connection: http.client.HTTPConnection, reusable: bool):
+        """归还连接，不可复用的连接直接关闭"""
+        if reusable:
+            self._idle.put(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+
+BACKENDS = {
+    "langchain": LangChainBackend,
+    "http": HTTPBackend,
+}
+
+
+class _ModelLimits:
+    """单个模型的速率限制"""
+    
+    def __init__(self, settings: Dict[str, Any]):
+        burst = settings["burst_seconds"]
+        rpm = settings.get("requests_per_minute")
+        tpm = settings.get("tokens_per_minute")
+        self.requests = TokenBucket(rpm, capacity=max(1.0, rpm / 60.0 * burst)) if rpm else None
+        self.tokens = TokenBucket(tpm, capacity=max(1.0, tpm / 60.0 * burst)) if tpm else None
+
+
+class LLMClient:
+    """绑定模型与温度的客户端，接口与 ChatOpenAI 的 invoke/ainvoke/stream 对应"""
+    
+    def __init__(self, gateway: "LLMGateway", model: str, temperature: float,
+                 api_key: Optional[str], base_url: Optional[str]):
+        self.gateway = gateway
+        self.model = model
+        self.temperature = temperature
+        self.api_key = api_key
+        self.base_url = base_url
+    
+    def invoke(self, messages: Messages) -> LLMResponse:
+        """同步调用"""
+        return self.gateway.invoke(self.model, messages, self.temperature,
+                                   api_key=self.api_key, base_url=self.base_url)
+    
+    async def ainvoke(self, messages: Messages) -> LLMResponse:
+        """异步调用"""
+        return await self.gateway.ainvoke(self.model, messages, self.temperature,
+                                          api_key=self.api_key, base_url=self.base_url)
+    
+    def stream(self, messages: Messages) -> Iterator[str]:
+        """流式调用，逐段返回文本"""
+        return self.gateway.stream(self.model, messages, self.temperature,
+                                   api_key=self.api_key, base_url=self.base_url)
+    
+    def __repr__(self) -> str:
+        return f"LLMClient(model={self.model}, temperature={self.temperature})"
+
+
+class LLMGateway:
+    """LLM网关"""
+    
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """
+        初始化LLM网关
+        
+        Args:
+            settings: 网关配置，见 DEFAULT_GATEWAY_SETTINGS
+        """
+        self.settings = dict(DEFAULT_GATEWAY_SETTINGS)
+        self.settings.update(settings or {})
+        self.concurrency = ConcurrencyLimiter(self.settings["max_concurrency"])
+        self.cache: Optional[LLMResponseCache] = None
+        if self.settings["cache"].get("enabled"):
+            self.cache = LLMResponseCache.from_settings(self.settings["cache"])
+        self.singleflight = SingleFlight()
+        self.hedging = dict(DEFAULT_HEDGING_SETTINGS)
+        self.hedging.update(self.settings["hedging"])
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_counts: Dict[str, List[int]] = {}
+        self._latency: Dict[str, LatencyHistogram] = {}
+        self._backends: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+        self._limits: Dict[str, _ModelLimits] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def client(self, model: str, temperature: float = 0.1, api_key: Optional[str] = None,
+               base_url: Optional[str] = None) -> Optional[LLMClient]:
+        """
+        获取模型客户端
+        
+        Args:
+            model: 模型名称
+            temperature: 温度
+            api_key: API密钥
+            base_url: 服务地址（OpenAI兼容）
+        
+        Returns:
+            客户端；后端依赖未安装时返回None
+        """
+        if not BACKENDS[self.settings["backend"]].available():
+            logger.warning(f"LLM后端 {self.settings['backend']} 不可用")
+            return None
+        return LLMClient(self, model, temperature, api_key, base_url)
+    
+    def invoke(self, model: str, messages: Messages, temperature: float = 0.1,
+               api_key: Optional[str] = None, base_url: Optional[str] = None) -> LLMResponse:
+        """
+        同步调用模型（受速率与并发限制，并发的相同请求合并为一次调用）
+        
+        Args:
+            model: 模型名称
+            messages: Prompt字符串或消息列表
+            temperature: 温度
+            api_key: API密钥
+            base_url: 服务地址
+        
+        Returns:
+            LLM响应
+        """
+        messages = self._normalize(messages)
+        cache_key = self._cache_key(model, messages, temperature)
+        cached = self._cache_lookup(model, cache_key)
+        if cached is not None:
+            return cached
+        
+        backend = self._get_backend(model, api_key, base_url)
+        
+        def call() -> LLMResponse:
+            response = self._call(backend, model, messages, temperature)
+            self._cache_store(cache_key, response)
+            return response
+        
+        if not self.settings["coalesce"]:
+            return call()
+        flight_key = self._flight_key(model, messages, temperature, api_key, base_url, cache_key)
+        try:
+            response, shared = self.singleflight.do(flight_key, call)
+        except DeadlineExceeded:
+            # 本调用方的截止时间先到时直接抛出；合并到的调用因其发起方的截止时间放弃时，
+            # 本调用方仍有时间则自行调用
+            check_deadline()
+            return call()
+        return replace(response, coalesced=True) if shared else response
+    
+    async def ainvoke(self, model: str, messages: Messages, temperature: float = 0.1,
+                      api_key: Optional[str] = None, base_url: Optional[str] = None) -> LLMResponse:
+        """
+        异步调用模型（受速率与并发限制，并发的相同请求合并为一次调用）
+        
+        Args:
+            model: 模型名称
+            messages: Prompt字符串或消息列表
+            temperature: 温度
+            api_key: API密钥
+            base_url: 服务地址
+        
+        Returns:
+            LLM响应
+        """
+        messages = self._normalize(messages)
+        cache_key = self._cache_key(model, messages, temperature)
+        cached = self._cache_lookup(model, cache_key)
+        if cached is not None:
+            return cached
+        
+        backend = self._get_backend(model, api_key, base_url)
+        
+        async def call() -> LLMResponse:
+            response = await self._acall(backend, model, messages, temperature)
+            self._cache_store(cache_key, response)
+            return response
+        
+        if not self.settings["coalesce"]:
+            return await call()
+        flight_key = self._flight_key(model, messages, temperature, api_key, base_url, cache_key)
+        try:
+            response, shared = await self.singleflight.ado(flight_key, call)
+        except DeadlineExceeded:
+            check_deadline()
+            return await call()
+        return replace(response, coalesced=True) if shared else response
+    
+    def stream(self, model: str, messages: Messages, temperature: float = 0.1,
+               api_key: Optional[str] = None, base_url: Optional[str] = None) -> Iterator[str]:
+        """
+        流式调用模型，并发名额在流结束前一直占用
+        
+        Args:
+            model: 模型名称
+            messages: Prompt字符串或消息列表
+            temperature: 温度
+            api_key: API密钥
+            base_url: 服务地址
+        
+        Yields:
+            文本片段
+        """
+        messages = self._normalize(messages)
+        cache_key = self._cache_key(model, messages, temperature)
+        cached = self._cache_lookup(model, cache_key)
+        if cached is not None:
+            yield cached.content
+            return
+        
+        backend = self._get_backend(model, api_key, base_url)
+        estimate = self._estimate_tokens(messages)
+        
+        deadline = current_deadline()
+        self._wait_for_quota(model, estimate)
+        self.concurrency.acquire()
+        start_time = time.perf_counter()
+        chunks = []
+        try:
+            for chunk in backend.stream(messages, temperature):
+                if deadline is not None and deadline.expired:
+                    raise self._deadline_exceeded(model)
+                chunks.append(chunk)
+                yield chunk
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            self._record(model, "errors")
+            raise
+        finally:
+            self.concurrency.release()
+        response = self._finish(model, "".join(chunks), {}, estimate, time.perf_counter() - start_time)
+        self._cache_store(cache_key, response)
+    
+    def _call(self, backend, model: str, messages: List[Dict[str, str]],
+              temperature: float) -> LLMResponse:
+        """在配额与并发限制内调用后端，被限流时退避重试；受当前截止时间约束"""
+        estimate = self._estimate_tokens(messages)
+        deadline = current_deadline()
+        
+        for attempt in range(self.settings["max_retries"] + 1):
+            self._wait_for_quota(model, estimate)
+            if deadline is not None and deadline.expired:
+                raise self._deadline_exceeded(model)
+            # 名额交给 _invoke_backend，在后端调用真正结束时释放
+            self.concurrency.acquire()
+            start_time = time.perf_counter()
+            backoff = None
+            try:
+                with get_tracer().span("llm.backend", model=model, attempt=attempt):
+                    content, usage = self._invoke_backend(backend, model, messages, temperature, estimate)
+            except RateLimitError as e:
+                backoff = self._on_rate_limited(model, e, attempt)
+            except DeadlineExceeded:
+                raise
+            except Exception:
+                self._record(model, "errors")
+                raise
+            if backoff is None:
+                return self._finish(model, content, usage, estimate, time.perf_counter() - start_time)
+            if deadline is not None and deadline.clamp(backoff) < backoff:
+                raise self._deadline_exceeded(model)
+            time.sleep(backoff)
+        
+        raise RateLimitError(f"模型 {model} 请求持续被限流")
+    
+    async def _acall(self, backend, model: str, messages: List[Dict[str, str]],
+                     temperature: float) -> LLMResponse:
+        """_call 的异步版本"""
+        estimate = self._estimate_tokens(messages)
+        deadline = current_deadline()
+        
+        for attempt in range(self.settings["max_retries"] + 1):
+            await self._await_quota(model, estimate)
+            if deadline is not None and deadline.expired:
+                raise self._deadline_exceeded(model)
+            await self.concurrency.aacquire()
+            start_time = time.perf_counter()
+            backoff = None
+            try:
+                with get_tracer().span("llm.backend", model=model, attempt=attempt):
+                    content, usage = await self._ainvoke_backend(backend, model, messages, temperature, estimate)
+            except RateLimitError as e:
+                backoff = self._on_rate_limited(model, e, attempt)
+            except DeadlineExceeded:
+                raise
+            except Exception:
+                self._record(model, "errors")
+                raise
+            if backoff is None:
+                return self._finish(model, content, usage, estimate, time.perf_counter() - start_time)
+            if deadline is not None and deadline.clamp(backoff) < backoff:
+                raise self._deadline_exceeded(model)
+            await asyncio.sleep(backoff)
+        
+        raise RateLimitError(f"模型 {model} 请求持续被限流")
+    
+    def _invoke_backend(self, backend, model: str, messages: List[Dict[str, str]],
+                        temperature: float, estimate: int) -> Tuple[str, Dict[str, int]]:
+        """
+        调用后端；超过对冲阈值仍未返回时发出重复请求，取先返回者
+        
+        调用方已占用一个并发名额，由本方法在后端调用结束时释放；对冲请求
+        需另外取得空闲名额，没有空闲名额时不对冲。有截止时间时在线程池中
+        调用，到期后不再等待，后台调用结束后才释放名额与线程，因此进行中的
+        后端请求数不会超过并发上限。
+        """
+        delay = self._hedge_delay(model)
+        timeout = self._deadline_timeout()
+        if delay is None and timeout is None:
+            try:
+                return self._timed_invoke(backend, model, messages, temperature)
+            finally:
+                self.concurrency.release()
+        
+        pool = self._get_hedge_pool()
+        primary = self._submit_holding_slot(pool, backend, model, messages, temperature)
+        hedge = None
+        pending = {primary}
+        if delay is not None and (timeout is None or delay < timeout):
+            done, _ = wait(pending, timeout=delay)
+            if not done and self._acquire_hedge_slot(model, estimate):
+                hedge = self._submit_holding_slot(pool, backend, model, messages, temperature)
+                pending.add(hedge)
+        
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=self._deadline_timeout(), return_when=FIRST_COMPLETED)
+            if not done:
+                raise self._deadline_exceeded(model)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                if future is hedge:
+                    self._record(model, "hedge_wins")
+                return future.result()
+        raise error
+    
+    async def _ainvoke_backend(self, backend, model: str, messages: List[Dict[str, str]],
+                               temperature: float, estimate: int) -> Tuple[str, Dict[str, int]]:
+        """_invoke_backend 的异步版本，落败或超出截止时间的请求会被取消，取消完成后释放名额"""
+        delay = self._hedge_delay(model)
+        timeout = self._deadline_timeout()
+        if delay is None and timeout is None:
+            try:
+                return await self._atimed_invoke(backend, model, messages, temperature)
+            finally:
+                self.concurrency.release()
+        
+        primary = asyncio.ensure_future(self._atimed_invoke(backend, model, messages, temperature))
+        primary.add_done_callback(self._release_slot)
+        hedge = None
+        pending = {primary}
+        try:
+            if delay is not None and (timeout is None or delay < timeout):
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self._acquire_hedge_slot(model, estimate):
+                    hedge = asyncio.ensure_future(self._atimed_invoke(backend, model, messages, temperature))
+                    hedge.add_done_callback(self._release_slot)
+                    pending.add(hedge)
+            
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=self._deadline_timeout(),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise self._deadline_exceeded(model)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if task is hedge:
+                        self._record(model, "hedge_wins")
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _submit_holding_slot(self, pool: ThreadPoolExecutor, backend, model: str,
+                             messages: List[Dict[str, str]], temperature: float):
+        """在线程池中调用后端，已占用的并发名额在调用结束时释放"""
+        try:
+            future = pool.submit(self._timed_invoke, backend, model, messages, temperature)
+        except BaseException:
+            self.concurrency.release()
+            raise
+        future.add_done_callback(self._release_slot)
+        return future
+    
+    def _release_slot(self, _future):
+        """后端调用结束（含落败、取消）后释放并发名额"""
+        self.concurrency.release()
+    
+    def _acquire_hedge_slot(self, model: str, estimate: int) -> bool:
+        """为对冲请求取得空闲的并发名额与对冲额度，任一不足时不对冲"""
+        if not self.concurrency.try_acquire():
+            self._record(model, "hedge_skipped")
+            return False
+        if not self._allow_hedge(model, estimate):
+            self.concurrency.release()
+            return False
+        return True
+    
+    @staticmethod
+    def _deadline_timeout() -> Optional[float]:
+        """当前截止时间的剩余时间，不限时返回None"""
+        deadline = current_deadline()
+        return deadline.remaining() if deadline is not None else None
+    
+    def _deadline_exceeded(self, model: str) -> DeadlineExceeded:
+        """记录一次截止时间到期并返回对应异常"""
+        self._record(model, "deadline_exceeded")
+        return DeadlineExceeded(f"模型 {model} 调用超出截止时间")
+    
+    def _timed_invoke(self, backend, model: str, messages: List[Dict[str, str]],
+                      temperature: float) -> Tuple[str, Dict[str, int]]:
+        """调用后端并记录延迟样本"""
+        start_time = time.perf_counter()
+        result = backend.invoke(messages, temperature)
+        self._get_histogram(model).record(time.perf_counter() - start_time)
+        return result
+    
+    async def _atimed_invoke(self, backend, model: str, messages: List[Dict[str, str]],
+                             temperature: float) -> Tuple[str, Dict[str, int]]:
+        """异步调用后端并记录延迟样本"""
+        start_time = time.perf_counter()
+        result = await backend.ainvoke(messages, temperature)
+        self._get_histogram(model).record(time.perf_counter() - start_time)
+        return result
+    
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """计算对冲等待时间，不对冲时返回None"""
+        if not self.hedging["enabled"]:
+            return None
+        with self._lock:
+            counts = self._hedge_counts.setdefault(model, [0, 0])
+            counts[0] += 1
+        histogram = self._get_histogram(model)
+        if histogram.count < self.hedging["min_samples"]:
+            return None
+        return max(self.hedging["min_delay"], histogram.percentile(self.hedging["percentile"]))
+    
+    def _allow_hedge(self, model: str, estimate: int) -> bool:
+        """对冲比例未超上限时占用一次对冲额度，并从配额中扣除"""
+        with self._lock:
+            counts = self._hedge_counts[model]
+            if counts[1] + 1 > self.hedging["max_rate"] * counts[0]:
+                return False
+            counts[1] += 1
+        self._record(model, "hedged")
+        limits = self._get_limits(model)
+        if limits.requests:
+            limits.requests.adjust(1)
+        if limits.tokens:
+            limits.tokens.adjust(estimate)
+        return True
+    
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        """获取同步对冲使用的线程池"""
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.hedging["max_workers"],
+                                                      thread_name_prefix="llm-hedge")
+            return self._hedge_pool
+    
+    def _get_histogram(self, model: str) -> LatencyHistogram:
+        """获取模型的延迟直方图"""
+        with self._lock:
+            histogram = self._latency.get(model)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self._latency[model] = histogram
+            return histogram
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取网关统计
+        
+        Returns:
+            各模型的请求数、错误数、限流次数、对冲次数、Token用量与延迟分布，以及请求合并统计
+        """
+        with self._lock:
+            models = {}
+            for model, stats in self._stats.items():
+                model_stats = dict(stats)
+                requests = model_stats.get("requests", 0)
+                model_stats["average_latency"] = (model_stats.get("total_latency", 0.0) / requests
+                                                  if requests else 0.0)
+                models[model] = model_stats
+            histograms = dict(self._latency)
+        for model, histogram in histograms.items():
+            models.setdefault(model, {})["latency"] = histogram.summary()
+        stats = {"in_flight": self.concurrency.in_flight, "models": models,
+                 "coalescing": self.singleflight.get_stats()}
+        if self.cache is not None:
+            stats["cache"] = self.cache.get_stats()
+        return stats
+    
+    def close(self):
+        """关闭所有后端连接与缓存"""
+        with self._lock:
+            backends, self._backends = list(self._backends.values()), {}
+            pool, self._hedge_pool = self._hedge_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+        for backend in backends:
+            backend.close()
+        if self.cache is not None:
+            self.cache.close()
+    
+    def _cache_key(self, model: str, messages: List[Dict[str, str]],
+                   temperature: float) -> Optional[str]:
+        """计算缓存键，不可缓存时返回None"""
+        if self.cache is None or not self.cache.cacheable(temperature):
+            return None
+        return self.cache.make_key(model, temperature, messages)
+    
+    def _flight_key(self, model: str, messages: List[Dict[str, str]], temperature: float,
+                    api_key: Optional[str], base_url: Optional[str],
+                    cache_key: Optional[str]) -> Tuple[str, Optional[str], Optional[str]]:
+        """计算请求合并键：相同Prompt且发往同一服务与账号的请求才合并"""
+        digest = cache_key or LLMResponseCache.make_key(model, temperature, messages)
+        return (digest, base_url, api_key)
+    
+    def _cache_lookup(self, model: str, cache_key: Optional[str]) -> Optional[LLMResponse]:
+        """查询响应缓存"""
+        if cache_key is None:
+            return None
+        start_time = time.perf_counter()
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            return None
+        return LLMResponse(content=entry["content"], model=model, usage=entry["usage"],
+                           latency=time.perf_counter() - start_time, cached=True)
+    
+    def _cache_store(self, cache_key: Optional[str], response: LLMResponse):
+        """写入响应缓存"""
+        if cache_key is not None:
+            self.cache.put(cache_key, response.model, response.content, response.usage, response.latency)
+    
+    def _get_backend(self, model: str, api_key: Optional[str], base_url: Optional[str]):
+        """获取模型的后端（同一模型与地址共享一个连接池）"""
+        key = (model, api_key, base_url)
+        with self._lock:
+            backend = self._backends.get(key)
+            if backend is None:
+                backend_class = BACKENDS[self.settings["backend"]]
+                backend = backend_class(model, api_key, base_url, self.settings)
+                self._backends[key] = backend
+            return backend
+    
+    def _get_limits(self, model: str) -> _ModelLimits:
+        """获取模型的速率限制，模型级配置覆盖全局配置"""
+        with self._lock:
+            limits = self._limits.get(model)
+            if limits is None:
+                settings = dict(self.settings)
+                settings.update(self.settings["models"].get(model, {}))
+                limits = _ModelLimits(settings)
+                self._limits[model] = limits
+            return limits
+    
+    def _wait_for_quota(self, model: str, estimate: int):
+        """阻塞等待请求与Token配额"""
+        limits = self._get_limits(model)
+        waited = 0.0
+        if limits.requests:
+            waited += limits.requests.acquire(1)
+        if limits.tokens:
+            waited += limits.tokens.acquire(estimate)
+        if waited:
+            self._record(model, "throttled_seconds", waited)
+    
+    async def _await_quota(self, model: str, estimate: int):
+        """异步等待请求与Token配额"""
+        limits = self._get_limits(model)
+        waited = 0.0
+        if limits.requests:
+            waited += await limits.requests.aacquire(1)
+        if limits.tokens:
+            waited += await limits.tokens.aacquire(estimate)
+        if waited:
+            self._record(model, "throttled_seconds", waited)
+    
+    def _on_rate_limited(self, model: str, error: RateLimitError, attempt: int) -> float:
+        """
+        服务端限流：冻结该模型的请求配额一段时间后重试
+        
+        Returns:
+            调用方在重试前需要额外等待的秒数
+        """
+        self._record(model, "rate_limited")
+        limits = self._get_limits(model)
+        backoff = error.retry_after or min(2.0 ** attempt, 30.0)
+        logger.warning(f"模型 {model} 被限流，{backoff:.1f}秒后重试")
+        if limits.requests:
+            # 扣减配额让所有调用方一起退避，避免重试风暴
+            limits.requests.adjust(backoff * limits.requests.rate)
+            return 0.0
+        return backoff
+    
+    def _finish(self, model: str, content: str, usage: Dict[str, int], estimate: int,
+                latency: float) -> LLMResponse:
+        """用实际Token用量对账并记录统计"""
+        total_tokens = usage.get("total_tokens") or estimate
+        limits = self._get_limits(model)
+        if limits.tokens and usage.get("total_tokens"):
+            limits.tokens.adjust(total_tokens - estimate)
+        
+        with self._lock:
+            stats = self._stats.setdefault(model, {})
+            stats["requests"] = stats.get("requests", 0) + 1
+            stats["tokens"] = stats.get("tokens", 0) + total_tokens
+            stats["total_latency"] = stats.get("total_latency", 0.0) + latency
+        
+        return LLMResponse(content=content, model=model, usage=usage, latency=latency)
+    
+    def _record(self, model: str, name: str, value: float = 1):
+        """累加统计项"""
+        with self._lock:
+            stats = self._stats.setdefault(model, {})
+            stats[name] = stats.get(name, 0) + value
+    
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """估算请求Token数：中日韩字符约1个Token，其余约4个字符1个Token"""
+        text = "".join(message["content"] for message in messages)
+        cjk = sum(1 for char in text if "⺀" <= char <= "鿿")
+        return cjk + (len(text) - cjk) // 4 + self.settings["completion_token_estimate"]
+    
+    @staticmethod
+    def _normalize(messages: Messages) -> List[Dict[str, str]]:
+        """统一为消息列表"""
+        if isinstance(messages, str):
+            return [{"role": "user", "content": messages}]
+        return list(messages)
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """获取进程内共享的LLM网关（首次调用时使用默认配置创建）"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def configure_llm_gateway(settings: Dict[str, Any]) -> LLMGateway:
+    """
+    使用指定配置重建共享的LLM网关，配置未变化时沿用当前网关
+    
+    旧网关不会被关闭：已创建的客户端仍绑定在旧网关上并可继续调用，
+    其连接与缓存在最后一个引用释放后随之回收。
+    
+    Args:
+        settings: 网关配置
+    
+    Returns:
+        共享的网关
+    """
+    global _gateway
+    merged = dict(DEFAULT_GATEWAY_SETTINGS)
+    merged.update(settings)
+    with _gateway_lock:
+        if _gateway is None or _gateway.settings != merged:
+            _gateway = LLMGateway(settings)
+        return _gateway
@@ -0,0 +1,341 @@
+"""智能体记忆存储
+
+记忆项按写入顺序保存，支持按类型、时间范围与关键词查询：
+
+- memory：内存环形缓冲区，追加与淘汰均为O(1)，按类型与关键词建立
+  索引（关键词索引使用英文单词的三字片段与中文相邻二字），按时间
+  二分查找。
+- sqlite：SQLite持久化存储，多个智能体可共用一个数据库文件，
+  关键词查询在支持时使用 FTS5 trigram 全文索引。
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Iterator, Set
+from collections import defaultdict
+from datetime import datetime
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from .timeutil import TimeBound, TimeRing, bisect_time, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# 默认记忆配置
+DEFAULT_MEMORY_SETTINGS = {
+    "backend": "memory",  # memory | sqlite
+    "max_items": None,  # 每个智能体最多保留的记忆条数，None表示使用智能体配置的 max_memory
+    "path": ":memory:",  # SQLite数据库路径
+}
+
+_WORD = re.compile(r"[a-z0-9_]+")
+_CJK_RUN = re.compile(r"[一-鿿]+")
+
+
+def _searchable_text(item: Dict[str, Any]) -> str:
+    """记忆项中可供关键词查询的文本（小写）"""
+    return json.dumps(item, ensure_ascii=False, default=str).lower()
+
+
+def _tokens(text: str) -> Set[str]:
+    """
+    关键词索引的词项：英文单词的三字片段与中文相邻二字
+    
+    关键词是记忆文本的子串时，关键词的词项一定都是记忆文本的词项，
+    因此可以用词项索引缩小候选范围；过短的关键词没有词项，退回逐条匹配。
+    """
+    tokens = set()
+    for word in _WORD.findall(text):
+        tokens.update(word[i:i + 3] for i in range(len(word) - 2))
+    for run in _CJK_RUN.findall(text):
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class MemoryStore(ABC):
+    """记忆存储接口"""
+    
+    def __init__(self, max_items: int = 100):
+        """
+        初始化记忆存储
+        
+        Args:
+            max_items: 最多保留的记忆条数，超过后淘汰最早的记忆
+        """
+        self.max_items = max(1, max_items)
+    
+    @abstractmethod
+    def add(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        添加记忆（不修改传入的字典）
+        
+        Args:
+            item: 记忆项，type 字段用于按类型查询
+        
+        Returns:
+            保存的记忆项（附加 timestamp）
+        """
+    
+    @abstractmethod
+    def query(self, type: Optional[str] = None, since: TimeBound = None, until: TimeBound = None,
+              keyword: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        查询记忆
+        
+        Args:
+            type: 记忆类型
+            since: 起始时间（含），可为时间戳、datetime 或 ISO 字符串
+            until: 结束时间（不含）
+            keyword: 关键词（不区分大小写的子串匹配）
+            limit: 最多返回最近的多少条
+        
+        Returns:
+            按写入顺序排列的记忆项
+        """
+    
+    @abstractmethod
+    def clear(self):
+        """清空记忆"""
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        """记忆条数"""
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """按写入顺序遍历记忆"""
+        return iter(self.query())
+    
+    def recent(self, n: int) -> List[Dict[str, Any]]:
+        """
+        最近的记忆
+        
+        Args:
+            n: 条数
+        
+        Returns:
+            按写入顺序排列的最近 n 条记忆
+        """
+        return self.query(limit=n)
+    
+    def close(self):
+        """释放资源"""
+    
+    def _stamp(self, item: Dict[str, Any], last_ts: float) -> tuple:
+        """生成带时间戳的记忆项，时间戳保持单调"""
+        ts = max(time.time(), last_ts)
+        record = dict(item)
+        record["timestamp"] = datetime.fromtimestamp(ts).isoformat()
+        return ts, record
+
+
+class RingMemoryStore(MemoryStore):
+    """内存环形缓冲区记忆存储"""
+    
+    def __init__(self, max_items: int = 100):
+        """
+        初始化记忆存储
+        
+        Args:
+            max_items: 最多保留的记忆条数
+        """
+        super().__init__(max_items)
+        # 条目: (序号, 时间戳, 记忆项, 类型, 词项集合, 文本)，按写入顺序排列
+        self._entries = TimeRing()
+        self._by_type: Dict[Any, TimeRing] = defaultdict(TimeRing)
+        self._by_token: Dict[str, TimeRing] = defaultdict(TimeRing)
+        self._seq = 0
+        self._last_ts = 0.0
+        self._lock = threading.Lock()
+    
+    def add(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._last_ts, record = self._stamp(item, self._last_ts)
+            self._seq += 1
+            text = _searchable_text(item)
+            tokens = _tokens(text)
+            entry = (self._seq, self._last_ts, record, item.get("type"), tokens, text)
+            self._entries.append(entry)
+            self._by_type[entry[3]].append(entry)
+            for token in tokens:
+                self._by_token[token].append(entry)
+            
+            # 最早的条目同时位于各索引队列的队首，淘汰为O(1)（每个词项一次）
+            while len(self._entries) > self.max_items:
+                old = self._entries.popleft()
+                self._pop_index(self._by_type, old[3])
+                for token in old[4]:
+                    self._pop_index(self._by_token, token)
+        return record
+    
+    def query(self, type: Optional[str] = None, since: TimeBound = None, until: TimeBound = None,
+              keyword: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        since, until = to_epoch(since), to_epoch(until)
+        needle = keyword.lower() if keyword else None
+        
+        with self._lock:
+            candidates = self._entries if type is None else self._by_type.get(type, ())
+            if needle:
+                # 使用最短的词项索引缩小范围
+                postings = [self._by_token.get(token, ()) for token in _tokens(needle)]
+                if postings:
+                    shortest = min(postings, key=len)
+                    if len(shortest) < len(candidates):
+                        candidates = shortest
+            start = 0 if since is None else bisect_time(candidates, since)
+            end = len(candidates) if until is None else bisect_time(candidates, until)
+            entries = candidates[start:end]
+        
+        matched = [
+            entry[2] for entry in entries
+            if (type is None or entry[3] == type) and (needle is None or needle in entry[5])
+        ]
+        return matched[-limit:] if limit else matched
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_type.clear()
+            self._by_token.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def _pop_index(index: Dict[Any, TimeRing], key: Any):
+        """从索引队列队首移除被淘汰的条目"""
+        entries = index[key]
+        entries.popleft()
+        if not entries:
+            del index[key]
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """SQLite持久化记忆存储，按智能体名称区分"""
+    
+    def __init__(self, owner: str, path: str = ":memory:", max_items: int = 100):
+        """
+        打开记忆存储
+        
+        Args:
+            owner: 记忆所属的智能体名称
+            path: SQLite数据库路径，":memory:" 表示仅内存
+            max_items: 该智能体最多保留的记忆条数
+        """
+        super().__init__(max_items)
+        self.owner = owner
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS agent_memory ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, owner TEXT, type TEXT, ts REAL, item TEXT, text TEXT);"
+            "CREATE INDEX IF NOT EXISTS agent_memory_owner_seq ON agent_memory (owner, seq);"
+            "CREATE INDEX IF NOT EXISTS agent_memory_owner_ts ON agent_memory (owner, ts);"
+            "CREATE INDEX IF NOT EXISTS agent_memory_owner_type_ts ON agent_memory (owner, type, ts);"
+        )
+        self._fts = self._create_fts()
+        self._conn.commit()
+        row = self._conn.execute("SELECT MAX(ts) FROM agent_memory WHERE owner = ?", (owner,)).fetchone()
+        self._last_ts = row[0] or 0.0
+    
+    def _create_fts(self) -> bool:
+        """创建 trigram 全文索引，SQLite 不支持时返回False（关键词查询退回 LIKE）"""
+        try:
+            self._conn.executescript(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS agent_memory_fts USING fts5("
+                "text, content='agent_memory', content_rowid='seq', tokenize='trigram');"
+                "CREATE TRIGGER IF NOT EXISTS agent_memory_ai AFTER INSERT ON agent_memory BEGIN "
+                "INSERT INTO agent_memory_fts (rowid, text) VALUES (new.seq, new.text); END;"
+                "CREATE TRIGGER IF NOT EXISTS agent_memory_ad AFTER DELETE ON agent_memory BEGIN "
+                "INSERT INTO agent_memory_fts (agent_memory_fts, rowid, text) VALUES ('delete', old.seq, old.text); END;"
+            )
+            return True
+        except sqlite3.OperationalError as e:
+            logger.info(f"SQLite 不支持 FTS5 trigram，关键词查询使用 LIKE: {e}")
+            return False
+    
+    def add(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._last_ts, record = self._stamp(item, self._last_ts)
+            self._conn.execute(
+                "INSERT INTO agent_memory (owner, type, ts, item, text) VALUES (?, ?, ?, ?, ?)",
+                (self.owner, item.get("type"), self._last_ts,
+                 json.dumps(record, ensure_ascii=False, default=str), _searchable_text(item))
+            )
+            # 删除超出条数上限的最早记忆
+            self._conn.execute(
+                "DELETE FROM agent_memory WHERE owner = ? AND seq < ("
+                "SELECT seq FROM agent_memory WHERE owner = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                (self.owner, self.owner, self.max_items - 1)
+            )
+            self._conn.commit()
+        return record
+    
+    def query(self, type: Optional[str] = None, since: TimeBound = None, until: TimeBound = None,
+              keyword: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        since, until = to_epoch(since), to_epoch(until)
+        clauses, params = ["owner = ?"], [self.owner]
+        if type is not None:
+            clauses.append("type = ?")
+            params.append(type)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if keyword:
+            needle = keyword.lower()
+            if self._fts and len(needle) >= 3:
+                clauses.append("seq IN (SELECT rowid FROM agent_memory_fts WHERE agent_memory_fts MATCH ?)")
+                params.append('"' + needle.replace('"', '""') + '"')
+            else:
+                clauses.append("instr(text, ?) > 0")
+                params.append(needle)
+        sql = f"SELECT item FROM agent_memory WHERE {' AND '.join(clauses)} ORDER BY seq DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+    
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM agent_memory WHERE owner = ?", (self.owner,))
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM agent_memory WHERE owner = ?",
+                                      (self.owner,)).fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_memory_store(owner: str, settings: Optional[Dict[str, Any]] = None,
+                        default_max_items: int = 100) -> MemoryStore:
+    """
+    根据配置创建记忆存储
+    
+    Args:
+        owner: 记忆所属的智能体名称
+        settings: 记忆配置，未提供的项使用 DEFAULT_MEMORY_SETTINGS
+        default_max_items: 配置未指定 max_items 时的条数上限
+    
+    Returns:
+        记忆存储
+    """
+    merged = dict(DEFAULT_MEMORY_SETTINGS)
+    merged.update(settings or {})
+    max_items = merged["max_items"] or default_max_items
+    if merged["backend"] == "sqlite":
+        return SQLiteMemoryStore(owner, merged["path"], max_items)
+    if merged["backend"] != "memory":
+        logger.warning(f"未知的记忆后端: {merged['backend']}，使用内存存储")
+    return RingMemoryStore(max_items)
@@ -0,0 +1,821 @@
+"""消息总线
+
+智能体间的发布/订阅通信。消息历史保存在容量固定的环形缓冲区中，
+按主题建立索引，支持按主题与时间范围回放；被淘汰的消息可选写入
+磁盘上按大小轮转的分段日志，回放时一并读取。
+
+订阅可选择异步分发：每个订阅者拥有自己的有界队列，由工作线程或
+事件循环任务处理，发布只做入队，慢订阅者不会拖慢发布方。订阅主题
+支持层级通配符（见 topic_router）。
+"""
+from typing import Dict, Any, List, Optional, Iterator, Iterable, Tuple, Callable
+from collections import defaultdict, deque
+from collections.abc import Mapping
+from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from .timeutil import TimeBound, TimeRing, bisect_time, to_epoch
+from .topic_router import TopicRouter
+
+logger = logging.getLogger(__name__)
+
+# 默认消息总线配置
+DEFAULT_MESSAGE_BUS_SETTINGS = {
+    "history_size": 1000,  # 内存中保留的消息条数
+    "spill_dir": None,  # 被淘汰消息的分段日志目录，None表示直接丢弃
+    "segment_bytes": 4 * 1024 * 1024,  # 单个分段文件的大小上限
+    "max_segments": 8,  # 最多保留的分段文件数，超过后删除最旧的分段
+    "dispatch": "sync",  # 订阅默认分发方式：sync 在发布方线程调用回调，async 经各订阅者的队列分发
+    "queue_size": 1000,  # 异步订阅的队列容量
+    "overflow": "block",  # 队列满时的策略：block / drop_oldest / drop_new
+    "route_cache_size": 4096,  # 缓存匹配结果的具体主题数（通配符订阅）
+    # 跨进程传输（见 bus_transport）：Unix 域套接字路径或 [主机, 端口]
+    "listen": None,  # 作为中心监听的地址
+    "connect": None,  # 要连接的中心地址
+    "transport_batch_size": 256,  # 每帧最多合并的消息数
+}
+
+# 单调时钟到墙上时钟的偏移（纳秒），用于从日志恢复的消息
+_WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+class Message(Mapping):
+    """
+    总线消息
+    
+    只保存主题、纳秒时间戳（单调时钟用于排序与计算消息年龄，墙上时钟
+    用于按时间回放）与负载，ISO 时间字符串在首次读取或序列化时才
+    生成。按只读映射访问时与旧版的字典消息一致：负载中的字段加上
+    topic 与 timestamp。
+    """
+    
+    __slots__ = ("topic", "payload", "monotonic_ns", "time_ns", "_iso")
+    
+    def __init__(self, topic: str, payload: Dict[str, Any], time_ns: Optional[int] = None,
+                 iso: Optional[str] = None):
+        """
+        初始化消息
+        
+        Args:
+            topic: 主题
+            payload: 负载（不会被修改）
+            time_ns: 墙上时钟纳秒时间戳，默认取当前时间
+            iso: 已知的 ISO 时间字符串（从日志恢复时使用）
+        """
+        self.topic = topic
+        self.payload = payload
+        if time_ns is None:
+            self.monotonic_ns = time.monotonic_ns()
+            self.time_ns = time.time_ns()
+        else:
+            self.time_ns = time_ns
+            self.monotonic_ns = time_ns - _WALL_OFFSET_NS
+        self._iso = iso
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], ts: Optional[float] = None) -> "Message":
+        """
+        从 to_dict 的结果恢复消息
+        
+        Args:
+            data: 消息字典
+            ts: 秒级时间戳
+        
+        Returns:
+            消息
+        """
+        payload = {k: v for k, v in data.items() if k not in ("topic", "timestamp")}
+        time_ns = None if ts is None else int(ts * 1e9)
+        return cls(data.get("topic"), payload, time_ns, data.get("timestamp"))
+    
+    @property
+    def epoch(self) -> float:
+        """秒级墙上时钟时间戳"""
+        return self.time_ns / 1e9
+    
+    @property
+    def age(self) -> float:
+        """消息发布至今的秒数"""
+        return (time.monotonic_ns() - self.monotonic_ns) / 1e9
+    
+    @property
+    def timestamp(self) -> str:
+        """ISO 时间字符串"""
+        if self._iso is None:
+            self._iso = datetime.fromtimestamp(self.epoch).isoformat()
+        return self._iso
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通字典（负载字段加上 topic 与 timestamp）"""
+        data = dict(self.payload)
+        data["topic"] = self.topic
+        data["timestamp"] = self.timestamp
+        return data
+    
+    def __getitem__(self, key: str) -> Any:
+        if key == "topic":
+            return self.topic
+        if key == "timestamp":
+            return self.timestamp
+        return self.payload[key]
+    
+    def __iter__(self) -> Iterator[str]:
+        for key in self.payload:
+            if key not in ("topic", "timestamp"):
+                yield key
+        yield "topic"
+        yield "timestamp"
+    
+    def __len__(self) -> int:
+        return len(self.payload) + 2 - ("topic" in self.payload) - ("timestamp" in self.payload)
+    
+    def __repr__(self) -> str:
+        return f"Message(topic={self.topic!r}, payload={self.payload!r})"
+
+
+class SegmentLog:
+    """按大小轮转的分段日志（JSON Lines），记录每个分段的时间范围与主题用于跳过无关分段"""
+    
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024, max_segments: int = 8):
+        """
+        打开分段日志，已有的分段会被重新索引
+        
+        Args:
+            directory: 分段文件目录
+            segment_bytes: 单个分段文件的大小上限
+            max_segments: 最多保留的分段文件数
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max(1, max_segments)
+        os.makedirs(directory, exist_ok=True)
+        # 每个分段: [路径, 首条时间, 末条时间, 主题集合]
+        self.segments: List[list] = []
+        self.last_seq = 0
+        for name in sorted(os.listdir(directory)):
+            if name.startswith("segment-") and name.endswith(".jsonl"):
+                segment, last_seq = self._index_segment(os.path.join(directory, name))
+                self.segments.append(segment)
+                self.last_seq = max(self.last_seq, last_seq)
+        self._file = None
+        self._next_id = self._segment_id(self.segments[-1][0]) + 1 if self.segments else 0
+    
+    def append(self, records: List[Tuple[int, float, Dict[str, Any]]]):
+        """
+        追加一批记录
+        
+        Args:
+            records: (序号, 时间戳, 消息) 列表，按时间排序
+        """
+        for seq, ts, message in records:
+            if self._file is None or self._file.tell() >= self.segment_bytes:
+                self._rotate()
+            line = json.dumps({"seq": seq, "time": ts, "message": message},
+                              ensure_ascii=False, default=str)
+            self._file.write(line + "\n")
+            segment = self.segments[-1]
+            if segment[1] is None:
+                segment[1] = ts
+            segment[2] = ts
+            segment[3].add(message.get("topic"))
+            self.last_seq = seq
+        if self._file is not None:
+            self._file.flush()
+    
+    def read(self, topic: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> Iterator[Tuple[int, float, Dict[str, Any]]]:
+        """
+        按时间顺序读取匹配的记录
+        
+        Args:
+            topic: 主题，None表示全部主题
+            since: 起始时间戳（含）
+            until: 结束时间戳（不含）
+        
+        Yields:
+            (序号, 时间戳, 消息)
+        """
+        for path, first, last, topics in list(self.segments):
+            if first is None or (topic is not None and topic not in topics):
+                continue
+            if (since is not None and last < since) or (until is not None and first >= until):
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        record = json.loads(line)
+                        ts = record["time"]
+                        if since is not None and ts < since:
+                            continue
+                        if until is not None and ts >= until:
+                            break
+                        if topic is None or record["message"].get("topic") == topic:
+                            yield record["seq"], ts, record["message"]
+            except FileNotFoundError:
+                continue
+    
+    def close(self):
+        """关闭当前分段文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def _rotate(self):
+        """开始新的分段，并删除超出数量上限的旧分段"""
+        self.close()
+        path = os.path.join(self.directory, f"segment-{self._next_id:08d}.jsonl")
+        self._next_id += 1
+        self._file = open(path, "a", encoding="utf-8")
+        self.segments.append([path, None, None, set()])
+        while len(self.segments) > self.max_segments:
+            old_path = self.segments.pop(0)[0]
+            try:
+                os.remove(old_path)
+            except OSError as e:
+                logger.warning(f"删除消息日志分段失败: {old_path}, 错误: {e}")
+    
+    @staticmethod
+    def _segment_id(path: str) -> int:
+        """从分段文件名中解析编号"""
+        return int(os.path.basename(path)[len("segment-"):-len(".jsonl")])
+    
+    @staticmethod
+    def _index_segment(path: str) -> Tuple[list, int]:
+        """扫描已有分段，得到时间范围、主题集合与最大序号"""
+        first, last, topics, last_seq = None, None, set(), 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                first = record["time"] if first is None else first
+                last = record["time"]
+                last_seq = max(last_seq, record["seq"])
+                topics.add(record["message"].get("topic"))
+        return [path, first, last, topics], last_seq
+
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_new")
+
+
+class Subscription:
+    """
+    订阅者的有界消息队列
+    
+    同步分发时直接在发布方线程调用回调；异步分发时消息进入该订阅者
+    自己的有界队列，由专属工作线程（普通回调）或事件循环中的任务
+    （协程回调）取出执行，发布方不会被慢订阅者拖住。
+    """
+    
+    def __init__(self, topic: str, callback: Callable, dispatch: str = "sync",
+                 queue_size: int = 1000, overflow: str = "block",
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        初始化订阅
+        
+        Args:
+            topic: 主题
+            callback: 回调函数或协程函数
+            dispatch: sync（发布方线程中直接调用）或 async（队列化分发）
+            queue_size: 异步分发的队列容量
+            overflow: 队列满时的策略，block / drop_oldest / drop_new
+            loop: 协程回调所在的事件循环，默认使用当前运行中的事件循环
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow}")
+        self.topic = topic
+        self.callback = callback
+        self.dispatch = dispatch
+        self.queue_size = max(1, queue_size)
+        self.overflow = overflow
+        self.closed = False
+        self.stats = {"delivered": 0, "dropped": 0, "errors": 0, "max_queued": 0, "total_latency": 0.0}
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._busy = False
+        self._loop = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker = None
+        
+        if dispatch != "async":
+            return
+        if asyncio.iscoroutinefunction(callback):
+            self._loop = loop or asyncio.get_running_loop()
+            self._worker = asyncio.run_coroutine_threadsafe(self._drain_async(), self._loop)
+        else:
+            self._worker = threading.Thread(target=self._drain, name=f"bus-{topic}", daemon=True)
+            self._worker.start()
+    
+    def offer(self, message: Dict[str, Any]) -> bool:
+        """
+        投递消息（异步分发时为O(1)入队）
+        
+        Args:
+            message: 消息
+        
+        Returns:
+            消息是否被接收（队列满且策略为 drop_new 时为False）
+        """
+        if self.dispatch != "async":
+            # 同步分发在发布方线程中执行，投递延迟可忽略，只计数
+            try:
+                self.callback(message)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"消息回调执行失败: {e}")
+            self.stats["delivered"] += 1
+            return True
+        
+        with self._lock:
+            if self.closed:
+                return False
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == "drop_new" or (self.overflow == "block" and self._on_own_loop()):
+                    self.stats["dropped"] += 1
+                    return False
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self.stats["dropped"] += 1
+                else:
+                    self._not_full.wait_for(lambda: self.closed or len(self._queue) < self.queue_size)
+                    if self.closed:
+                        return False
+            was_empty = not self._queue
+            self._queue.append((time.monotonic(), message))
+            self.stats["max_queued"] = max(self.stats["max_queued"], len(self._queue))
+            self._not_empty.notify()
+        if was_empty and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake)
+        return True
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待队列中的消息全部处理完
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            是否已处理完
+        """
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._queue and not self._busy, timeout=timeout)
+    
+    def close(self, drain: bool = True, timeout: Optional[float] = None):
+        """
+        关闭订阅
+        
+        Args:
+            drain: 是否先处理完已入队的消息
+            timeout: 等待处理完的最长时间（秒）
+        """
+        # 在本订阅的事件循环中等待会阻塞处理任务本身，此时直接关闭
+        if drain and self.dispatch == "async" and not self._on_own_loop():
+            self.join(timeout)
+        with self._lock:
+            self.closed = True
+            self._queue.clear()
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+            self._idle.notify_all()
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取订阅统计
+        
+        Returns:
+            排队数、滞后时间（最旧排队消息的等待秒数）、投递/丢弃/出错条数与平均投递延迟
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["queued"] = len(self._queue)
+            stats["lag"] = time.monotonic() - self._queue[0][0] if self._queue else 0.0
+        delivered = stats.pop("delivered")
+        total_latency = stats.pop("total_latency")
+        stats.update({
+            "topic": self.topic,
+            "callback": getattr(self.callback, "__qualname__", repr(self.callback)),
+            "dispatch": self.dispatch,
+            "delivered": delivered,
+            "average_latency": total_latency / delivered if delivered else 0.0,
+        })
+        return stats
+    
+    def _on_own_loop(self) -> bool:
+        """发布方是否运行在本订阅的事件循环中（此时阻塞会造成死锁）"""
+        if self._loop is None:
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+    
+    def _wake(self):
+        """在事件循环中唤醒处理任务"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    def _take(self, block: bool) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """取出一条消息，关闭或非阻塞且队列为空时返回None"""
+        with self._lock:
+            if block:
+                self._not_empty.wait_for(lambda: self.closed or self._queue)
+            if self.closed or not self._queue:
+                return None
+            self._busy = True
+            item = self._queue.popleft()
+            self._not_full.notify()
+            return item
+    
+    def _done(self):
+        """一条消息处理完毕"""
+        with self._lock:
+            self._busy = False
+            if not self._queue:
+                self._idle.notify_all()
+    
+    def _drain(self):
+        """工作线程：依次处理队列中的消息"""
+        while True:
+            item = self._take(block=True)
+            if item is None:
+                return
+            try:
+                self._deliver(item[1], item[0])
+            finally:
+                self._done()
+    
+    async def _drain_async(self):
+        """事件循环任务：依次处理队列中的消息"""
+        self._wakeup = asyncio.Event()
+        while not self.closed:
+            item = self._take(block=False)
+            if item is None:
+                self._wakeup.clear()
+                # 清除唤醒标志后再检查一次，避免丢失入队通知
+                item = self._take(block=False)
+                if item is None:
+                    await self._wakeup.wait()
+                    continue
+            try:
+                await self._deliver_async(item[1], item[0])
+            finally:
+                self._done()
+    
+    def _deliver(self, message: Dict[str, Any], enqueued: float):
+        """调用回调并记录统计"""
+        try:
+            self.callback(message)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"消息回调执行失败: {e}")
+        self._record(enqueued)
+    
+    async def _deliver_async(self, message: Dict[str, Any], enqueued: float):
+        """调用协程回调并记录统计"""
+        try:
+            await self.callback(message)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"消息回调执行失败: {e}")
+        self._record(enqueued)
+    
+    def _record(self, enqueued: float):
+        """记录一次投递"""
+        with self._lock:
+            self.stats["delivered"] += 1
+            self.stats["total_latency"] += time.monotonic() - enqueued
+
+
+class MessageBus:
+    """消息总线，用于智能体间通信"""
+    
+    def __init__(self, history_size: int = 1000, spill_dir: Optional[str] = None,
+                 segment_bytes: int = 4 * 1024 * 1024, max_segments: int = 8,
+                 dispatch: str = "sync", queue_size: int = 1000, overflow: str = "block",
+                 route_cache_size: int = 4096):
+        """
+        初始化消息总线
+        
+        Args:
+            history_size: 内存中保留的消息条数
+            spill_dir: 被淘汰消息的分段日志目录，None表示直接丢弃
+            segment_bytes: 单个分段文件的大小上限
+            max_segments: 最多保留的分段文件数
+            dispatch: 订阅的默认分发方式，sync 或 async
+            queue_size: 异步订阅的默认队列容量
+            overflow: 异步订阅队列满时的默认策略
+            route_cache_size: 缓存匹配结果的具体主题数
+        """
+        if dispatch not in ("sync", "async"):
+            raise ValueError(f"未知的分发方式: {dispatch}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow}")
+        self.dispatch = dispatch
+        self.queue_size = queue_size
+        self.overflow = overflow
+        # 订阅模式 -> 订阅元组；订阅变更时整体替换
+        self.subscriptions: Dict[str, Tuple[Subscription, ...]] = {}
+        # 发布时经路由器按具体主题查找匹配的订阅（含通配符）
+        self._router = TopicRouter(route_cache_size)
+        # 订阅变更监听器 listener(模式, 是否新增)，供跨进程传输同步订阅关系
+        self._subscription_listeners: List[Callable[[str, bool], None]] = []
+        self.history_size = max(1, history_size)
+        self.spill: Optional[SegmentLog] = None
+        if spill_dir:
+            self.spill = SegmentLog(spill_dir, segment_bytes, max_segments)
+        # 内存历史：全部消息与各主题的 (序号, 时间戳, 消息, 主题)，按发布顺序排列
+        self._entries = TimeRing()
+        self._by_topic: Dict[str, TimeRing] = defaultdict(TimeRing)
+        # 已淘汰、尚未写入分段日志的批次；在发布锁之外按序落盘，落盘前回放仍可读到
+        self._unspilled: deque = deque()
+        self._spill_lock = threading.Lock()
+        # 序号接续分段日志，回放时据此去除重复
+        self._seq = self.spill.last_seq if self.spill is not None else 0
+        self._last_ts = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "evicted": 0, "spilled": 0}
+    
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "MessageBus":
+        """根据配置创建消息总线"""
+        merged = dict(DEFAULT_MESSAGE_BUS_SETTINGS)
+        merged.update(settings)
+        return cls(merged["history_size"], merged["spill_dir"],
+                   merged["segment_bytes"], merged["max_segments"],
+                   merged["dispatch"], merged["queue_size"], merged["overflow"],
+                   merged["route_cache_size"])
+    
+    @property
+    def subscribers(self) -> Dict[str, List[Callable]]:
+        """各主题的回调函数"""
+        return {topic: [sub.callback for sub in subs] for topic, subs in self.subscriptions.items()}
+    
+    @property
+    def message_history(self) -> List[Message]:
+        """内存中保留的消息（按发布顺序）"""
+        with self._lock:
+            return [entry[2] for entry in self._entries]
+    
+    def publish(self, topic: str, message: Dict[str, Any]) -> Message:
+        """
+        发布消息
+        
+        Args:
+            topic: 主题
+            message: 消息内容（不会被修改）
+        
+        Returns:
+            总线消息
+        """
+        published = Message(topic, message.payload if isinstance(message, Message) else message)
+        self._append([published])
+        
+        # 通知订阅者：异步订阅只入队，同步订阅直接调用回调
+        for subscription in self._router.route(topic):
+            subscription.offer(published)
+        return published
+    
+    def publish_many(self, messages: Iterable[Tuple[str, Dict[str, Any]]]) -> List[Message]:
+        """
+        批量发布消息，整批只加一次锁
+        
+        Args:
+            messages: (主题, 消息内容) 序列
+        
+        Returns:
+            总线消息列表
+        """
+        published = [
+            Message(topic, payload.payload if isinstance(payload, Message) else payload)
+            for topic, payload in messages
+        ]
+        self._append(published)
+        
+        route = self._router.route
+        for message in published:
+            for subscription in route(message.topic):
+                subscription.offer(message)
+        return published
+    
+    def subscribe(self, topic: str, callback: Callable, dispatch: Optional[str] = None,
+                  queue_size: Optional[int] = None, overflow: Optional[str] = None,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        """
+        订阅消息
+        
+        Args:
+            topic: 主题或订阅模式，按 "." 分级，"*" 匹配一级，"#" 匹配零级或多级
+            callback: 回调函数；异步分发时可为协程函数，在事件循环中执行
+            dispatch: 分发方式，默认使用总线配置
+            queue_size: 异步分发的队列容量，默认使用总线配置
+            overflow: 队列满时的策略（block / drop_oldest / drop_new），默认使用总线配置
+            loop: 协程回调所在的事件循环，默认使用当前运行中的事件循环
+        
+        Returns:
+            订阅对象，可用于取消订阅和查看统计
+        """
+        subscription = Subscription(
+            topic, callback,
+            dispatch=dispatch or self.dispatch,
+            queue_size=queue_size or self.queue_size,
+            overflow=overflow or self.overflow,
+            loop=loop
+        )
+        with self._lock:
+            self.subscriptions[topic] = self.subscriptions.get(topic, ()) + (subscription,)
+        self._router.add(topic, subscription)
+        for listener in list(self._subscription_listeners):
+            listener(topic, True)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription, drain: bool = True):
+        """
+        取消订阅
+        
+        Args:
+            subscription: subscribe 返回的订阅对象
+            drain: 是否先处理完已入队的消息
+        """
+        with self._lock:
+            remaining = tuple(s for s in self.subscriptions.get(subscription.topic, ()) if s is not subscription)
+            if remaining:
+                self.subscriptions[subscription.topic] = remaining
+            else:
+                self.subscriptions.pop(subscription.topic, None)
+        if self._router.remove(subscription.topic, subscription):
+            for listener in list(self._subscription_listeners):
+                listener(subscription.topic, False)
+        subscription.close(drain)
+    
+    def add_subscription_listener(self, listener: Callable[[str, bool], None]):
+        """
+        监听订阅变更
+        
+        Args:
+            listener: listener(模式, 是否新增)，在 subscribe/unsubscribe 的调用线程中执行
+        """
+        self._subscription_listeners.append(listener)
+    
+    def remove_subscription_listener(self, listener: Callable[[str, bool], None]):
+        """
+        移除订阅变更监听器
+        
+        Args:
+            listener: add_subscription_listener 注册的监听器
+        """
+        if listener in self._subscription_listeners:
+            self._subscription_listeners.remove(listener)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待所有异步订阅处理完已入队的消息
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            是否全部处理完
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for subscription in self._all_subscriptions():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not subscription.join(remaining):
+                return False
+        return True
+    
+    def replay(self, topic: Optional[str] = None, since: TimeBound = None,
+               until: TimeBound = None, limit: Optional[int] = None) -> List[Message]:
+        """
+        按发布顺序回放历史消息
+        
+        先读取分段日志中已淘汰的消息，再读取内存中的消息；内存部分
+        使用主题索引并按时间二分查找起点。
+        
+        Args:
+            topic: 主题，None表示全部主题
+            since: 起始时间（含），可为时间戳、datetime 或 ISO 字符串
+            until: 结束时间（不含）
+            limit: 最多返回最近的多少条
+        
+        Returns:
+            消息列表
+        """
+        since, until = to_epoch(since), to_epoch(until)
+        
+        with self._lock:
+            entries = self._entries if topic is None else self._by_topic.get(topic, [])
+            start = 0 if since is None else bisect_time(entries, since)
+            end = len(entries) if until is None else bisect_time(entries, until)
+            memory = entries[start:end]
+            pending = [
+                entry for batch in self._unspilled for entry in batch
+                if (topic is None or entry[3] == topic)
+                and (since is None or entry[1] >= since) and (until is None or entry[1] < until)
+            ]
+            memory = pending + memory
+        
+        older = []
+        if self.spill is not None and (limit is None or len(memory) < limit):
+            oldest_seq = memory[0][0] if memory else None
+            for seq, ts, data in self.spill.read(topic, since, until):
+                if oldest_seq is None or seq < oldest_seq:
+                    older.append(Message.from_dict(data, ts))
+        
+        messages = older + [entry[2] for entry in memory]
+        return messages[-limit:] if limit else messages
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取消息总线统计
+        
+        Returns:
+            发布、淘汰、落盘条数与当前历史大小
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["history"] = len(self._entries)
+            stats["capacity"] = self.history_size
+            stats["topics"] = len(self._by_topic)
+            if self.spill is not None:
+                stats["segments"] = len(self.spill.segments)
+        stats["subscribers"] = [s.get_stats() for s in self._all_subscriptions()]
+        stats["routing"] = self._router.get_stats()
+        return stats
+    
+    def close(self):
+        """停止异步订阅，并把内存中的消息写入分段日志后关闭，重新打开时可继续回放"""
+        for subscription in self._all_subscriptions():
+            subscription.close()
+        if self.spill is not None:
+            with self._lock:
+                if self._entries:
+                    self._unspilled.append(list(self._entries))
+                    self._entries.clear()
+                    self._by_topic.clear()
+            self._flush_spill()
+            with self._spill_lock:
+                self.spill.close()
+    
+    def _all_subscriptions(self) -> List[Subscription]:
+        """全部订阅"""
+        return [s for subs in list(self.subscriptions.values()) for s in subs]
+    
+    def _append(self, messages: List[Message]):
+        """写入环形缓冲区，淘汰的消息写入分段日志"""
+        with self._lock:
+            for message in messages:
+                self._seq += 1
+                # 时间戳保持单调（含接续分段日志时），保证按时间二分查找有效
+                self._last_ts = max(message.epoch, self._last_ts)
+                entry = (self._seq, self._last_ts, message, message.topic)
+                self._entries.append(entry)
+                self._by_topic[message.topic].append(entry)
+            self.stats["published"] += len(messages)
+            
+            evicted = []
+            while len(self._entries) > self.history_size:
+                old = self._entries.popleft()
+                topic_entries = self._by_topic[old[3]]
+                topic_entries.popleft()
+                if not topic_entries:
+                    del self._by_topic[old[3]]
+                evicted.append(old)
+            
+            if evicted:
+                self.stats["evicted"] += len(evicted)
+                if self.spill is not None:
+                    self._unspilled.append(evicted)
+        
+        # 文件写入与分段轮转不占用发布锁
+        if evicted and self.spill is not None:
+            self._flush_spill()
+    
+    def _flush_spill(self):
+        """按淘汰顺序把待落盘的批次写入分段日志；批次写完后才移出队列，期间回放仍可读到"""
+        with self._spill_lock:
+            while True:
+                with self._lock:
+                    if not self._unspilled:
+                        return
+                    batch = self._unspilled[0]
+                spilled = 0
+                try:
+                    self.spill.append([(seq, ts, message.to_dict()) for seq, ts, message, _ in batch])
+                    spilled = len(batch)
+                except (OSError, TypeError, ValueError) as e:
+                    logger.warning(f"消息落盘失败: {e}")
+                with self._lock:
+                    self._unspilled.popleft()
+                    self.stats["spilled"] += spilled
@@ -0,0 +1,156 @@
+"""Prometheus 指标导出
+
+把已加载智能体的操作延迟直方图按 Prometheus 文本格式暴露：
+
+- manus_agent_operation_latency_seconds：固定边界的直方图（标签 agent、operation），
+  可在 Prometheus 中跨智能体、跨工作进程用 sum by 聚合后计算分位数；
+- manus_agent_operation_latency_quantile_seconds：进程内直方图计算的
+  p50/p90/p99（标签 quantile）。
+
+prometheus-client 为可选依赖，未安装时不启动导出服务。
+"""
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+import inspect
+import logging
+import threading
+import weakref
+
+from .latency import LatencyHistogram
+
+if TYPE_CHECKING:
+    from ..agents.base_agent import BaseAgent
+
+logger = logging.getLogger(__name__)
+
+# 默认导出配置
+DEFAULT_METRICS_SETTINGS = {
+    "port": None,  # 导出端口，None表示不启动导出服务
+    "addr": "0.0.0.0",  # 监听地址
+    "buckets": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),  # 直方图边界（秒）
+}
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class AgentLatencyCollector:
+    """在每次抓取时读取智能体延迟直方图的 Prometheus 收集器"""
+    
+    def __init__(self, agents: Callable[[], Dict[str, "BaseAgent"]],
+                 buckets: Sequence[float] = DEFAULT_METRICS_SETTINGS["buckets"]):
+        """
+        初始化收集器
+        
+        Args:
+            agents: 返回 名称 -> 智能体 的函数（每次抓取时调用，只包含已加载的智能体）；
+                绑定方法只被弱引用，其对象被回收后不再导出
+            buckets: 直方图边界（秒）
+        """
+        # 每项调用后得到来源函数，来源已被回收时得到None
+        self.sources: List[Callable[[], Optional[Callable[[], Dict[str, "BaseAgent"]]]]] = []
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        self.add_source(agents)
+    
+    def add_source(self, agents: Callable[[], Dict[str, "BaseAgent"]]):
+        """
+        增加智能体来源（如同一进程中的其他 AgentManager）
+        
+        Args:
+            agents: 返回 名称 -> 智能体 的函数，绑定方法只被弱引用
+        """
+        ref = weakref.WeakMethod(agents) if inspect.ismethod(agents) else (lambda: agents)
+        with self._lock:
+            self.sources = self.sources + [ref]
+    
+    def _live_sources(self) -> List[Callable[[], Dict[str, "BaseAgent"]]]:
+        """仍存活的来源，顺带移除已被回收的来源"""
+        live = [source for source in (ref() for ref in self.sources) if source is not None]
+        if len(live) < len(self.sources):
+            with self._lock:
+                self.sources = [ref for ref in self.sources if ref() is not None]
+        return live
+    
+    def _histograms(self) -> Dict[Tuple[str, str], LatencyHistogram]:
+        """各来源中同名智能体同一操作的直方图合并后的快照（抓取期间的记录不影响导出的一致性）"""
+        grouped: Dict[Tuple[str, str], List[LatencyHistogram]] = {}
+        for source in self._live_sources():
+            for name, agent in source().items():
+                for operation, histogram in agent.latency.histograms().items():
+                    grouped.setdefault((name, operation), []).append(histogram)
+        histograms = {}
+        for key, group in grouped.items():
+            histogram = LatencyHistogram.from_dict(group[0].to_dict())
+            for other in group[1:]:
+                histogram.merge(other)
+            histograms[key] = histogram
+        return histograms
+    
+    def collect(self):
+        """生成指标（由 prometheus_client 在抓取时调用）"""
+        from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+        
+        histogram_family = HistogramMetricFamily(
+            "manus_agent_operation_latency_seconds", "智能体操作耗时",
+            labels=["agent", "operation"]
+        )
+        quantile_family = GaugeMetricFamily(
+            "manus_agent_operation_latency_quantile_seconds", "智能体操作耗时分位数",
+            labels=["agent", "operation", "quantile"]
+        )
+        for (name, operation), histogram in sorted(self._histograms().items()):
+            # 快照不再变化：各桶计数、总次数与总耗时出自同一时刻
+            counts = histogram.cumulative_counts(self.buckets)
+            buckets = [(repr(float(bound)), count) for bound, count in zip(self.buckets, counts)]
+            buckets.append(("+Inf", histogram.count))
+            histogram_family.add_metric([name, operation], buckets, histogram.total)
+            for q in QUANTILES:
+                value = histogram.percentile(q)
+                if value is not None:
+                    quantile_family.add_metric([name, operation, str(q)], value)
+        yield histogram_family
+        yield quantile_family
+
+
+# 本进程中按 (地址, 端口) 登记的导出服务及其收集器
+_servers: Dict[Tuple[str, int], Tuple[Any, AgentLatencyCollector]] = {}
+_servers_lock = threading.Lock()
+
+
+def start_metrics_server(agents: Callable[[], Dict[str, "BaseAgent"]],
+                         settings: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+    """
+    启动 Prometheus 导出服务（/metrics）
+    
+    同一进程中每个地址与端口只启动一个服务，再次调用时把智能体来源加入
+    已有的收集器，同名智能体的直方图在抓取时合并。
+    
+    Args:
+        agents: 返回 名称 -> 智能体 的函数，绑定方法只被弱引用
+        settings: 导出配置，未提供的项使用 DEFAULT_METRICS_SETTINGS
+    
+    Returns:
+        prometheus_client 返回的 (HTTP服务, 线程)，未配置端口或未安装 prometheus-client 时返回None
+    """
+    merged = dict(DEFAULT_METRICS_SETTINGS)
+    merged.update(settings or {})
+    if merged["port"] is None:
+        return None
+    try:
+        from prometheus_client import CollectorRegistry, start_http_server
+    except ImportError as e:
+        logger.warning(f"未安装 prometheus-client，指标导出未启动: {e}")
+        return None
+    
+    key = (merged["addr"], merged["port"])
+    with _servers_lock:
+        if key in _servers:
+            server, collector = _servers[key]
+            collector.add_source(agents)
+            return server
+        collector = AgentLatencyCollector(agents, merged["buckets"])
+        registry = CollectorRegistry()
+        registry.register(collector)
+        server = start_http_server(merged["port"], merged["addr"], registry=registry)
+        _servers[key] = (server, collector)
+    logger.info(f"指标导出已启动: http://{merged['addr']}:{merged['port']}/metrics")
+    return server
@@ -0,0 +1,128 @@
+"""计划模板库
+
+常见指令按预编译的正则模板匹配，命中且置信度足够时直接在本地
+生成步骤，无需调用LLM。
+"""
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass, field
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 默认模板：按顺序匹配，steps 中的 {名称} 由同名捕获组填充
+DEFAULT_PLAN_TEMPLATES = [
+    {
+        "name": "search_then_code",
+        "pattern": r"(?:请)?(?:搜索|查找|检索)(?P<topic>.+?)(?:，|,|并且|并|然后|再)+(?:生成|编写)(?P<target>.*?)(?:的)?代码",
+        "steps": ["搜索{topic}", "生成{target}代码"],
+        "confidence": 0.95,
+    },
+    {
+        "name": "open_then_click",
+        "pattern": r"(?:请)?打开(?P<app>[^，,]+?)(?:，|,|并且|并|然后|再)+点击(?P<target>[^，,]+)",
+        "steps": ["打开{app}", "点击{target}"],
+        "confidence": 0.95,
+    },
+    {
+        "name": "open_then_input",
+        "pattern": r"(?:请)?打开(?P<app>[^，,]+?)(?:，|,|并且|并|然后|再)+输入(?P<text>[^，,]+)",
+        "steps": ["打开{app}", "输入{text}"],
+        "confidence": 0.95,
+    },
+    {
+        "name": "search",
+        "pattern": r"(?:请)?(?:搜索|查找|检索)(?P<topic>(?:(?!，|,|并|然后).)+)",
+        "steps": ["搜索{topic}"],
+        "confidence": 0.9,
+    },
+    {
+        "name": "generate_code",
+        "pattern": r"(?:请)?(?:生成|编写)(?P<target>(?:(?!，|,|并|然后).)*?)(?:的)?代码",
+        "steps": ["生成{target}代码"],
+        "confidence": 0.9,
+    },
+]
+
+# 匹配前去掉的首尾标点与空白
+_STRIP_CHARS = " \t\r\n。.!！?？"
+
+
+@dataclass
+class PlanTemplate:
+    """计划模板"""
+    name: str
+    pattern: str
+    steps: List[str]
+    confidence: float = 0.9
+    regex: Any = field(default=None, repr=False)
+    
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern)
+
+
+@dataclass
+class TemplateMatch:
+    """模板匹配结果"""
+    template: str
+    steps: List[str]
+    slots: Dict[str, str]
+    confidence: float
+
+
+class PlanTemplateLibrary:
+    """计划模板库"""
+    
+    def __init__(self, templates: Optional[List[Dict[str, Any]]] = None):
+        """
+        初始化模板库
+        
+        Args:
+            templates: 模板配置列表，默认使用 DEFAULT_PLAN_TEMPLATES
+        """
+        self.templates: List[PlanTemplate] = []
+        for spec in DEFAULT_PLAN_TEMPLATES if templates is None else templates:
+            try:
+                self.templates.append(PlanTemplate(**spec))
+            except (re.error, TypeError) as e:
+                logger.warning(f"计划模板 {spec.get('name')} 无效，已忽略: {e}")
+    
+    def match(self, instruction: str) -> Optional[TemplateMatch]:
+        """
+        匹配指令
+        
+        置信度为模板置信度乘以匹配覆盖率：完整匹配覆盖率为1，
+        只匹配到部分指令时按匹配长度占比折减。
+        
+        Args:
+            instruction: 用户指令
+        
+        Returns:
+            置信度最高的匹配，没有匹配时返回None
+        """
+        text = instruction.strip(_STRIP_CHARS)
+        if not text:
+            return None
+        
+        best = None
+        for template in self.templates:
+            found = template.regex.fullmatch(text)
+            coverage = 1.0
+            if found is None:
+                found = template.regex.search(text)
+                if found is None:
+                    continue
+                coverage = (found.end() - found.start()) / len(text)
+            
+            confidence = template.confidence * coverage
+            if best is not None and confidence <= best.confidence:
+                continue
+            
+            slots = {name: (value or "").strip() for name, value in found.groupdict().items()}
+            try:
+                steps = [step.format(**slots) for step in template.steps]
+            except (KeyError, IndexError):
+                continue
+            best = TemplateMatch(template.name, steps, slots, confidence)
+        
+        return best
@@ -0,0 +1,364 @@
+"""依赖感知的子任务调度器"""
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledRun:
+    """一次调度运行，记录一个计划内子任务的依赖与执行状态"""
+    
+    def __init__(self, scheduler: "DAGScheduler", execute_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 stop_on_error: bool = True):
+        """
+        初始化调度运行
+        
+        Args:
+            scheduler: 所属调度器
+            execute_fn: 子任务执行函数
+            stop_on_error: 子任务失败后是否停止派发新的子任务
+        """
+        self.scheduler = scheduler
+        self.execute_fn = execute_fn
+        self.stop_on_error = stop_on_error
+        self.order: List[str] = []
+        self.subtasks: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.timings: Dict[str, float] = {}
+        self.skipped: List[str] = []
+        self.stopped = False
+        self.closed = False
+        self._waiting: Dict[str, set] = {}
+        self._dependents: Dict[str, List[str]] = defaultdict(list)
+        self._running = 0
+        self._done = threading.Condition(scheduler._lock)
+        # 子任务在工作线程中使用发起方的上下文（如截止时间）执行
+        self.context = contextvars.copy_context()
+    
+    def add(self, subtask: Dict[str, Any]):
+        """
+        加入子任务，依赖满足后立即派发
+        
+        Args:
+            subtask: 子任务字典，dependencies 中只能引用已加入的子任务
+        """
+        task_id = subtask["id"]
+        with self.scheduler._lock:
+            if self.closed:
+                raise RuntimeError("调度运行已关闭，不能再加入子任务")
+            if task_id in self.subtasks:
+                raise ValueError(f"重复的子任务ID: {task_id}")
+            
+            self.order.append(task_id)
+            self.subtasks[task_id] = subtask
+            
+            waiting = set()
+            for dep in subtask.get("dependencies", []):
+                if dep not in self.subtasks:
+                    logger.warning(f"子任务 {task_id} 依赖未知子任务 {dep}，已忽略")
+                elif dep in self.skipped or self._failed(dep):
+                    self._skip(task_id)
+                    return
+                elif dep not in self.results:
+                    waiting.add(dep)
+                    self._dependents[dep].append(task_id)
+            
+            if self.stopped:
+                self._skip(task_id)
+            elif waiting:
+                self._waiting[task_id] = waiting
+            else:
+                self.scheduler._enqueue(self, subtask)
+    
+    def close(self):
+        """标记不再加入新的子任务"""
+        with self.scheduler._lock:
+            self.closed = True
+            self._done.notify_all()
+    
+    def wait(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        等待所有已加入的子任务结束
+        
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+        
+        Returns:
+            已执行子任务的结果列表（按加入顺序）
+        """
+        with self.scheduler._lock:
+            self._done.wait_for(self._finished, timeout=timeout)
+            return [self.results[task_id] for task_id in self.order if task_id in self.results]
+    
+    @property
+    def finished(self) -> bool:
+        """已加入的子任务是否全部结束"""
+        with self.scheduler._lock:
+            return self._finished()
+    
+    def cancel(self):
+        """
+        取消运行：不再加入与派发子任务，尚未派发的子任务记为跳过
+        
+        正在执行的子任务不会被中断，其结果仍会记录。
+        """
+        with self.scheduler._lock:
+            self.closed = True
+            self.stopped = True
+            for waiting_id in list(self._waiting):
+                self._skip(waiting_id)
+            self.scheduler._drop_queued(self)
+            self._done.notify_all()
+    
+    def _finished(self) -> bool:
+        """是否全部结束（需持有锁）"""
+        return self.closed and self._running == 0 and not self._waiting and \
+            len(self.results) + len(self.skipped) == len(self.order)
+    
+    def _failed(self, task_id: str) -> bool:
+        """子任务是否失败（需持有锁）"""
+        result = self.results.get(task_id)
+        return result is not None and result.get("status") == "error"
+    
+    def _skip(self, task_id: str):
+        """跳过子任务及其所有后继（需持有锁）"""
+        pending = [task_id]
+        while pending:
+            current = pending.pop()
+            if current in self.skipped:
+                continue
+            self.skipped.append(current)
+            self._waiting.pop(current, None)
+            pending.extend(self._dependents.pop(current, []))
+        self._done.notify_all()
+    
+    def _complete(self, task_id: str, result: Dict[str, Any], elapsed: float):
+        """记录子任务结果并派发就绪的后继（需持有锁）"""
+        self._running -= 1
+        self.results[task_id] = result
+        self.timings[task_id] = elapsed
+        
+        if result.get("status") == "error":
+            if self.stop_on_error:
+                self.stopped = True
+                for waiting_id in list(self._waiting):
+                    self._skip(waiting_id)
+                self.scheduler._drop_queued(self)
+            else:
+                for dependent in self._dependents.pop(task_id, []):
+                    self._skip(dependent)
+        else:
+            for dependent in self._dependents.pop(task_id, []):
+                waiting = self._waiting.get(dependent)
+                if waiting is None:
+                    continue
+                waiting.discard(task_id)
+                if not waiting:
+                    del self._waiting[dependent]
+                    self.scheduler._enqueue(self, self.subtasks[dependent])
+        
+        self._done.notify_all()
+
+
+class DAGScheduler:
+    """
+    DAG调度器
+    
+    依赖满足的子任务派发到共享线程池并发执行，同时按并发分组
+    （默认为子任务类型）限制同类子任务的并发数。同一调度器可被
+    多个调度运行共享，分组限制对所有运行生效。
+    """
+    
+    def __init__(self, max_workers: int = 4,
+                 concurrency_limits: Optional[Dict[str, int]] = None,
+                 concurrency_key: Optional[Callable[[Dict[str, Any]], str]] = None):
+        """
+        初始化调度器
+        
+        Args:
+            max_workers: 线程池大小
+            concurrency_limits: 各并发分组的并发上限，未列出的分组只受线程池限制
+            concurrency_key: 计算子任务并发分组的函数，默认使用子任务类型
+        """
+        self.max_workers = max_workers
+        self.concurrency_limits = dict(concurrency_limits or {})
+        self.concurrency_key = concurrency_key or (lambda subtask: subtask.get("type", "unknown"))
+        self._lock = threading.RLock()
+        self._ready: Dict[str, deque] = defaultdict(deque)
+        self._inflight: Dict[str, int] = defaultdict(int)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_semaphores: Dict[str, asyncio.Semaphore] = {}
+    
+    def start(self, execute_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+              stop_on_error: bool = True) -> ScheduledRun:
+        """
+        开始一次增量调度运行
+        
+        Args:
+            execute_fn: 子任务执行函数
+            stop_on_error: 子任务失败后是否停止派发新的子任务
+        
+        Returns:
+            调度运行，通过 add() 加入子任务，close() 后 wait() 获取结果
+        """
+        return ScheduledRun(self, execute_fn, stop_on_error)
+    
+    def run(self, subtasks: List[Dict[str, Any]],
+            execute_fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+            stop_on_error: bool = True, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        执行一组已按拓扑顺序排列的子任务
+        
+        Args:
+            subtasks: 子任务列表
+            execute_fn: 子任务执行函数
+            stop_on_error: 子任务失败后是否停止派发新的子任务
+            timeout: 最长等待时间（秒），超时后取消运行并返回已有结果
+        
+        Returns:
+            已执行子任务的结果列表（按输入顺序）
+        """
+        scheduled = self.start(execute_fn, stop_on_error)
+        for subtask in subtasks:
+            scheduled.add(subtask)
+        scheduled.close()
+        results = scheduled.wait(timeout)
+        if not scheduled.finished:
+            scheduled.cancel()
+        return results
+    
+    async def arun(self, subtasks: List[Dict[str, Any]],
+                   execute_fn: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                   stop_on_error: bool = True) -> List[Dict[str, Any]]:
+        """
+        在事件循环中执行一组已按拓扑顺序排列的子任务
+        
+        每个子任务对应一个协程，等待依赖完成后在分组信号量内执行。
+        
+        Args:
+            subtasks: 子任务列表
+            execute_fn: 异步子任务执行函数
+            stop_on_error: 子任务失败后是否停止派发新的子任务
+        
+        Returns:
+            已执行子任务的结果列表（按输入顺序）
+        """
+        coroutines: Dict[str, asyncio.Task] = {}
+        results: Dict[str, Dict[str, Any]] = {}
+        state = {"stopped": False}
+        
+        async def run_one(subtask: Dict[str, Any], deps: List[asyncio.Task]) -> bool:
+            if deps and not all(await asyncio.gather(*deps)):
+                return False
+            async with self._get_async_semaphore(self.concurrency_key(subtask)):
+                if state["stopped"]:
+                    return False
+                try:
+                    result = await execute_fn(subtask)
+                except Exception as e:
+                    logger.error(f"子任务执行失败: {subtask.get('id')}, 错误: {e}")
+                    result = {"status": "error", "message": str(e)}
+            results[subtask["id"]] = result
+            if result.get("status") == "error":
+                if stop_on_error:
+                    state["stopped"] = True
+                return False
+            return True
+        
+        for subtask in subtasks:
+            deps = []
+            for dep in subtask.get("dependencies", []):
+                if dep in coroutines:
+                    deps.append(coroutines[dep])
+                else:
+                    logger.warning(f"子任务 {subtask['id']} 依赖未知子任务 {dep}，已忽略")
+            coroutines[subtask["id"]] = asyncio.ensure_future(run_one(subtask, deps))
+        
+        if coroutines:
+            await asyncio.gather(*coroutines.values())
+        return [results[task_id] for task_id in coroutines if task_id in results]
+    
+    def _get_async_semaphore(self, key: str):
+        """获取分组的异步信号量，无上限的分组返回空上下文"""
+        limit = self.concurrency_limits.get(key)
+        if limit is None:
+            return _NullAsyncContext()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._async_loop is not loop:
+                self._async_loop = loop
+                self._async_semaphores = {}
+            semaphore = self._async_semaphores.get(key)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(limit)
+                self._async_semaphores[key] = semaphore
+            return semaphore
+    
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=wait)
+    
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """获取线程池（需持有锁）"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="dag-scheduler")
+        return self._pool
+    
+    def _enqueue(self, scheduled: ScheduledRun, subtask: Dict[str, Any]):
+        """子任务就绪，进入所属分组的队列（需持有锁）"""
+        key = self.concurrency_key(subtask)
+        self._ready[key].append((scheduled, subtask))
+        self._dispatch(key)
+    
+    def _drop_queued(self, scheduled: ScheduledRun):
+        """移除某次运行尚未派发的子任务（需持有锁）"""
+        for queue in self._ready.values():
+            for item in [item for item in queue if item[0] is scheduled]:
+                queue.remove(item)
+                scheduled._skip(item[1]["id"])
+    
+    def _dispatch(self, key: str):
+        """在并发上限内派发分组中的就绪子任务（需持有锁）"""
+        limit = self.concurrency_limits.get(key)
+        queue = self._ready[key]
+        while queue and (limit is None or self._inflight[key] < limit):
+            scheduled, subtask = queue.popleft()
+            self._inflight[key] += 1
+            scheduled._running += 1
+            self._get_pool().submit(self._execute, key, scheduled, subtask)
+    
+    def _execute(self, key: str, scheduled: ScheduledRun, subtask: Dict[str, Any]):
+        """在工作线程中执行子任务"""
+        start_time = time.perf_counter()
+        try:
+            result = scheduled.context.copy().run(scheduled.execute_fn, subtask)
+        except Exception as e:
+            logger.error(f"子任务执行失败: {subtask.get('id')}, 错误: {e}")
+            result = {"status": "error", "message": str(e)}
+        elapsed = time.perf_counter() - start_time
+        
+        with self._lock:
+            self._inflight[key] -= 1
+            scheduled._complete(subtask["id"], result, elapsed)
+            self._dispatch(key)
+
+
+class _NullAsyncContext:
+    """空的异步上下文管理器"""
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
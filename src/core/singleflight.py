@@ -0,0 +1,148 @@
+"""单飞（single-flight）请求合并
+
+同一键的调用在执行期间，后到的相同调用不再重复执行，而是等待
+并共享首个调用的结果。线程与协程调用方共用同一张在途表。等待者
+最多等到自己的截止时间，到期抛出 DeadlineExceeded，共享调用继续执行。
+"""
+from typing import Dict, Any, Callable, Awaitable, Hashable, Optional, Tuple
+from concurrent.futures import Future, wait
+import asyncio
+import threading
+
+from .deadline import DeadlineExceeded, current_deadline
+
+
+class _LeaderCancelled(Exception):
+    """首个调用被取消，等待者需要重新发起"""
+
+
+class SingleFlight:
+    """请求合并器"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行或合并同步调用
+        
+        Args:
+            key: 调用键
+            fn: 实际执行的函数
+        
+        Returns:
+            (结果, 是否共享了其他调用的结果)
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                return self._lead(key, future, fn), False
+            try:
+                return self._wait(future), True
+            except _LeaderCancelled:
+                continue
+    
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行或合并异步调用
+        
+        Args:
+            key: 调用键
+            fn: 返回协程的函数
+        
+        Returns:
+            (结果, 是否共享了其他调用的结果)
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                try:
+                    result = await fn()
+                except asyncio.CancelledError:
+                    self._settle(key, future, exception=_LeaderCancelled())
+                    raise
+                except BaseException as e:
+                    self._settle(key, future, exception=e)
+                    raise
+                self._settle(key, future, result=result)
+                return result, False
+            try:
+                # 等待者自身被取消（如外层 wait_for 超时）时不取消共享的 Future
+                shared = asyncio.shield(asyncio.wrap_future(future))
+                return await asyncio.wait_for(shared, self._wait_timeout()), True
+            except _LeaderCancelled:
+                continue
+            except asyncio.TimeoutError:
+                if future.done():
+                    raise
+                raise self._deadline_exceeded() from None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取合并统计
+        
+        Returns:
+            调用数、被合并数与合并比例
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls)
+        stats["coalescing_ratio"] = stats["coalesced"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
+    
+    def _join(self, key: Hashable):
+        """加入在途调用，返回 (Future, 是否为首个调用)"""
+        with self._lock:
+            self.stats["calls"] += 1
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+    
+    def _wait(self, future: Future) -> Any:
+        """等待共享的结果，不超过等待者自己的截止时间"""
+        done, _ = wait([future], timeout=self._wait_timeout())
+        if not done:
+            raise self._deadline_exceeded()
+        return future.result()
+    
+    @staticmethod
+    def _wait_timeout() -> Optional[float]:
+        """等待者当前截止时间的剩余时间，不限时返回None"""
+        deadline = current_deadline()
+        return deadline.remaining() if deadline is not None else None
+    
+    @staticmethod
+    def _deadline_exceeded() -> DeadlineExceeded:
+        """等待者的截止时间先于共享调用到期"""
+        deadline = current_deadline()
+        reason = deadline.reason if deadline is not None else None
+        return DeadlineExceeded(reason or "已超出截止时间")
+    
+    def _lead(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> Any:
+        """作为首个调用执行函数并发布结果"""
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, future, exception=e)
+            raise
+        self._settle(key, future, result=result)
+        return result
+    
+    def _settle(self, key: Hashable, future: Future, result: Any = None,
+                exception: BaseException = None):
+        """移出在途表并通知等待者"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
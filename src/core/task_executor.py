@@ -1,12 +1,34 @@
 """任务执行器"""
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import asyncio
+import functools
 import logging
 import time
 
 from .agent_manager import AgentManager
+from .deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from .scheduler import DAGScheduler
+from ..recording.artifact_store import ArtifactStore, PayloadPolicy
+from ..recording.tracing import get_tracer
 
 logger = logging.getLogger(__name__)
 
+# 子任务类型到执行智能体的映射
+SUBTASK_AGENTS = {
+    "knowledge_query": "knowledge",
+    "code_generation": "code",
+    "gui_action": "gui",
+}
+
+# 各智能体默认的子任务并发上限（GUI共享同一桌面，只能串行）
+DEFAULT_AGENT_CONCURRENCY = {
+    "gui": 1,
+}
+
+# 截止时间到期后等待子任务协作退出的宽限时间（秒）
+DEFAULT_DEADLINE_GRACE = 1.0
+
 
 class TaskExecutor:
     """任务执行器，负责任务的统一执行"""
@@ -20,11 +42,43 @@ class TaskExecutor:
         """
         self.config = config
         self.agent_manager = None  # 延迟初始化
+        self.scheduler = self._create_scheduler()
+        # 截图、长代码输出等大块内容移入产物存储，结果中只保留引用
+        self.artifacts = ArtifactStore.from_settings(config.get("artifact_store", {}))
+        self.payload_policy = PayloadPolicy.from_settings(self.artifacts, config.get("result_payload", {}))
+    
+    def _create_scheduler(self, max_workers: Optional[int] = None,
+                          agent_limits: Optional[Dict[str, int]] = None) -> DAGScheduler:
+        """
+        根据配置创建子任务调度器
+        
+        Args:
+            max_workers: 线程池大小，默认读取配置
+            agent_limits: 覆盖配置的各智能体并发上限
+        
+        Returns:
+            调度器
+        """
+        scheduler_config = self.config.get("scheduler", {})
+        concurrency_limits = dict(DEFAULT_AGENT_CONCURRENCY)
+        concurrency_limits.update(scheduler_config.get("agent_concurrency", {}))
+        concurrency_limits.update(agent_limits or {})
+        return DAGScheduler(
+            max_workers=max_workers or scheduler_config.get("max_workers", 4),
+            concurrency_limits=concurrency_limits,
+            concurrency_key=self._concurrency_key
+        )
+    
+    @staticmethod
+    def _concurrency_key(subtask: Dict[str, Any]) -> str:
+        """子任务的并发分组：按执行智能体分组"""
+        subtask_type = subtask.get("type", "unknown")
+        return SUBTASK_AGENTS.get(subtask_type, subtask_type)
     
     def _init_agent_manager(self):
         """初始化智能体管理器"""
         if self.agent_manager is None:
-            self.agent_manager = AgentManager(self.config.get("agents", {}))
+            self.agent_manager = AgentManager(self.config)
     
     def execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -32,69 +86,405 @@ class TaskExecutor:
         
         Args:
             task: 任务字典
-            
+        
+        Returns:
+            执行结果
+        """
+        return self._execute(task, self.scheduler)
+    
+    def _execute(self, task: Dict[str, Any], scheduler: DAGScheduler) -> Dict[str, Any]:
+        """
+        使用指定调度器执行任务
+        
+        Args:
+            task: 任务字典
+            scheduler: 子任务调度器
+        
         Returns:
             执行结果
         """
         self._init_agent_manager()
         
         start_time = time.time()
+        deadline = self._task_deadline(task)
         
         try:
-            # 1. 规划智能体分解任务
-            planning_agent = self.agent_manager.get_agent("planning")
-            if not planning_agent:
-                execution_time = time.time() - start_time
-                return {
-                    "status": "error",
-                    "message": "规划智能体未初始化",
-                    "execution_time": execution_time
-                }
-            
-            plan = planning_agent.decompose_task(task)
-            
-            if plan.get("status") == "error":
-                execution_time = time.time() - start_time
-                plan["execution_time"] = execution_time
-                return plan
-            
-            # 2. 执行子任务
-            results = []
-            subtasks = plan.get("subtasks", [])
-            execution_order = plan.get("execution_order", [])
-            
-            for task_id in execution_order:
-                subtask = next((t for t in subtasks if t["id"] == task_id), None)
-                if not subtask:
-                    continue
-                
-                result = self._execute_subtask(subtask)
-                results.append(result)
-                
-                # 如果子任务失败，停止执行
-                if result.get("status") == "error":
-                    break
-            
-            # 3. 评估结果
-            evaluation_agent = self.agent_manager.get_agent("evaluation")
-            evaluation = None
-            if evaluation_agent:
-                evaluation = evaluation_agent.evaluate(
-                    task,
-                    {"results": results, "steps": len(results)}
-                )
-            
+            with deadline_scope(deadline), self._task_span(task) as span:
+                return self._with_trace_id(self._execute_in_scope(task, scheduler, deadline, start_time), span)
+        except Exception as e:
+            logger.error(f"任务执行失败: {e}")
+            return {
+                "status": "error",
+                "message": str(e),
+                "execution_time": time.time() - start_time
+            }
+    
+    def _execute_in_scope(self, task: Dict[str, Any], scheduler: DAGScheduler,
+                          deadline: Optional[Deadline], start_time: float) -> Dict[str, Any]:
+        """
+        在截止时间上下文中规划、执行并评估任务
+        
+        Args:
+            task: 任务字典
+            scheduler: 子任务调度器
+            deadline: 任务截止时间
+            start_time: 任务开始时间
+        
+        Returns:
+            执行结果
+        """
+        # 1. 规划智能体分解任务
+        planning_agent = self.agent_manager.get_agent("planning")
+        if not planning_agent:
             execution_time = time.time() - start_time
-            
             return {
-                "status": "completed",
-                "plan": plan,
-                "results": results,
-                "evaluation": evaluation,
-                "steps": len(results),
+                "status": "error",
+                "message": "规划智能体未初始化",
                 "execution_time": execution_time
             }
-            
+        
+        if self.config.get("streaming_plan") and hasattr(planning_agent, "stream_plan"):
+            # 1-2. 边规划边执行：子任务一产出就加入调度
+            plan, results = self._plan_and_run(planning_agent, task, scheduler, deadline)
+        else:
+            with get_tracer().span("plan"):
+                plan = planning_agent.decompose_task(task)
+            results = None
+        
+        if plan.get("status") == "error":
+            execution_time = time.time() - start_time
+            plan["execution_time"] = execution_time
+            if results:
+                plan["results"] = results
+            return plan
+        
+        # 2. 按依赖并发执行子任务（子任务失败或截止时间到期时停止派发）
+        if results is None:
+            subtasks = self._ordered_subtasks(plan)
+            execute_fn = functools.partial(self._execute_subtask, heights=self._subtask_heights(subtasks))
+            results = scheduler.run(subtasks, execute_fn, timeout=self._wait_timeout(deadline))
+        deadline_exceeded = deadline is not None and deadline.expired
+        if deadline_exceeded:
+            deadline.cancel("任务超出时间预算")
+        
+        # 3. 评估结果，评估良好的计划记录到计划库
+        evaluation_agent = self.agent_manager.get_agent("evaluation")
+        evaluation = None
+        if evaluation_agent:
+            with deadline_scope(None), get_tracer().span("evaluate"):
+                evaluation = evaluation_agent.evaluate(
+                    task, self._execution_summary(plan, results, deadline_exceeded)
+                )
+            if hasattr(planning_agent, "record_outcome"):
+                planning_agent.record_outcome(task, plan, evaluation)
+        
+        execution_time = time.time() - start_time
+        
+        result = {
+            "status": "partial" if deadline_exceeded else "completed",
+            "plan": plan,
+            "results": results,
+            "evaluation": evaluation,
+            "steps": len(results),
+            "execution_time": execution_time
+        }
+        if deadline_exceeded:
+            result["message"] = "任务超出时间预算，返回部分结果"
+        return result
+    
+    def fetch_artifact(self, artifact_id: str) -> Optional[bytes]:
+        """
+        按ID读取结果中引用的产物
+        
+        Args:
+            artifact_id: 产物ID
+        
+        Returns:
+            产物内容，不存在时返回None
+        """
+        try:
+            return self.artifacts.read(artifact_id)
+        except ValueError as e:
+            logger.warning(f"读取产物失败: {e}")
+            return None
+    
+    @staticmethod
+    def _task_span(task: Dict[str, Any]):
+        """任务的根跨度（按采样率决定是否记录整条链路）"""
+        return get_tracer().span("task", instruction=str(task.get("instruction", ""))[:200])
+    
+    @staticmethod
+    def _subtask_span(subtask: Dict[str, Any]):
+        """子任务的跨度"""
+        return get_tracer().span("subtask", id=subtask.get("id", ""), type=subtask.get("type", "unknown"))
+    
+    @staticmethod
+    def _with_trace_id(result: Dict[str, Any], span) -> Dict[str, Any]:
+        """已采样的任务在结果中附带链路ID，用于查找链路文件"""
+        if span is not None:
+            result["trace_id"] = span.trace_id
+        return result
+    
+    def _task_deadline(self, task: Dict[str, Any]) -> Optional[Deadline]:
+        """
+        创建任务截止时间
+        
+        时间预算取任务的 timeout，其次取配置的 task_timeout；在已有截止
+        时间的上下文中执行时不会晚于外层截止时间。
+        
+        Args:
+            task: 任务字典
+        
+        Returns:
+            截止时间，不限时且没有外层截止时间时返回None
+        """
+        timeout = task.get("timeout", self.config.get("task_timeout"))
+        parent = current_deadline()
+        if timeout is None and parent is None:
+            return None
+        return Deadline(timeout, parent=parent)
+    
+    def _wait_timeout(self, deadline: Optional[Deadline]) -> Optional[float]:
+        """等待子任务的最长时间：剩余预算加上协作退出的宽限时间"""
+        remaining = deadline.remaining() if deadline is not None else None
+        if remaining is None:
+            return None
+        return remaining + self.config.get("deadline_grace", DEFAULT_DEADLINE_GRACE)
+    
+    @staticmethod
+    def _subtask_heights(subtasks: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        计算每个子任务到计划结束的最长链长度（含自身），用于切分时间预算
+        
+        Args:
+            subtasks: 按拓扑顺序排列的子任务列表
+        
+        Returns:
+            子任务ID到链长度的映射
+        """
+        heights = {subtask["id"]: 1 for subtask in subtasks}
+        for subtask in reversed(subtasks):
+            for dep in subtask.get("dependencies", []):
+                if dep in heights:
+                    heights[dep] = max(heights[dep], heights[subtask["id"]] + 1)
+        return heights
+    
+    def _subtask_deadline(self, subtask: Dict[str, Any],
+                          heights: Optional[Dict[str, int]] = None) -> Optional[Deadline]:
+        """
+        从任务截止时间中切出子任务的截止时间
+        
+        剩余预算按子任务之后的最长链平均分配：前面的子任务提前完成时，
+        节省的时间自动留给后面的子任务。配置 subtask_timeout 时再取两者
+        中较短的一个。
+        
+        Args:
+            subtask: 子任务字典
+            heights: 子任务到计划结束的最长链长度，未知时子任务可使用全部剩余预算
+        
+        Returns:
+            子截止时间，不限时返回None
+        """
+        parent = current_deadline()
+        timeout = self.config.get("subtask_timeout")
+        remaining = parent.remaining() if parent is not None else None
+        if remaining is not None:
+            share = remaining / (heights or {}).get(subtask["id"], 1)
+            timeout = share if timeout is None else min(timeout, share)
+        if parent is None and timeout is None:
+            return None
+        return Deadline(timeout, parent=parent)
+    
+    @staticmethod
+    def _deadline_result(subtask: Dict[str, Any], message: Optional[str] = None) -> Dict[str, Any]:
+        """子任务因截止时间到期未能完成时的结果"""
+        return {
+            "status": "error",
+            "reason": "deadline_exceeded",
+            "message": message or f"子任务 {subtask.get('id')} 超出截止时间"
+        }
+    
+    def _plan_and_run(self, planning_agent, task: Dict[str, Any], scheduler: DAGScheduler,
+                      deadline: Optional[Deadline] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        流式规划并增量调度，规划延迟与子任务执行重叠
+        
+        Args:
+            planning_agent: 规划智能体
+            task: 任务字典
+            scheduler: 子任务调度器
+            deadline: 任务截止时间
+        
+        Returns:
+            (执行计划, 子任务结果列表)
+        """
+        scheduled = scheduler.start(self._execute_subtask)
+        plan = None
+        try:
+            for event in planning_agent.stream_plan(task):
+                if event["event"] == "subtask":
+                    scheduled.add(event["subtask"])
+                elif event["event"] == "plan":
+                    plan = event["plan"]
+        finally:
+            scheduled.close()
+        results = scheduled.wait(self._wait_timeout(deadline))
+        if not scheduled.finished:
+            scheduled.cancel()
+        if plan is None:
+            plan = {"status": "error", "message": "规划未返回执行计划", "subtasks": []}
+        return plan, results
+    
+    def execute_many(self, tasks: Iterable[Dict[str, Any]], max_concurrency: int = 8,
+                     per_agent_limits: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        批量执行任务
+        
+        Args:
+            tasks: 任务列表
+            max_concurrency: 同时执行的最大任务数
+            per_agent_limits: 整个批次内各智能体的子任务并发上限，如 {"knowledge": 8}
+        
+        Returns:
+            包含按输入顺序排列的结果与汇总统计的字典
+        """
+        start_time = time.time()
+        results: Dict[int, Dict[str, Any]] = {}
+        
+        for index, result in self.execute_stream(tasks, max_concurrency, per_agent_limits):
+            results[index] = result
+        
+        ordered_results = [results[index] for index in range(len(results))]
+        return {
+            "results": ordered_results,
+            "summary": self._summarize_batch(ordered_results, time.time() - start_time)
+        }
+    
+    def execute_stream(self, tasks: Iterable[Dict[str, Any]], max_concurrency: int = 8,
+                       per_agent_limits: Optional[Dict[str, int]] = None
+                       ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        批量执行任务，按完成顺序逐个返回结果
+        
+        任务按需从输入中读取，同一时刻最多有 max_concurrency 个任务在执行，
+        单个任务的失败不会影响其他任务。
+        
+        Args:
+            tasks: 任务可迭代对象
+            max_concurrency: 同时执行的最大任务数
+            per_agent_limits: 整个批次内各智能体的子任务并发上限
+        
+        Yields:
+            (任务在输入中的序号, 执行结果)
+        """
+        self._init_agent_manager()
+        
+        scheduler = self._create_scheduler(
+            max_workers=max(max_concurrency, self.scheduler.max_workers),
+            agent_limits=per_agent_limits
+        )
+        task_iter = enumerate(tasks)
+        pending = {}
+        
+        try:
+            with ThreadPoolExecutor(max_workers=max_concurrency,
+                                    thread_name_prefix="task-batch") as pool:
+                for index, task in task_iter:
+                    pending[pool.submit(self._execute_isolated, task, scheduler)] = index
+                    if len(pending) >= max_concurrency:
+                        break
+                
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = pending.pop(future)
+                        next_task = next(task_iter, None)
+                        if next_task is not None:
+                            pending[pool.submit(self._execute_isolated, next_task[1], scheduler)] = next_task[0]
+                        yield index, future.result()
+        finally:
+            scheduler.shutdown(wait=False)
+    
+    def _execute_isolated(self, task: Dict[str, Any], scheduler: DAGScheduler) -> Dict[str, Any]:
+        """执行单个批量任务，异常转换为错误结果"""
+        start_time = time.time()
+        try:
+            return self._execute(task, scheduler)
+        except Exception as e:
+            logger.error(f"批量任务执行失败: {e}")
+            return {
+                "status": "error",
+                "message": str(e),
+                "execution_time": time.time() - start_time
+            }
+    
+    def _summarize_batch(self, results: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+        """
+        汇总批量执行统计
+        
+        Args:
+            results: 执行结果列表
+            wall_time: 批次总耗时（秒）
+        
+        Returns:
+            吞吐量与延迟统计；只有状态为 completed 且没有失败子任务的任务计为成功，
+            超出时间预算的任务计为 partial
+        """
+        latencies = sorted(r.get("execution_time", 0.0) for r in results)
+        partial = sum(1 for r in results if r.get("status") == "partial")
+        succeeded = sum(1 for r in results if self._succeeded(r))
+        
+        def percentile(q: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+        
+        return {
+            "total": len(results),
+            "succeeded": succeeded,
+            "partial": partial,
+            "failed": len(results) - succeeded - partial,
+            "wall_time": wall_time,
+            "throughput": len(results) / wall_time if wall_time > 0 else 0.0,
+            "latency": {
+                "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+                "p50": percentile(0.5),
+                "p90": percentile(0.9),
+                "p99": percentile(0.99),
+                "max": latencies[-1] if latencies else 0.0
+            }
+        }
+    
+    @staticmethod
+    def _succeeded(result: Dict[str, Any]) -> bool:
+        """任务是否完成且所有子任务都未失败"""
+        if result.get("status") != "completed":
+            return False
+        return not any(
+            isinstance(r, dict) and r.get("status") == "error" for r in result.get("results", [])
+        )
+    
+    async def execute_async(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步执行任务
+        
+        LLM调用使用异步客户端，其余阻塞或CPU密集的智能体工作在线程池中运行，
+        大量任务可共享同一个事件循环。
+        
+        Args:
+            task: 任务字典
+        
+        Returns:
+            执行结果
+        """
+        self._init_agent_manager()
+        
+        start_time = time.time()
+        deadline = self._task_deadline(task)
+        
+        try:
+            with deadline_scope(deadline), self._task_span(task) as span:
+                return self._with_trace_id(await self._aexecute_in_scope(task, deadline, start_time), span)
         except Exception as e:
             logger.error(f"任务执行失败: {e}")
             return {
@@ -103,13 +493,159 @@ class TaskExecutor:
                 "execution_time": time.time() - start_time
             }
     
-    def _execute_subtask(self, subtask: Dict[str, Any]) -> Dict[str, Any]:
+    async def _aexecute_in_scope(self, task: Dict[str, Any], deadline: Optional[Deadline],
+                                 start_time: float) -> Dict[str, Any]:
+        """_execute_in_scope 的异步版本"""
+        # 1. 规划智能体分解任务
+        planning_agent = await self.agent_manager.aget_agent("planning")
+        if not planning_agent:
+            execution_time = time.time() - start_time
+            return {
+                "status": "error",
+                "message": "规划智能体未初始化",
+                "execution_time": execution_time
+            }
+        
+        with get_tracer().span("plan"):
+            plan = await planning_agent.aprocess({"task": task})
+        
+        if plan.get("status") == "error":
+            execution_time = time.time() - start_time
+            plan["execution_time"] = execution_time
+            return plan
+        
+        # 2. 按依赖并发执行子任务（子任务失败或截止时间到期时停止派发）
+        subtasks = self._ordered_subtasks(plan)
+        execute_fn = functools.partial(self._aexecute_subtask, heights=self._subtask_heights(subtasks))
+        results = await self.scheduler.arun(subtasks, execute_fn)
+        deadline_exceeded = deadline is not None and deadline.expired
+        if deadline_exceeded:
+            deadline.cancel("任务超出时间预算")
+        
+        # 3. 评估结果
+        evaluation_agent = await self.agent_manager.aget_agent("evaluation")
+        evaluation = None
+        if evaluation_agent:
+            with deadline_scope(None), get_tracer().span("evaluate"):
+                evaluation = await evaluation_agent.aprocess({
+                    "task": task,
+                    "execution_result": self._execution_summary(plan, results, deadline_exceeded)
+                })
+            if hasattr(planning_agent, "record_outcome"):
+                planning_agent.record_outcome(task, plan, evaluation)
+        
+        execution_time = time.time() - start_time
+        
+        result = {
+            "status": "partial" if deadline_exceeded else "completed",
+            "plan": plan,
+            "results": results,
+            "evaluation": evaluation,
+            "steps": len(results),
+            "execution_time": execution_time
+        }
+        if deadline_exceeded:
+            result["message"] = "任务超出时间预算，返回部分结果"
+        return result
+    
+    def _record_subtask_timing(self, subtask: Dict[str, Any], result: Dict[str, Any],
+                               execution_time: float):
+        """
+        更新执行智能体的统计，并把成功子任务的耗时反馈给规划智能体的耗时估计器
+        
+        Args:
+            subtask: 子任务字典
+            result: 执行结果
+            execution_time: 耗时（秒）
+        """
+        success = result.get("status") != "error"
+        agent_name = SUBTASK_AGENTS.get(subtask.get("type", "unknown"))
+        agent = self.agent_manager.agents.get(agent_name) if agent_name else None
+        if agent is not None:
+            agent.update_statistics(success, execution_time)
+        
+        # 因截止时间提前结束的子任务耗时不完整，不用于耗时估计
+        planning_agent = self.agent_manager.agents.get("planning")
+        if success and result.get("status") != "partial" and planning_agent is not None and hasattr(planning_agent, "record_timing"):
+            planning_agent.record_timing(subtask, agent_name, execution_time)
+    
+    def _execution_summary(self, plan: Dict[str, Any], results: List[Dict[str, Any]],
+                           deadline_exceeded: bool = False) -> Dict[str, Any]:
+        """
+        汇总子任务执行情况，供评估智能体使用
+        
+        Args:
+            plan: 执行计划
+            results: 子任务结果列表
+            deadline_exceeded: 任务是否超出时间预算
+        
+        Returns:
+            包含整体状态、结果与步数的字典
+        """
+        succeeded = sum(1 for r in results if r.get("status") not in ("error", "partial"))
+        partial = any(r.get("status") == "partial" for r in results)
+        if succeeded == len(plan.get("subtasks", [])) and not deadline_exceeded:
+            status = "completed"
+        elif succeeded or partial:
+            status = "partial"
+        else:
+            status = "failed"
+        return {"status": status, "results": results, "steps": len(results),
+                "deadline_exceeded": deadline_exceeded}
+    
+    def _ordered_subtasks(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        按执行顺序排列计划中的子任务
+        
+        Args:
+            plan: 执行计划
+        
+        Returns:
+            子任务列表
+        """
+        subtasks_by_id = {t["id"]: t for t in plan.get("subtasks", [])}
+        return [
+            subtasks_by_id[task_id]
+            for task_id in plan.get("execution_order", [])
+            if task_id in subtasks_by_id
+        ]
+    
+    def _execute_subtask(self, subtask: Dict[str, Any],
+                         heights: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        在子任务截止时间内执行子任务并记录耗时
+        
+        结果中的大块内容按负载策略移入产物存储。
+        
+        Args:
+            subtask: 子任务字典
+            heights: 子任务到计划结束的最长链长度，用于切分时间预算
+        
+        Returns:
+            执行结果
+        """
+        deadline = self._subtask_deadline(subtask, heights)
+        if deadline is not None and deadline.expired:
+            return self._deadline_result(subtask)
+        
+        start_time = time.perf_counter()
+        with deadline_scope(deadline), self._subtask_span(subtask) as span:
+            try:
+                result = self.payload_policy.slim(self._run_subtask(subtask))
+            except DeadlineExceeded as e:
+                result = self._deadline_result(subtask, str(e))
+            if span is not None:
+                span.set_attribute("status", result.get("status", ""))
+        self._record_subtask_timing(subtask, result, time.perf_counter() - start_time)
+        return result
+    
+    def _run_subtask(self, subtask: Dict[str, Any]) -> Dict[str, Any]:
         """
         执行子任务
         
         Args:
             subtask: 子任务字典
-            
+        
         Returns:
             执行结果
         """
@@ -119,17 +655,17 @@ class TaskExecutor:
         logger.info(f"执行子任务: {description} (类型: {subtask_type})")
         
         if subtask_type == "knowledge_query":
-            knowledge_agent = self.agent_manager.get_agent("knowledge")
+            knowledge_agent = self.agent_manager.get_agent(SUBTASK_AGENTS[subtask_type])
             if knowledge_agent:
                 return knowledge_agent.retrieve(description)
         
         elif subtask_type == "code_generation":
-            code_agent = self.agent_manager.get_agent("code")
+            code_agent = self.agent_manager.get_agent(SUBTASK_AGENTS[subtask_type])
             if code_agent:
                 return code_agent.generate_code(subtask)
         
         elif subtask_type == "gui_action":
-            gui_agent = self.agent_manager.get_agent("gui")
+            gui_agent = self.agent_manager.get_agent(SUBTASK_AGENTS[subtask_type])
             if gui_agent:
                 # 执行GUI任务
                 gui_task = {
@@ -142,4 +678,71 @@ class TaskExecutor:
             "status": "error",
             "message": f"未知的子任务类型: {subtask_type}"
         }
-
+    
+    async def _aexecute_subtask(self, subtask: Dict[str, Any],
+                                heights: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        在子任务截止时间内异步执行子任务并记录耗时
+        
+        到期后不再等待子任务（线程池中的阻塞工作会在下一个检查点退出）。
+        
+        Args:
+            subtask: 子任务字典
+            heights: 子任务到计划结束的最长链长度，用于切分时间预算
+        
+        Returns:
+            执行结果
+        """
+        deadline = self._subtask_deadline(subtask, heights)
+        if deadline is not None and deadline.expired:
+            return self._deadline_result(subtask)
+        
+        start_time = time.perf_counter()
+        with deadline_scope(deadline), self._subtask_span(subtask) as span:
+            try:
+                timeout = deadline.remaining() if deadline is not None else None
+                result = self.payload_policy.slim(await asyncio.wait_for(self._arun_subtask(subtask), timeout))
+            except (DeadlineExceeded, asyncio.TimeoutError) as e:
+                if deadline is not None:
+                    deadline.cancel("子任务超出截止时间")
+                result = self._deadline_result(subtask, str(e) or None)
+            if span is not None:
+                span.set_attribute("status", result.get("status", ""))
+        self._record_subtask_timing(subtask, result, time.perf_counter() - start_time)
+        return result
+    
+    async def _arun_subtask(self, subtask: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        异步执行子任务
+        
+        Args:
+            subtask: 子任务字典
+        
+        Returns:
+            执行结果
+        """
+        subtask_type = subtask.get("type", "unknown")
+        description = subtask.get("description", "")
+        
+        logger.info(f"执行子任务: {description} (类型: {subtask_type})")
+        
+        agent_name = SUBTASK_AGENTS.get(subtask_type)
+        agent = await self.agent_manager.aget_agent(agent_name) if agent_name else None
+        
+        if agent and subtask_type == "knowledge_query":
+            return await agent.run_in_executor(agent.retrieve, description)
+        
+        elif agent and subtask_type == "code_generation":
+            return await agent.agenerate_code(subtask)
+        
+        elif agent and subtask_type == "gui_action":
+            gui_task = {
+                "instruction": description,
+                "max_steps": self.config.get("max_steps", 10)
+            }
+            return await agent.run_in_executor(agent.execute_task, gui_task)
+        
+        return {
+            "status": "error",
+            "message": f"未知的子任务类型: {subtask_type}"
+        }
@@ -23,7 +23,7 @@ class TaskPlanner:
     def _init_agent_manager(self):
         """初始化智能体管理器"""
         if self.agent_manager is None:
-            self.agent_manager = AgentManager(self.config.get("agents", {}))
+            self.agent_manager = AgentManager(self.config)
     
     def plan(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """
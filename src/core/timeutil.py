@@ -0,0 +1,72 @@
+"""时间范围查询工具
+
+消息总线回放与记忆查询共用：时间边界的解析，以及在按时间排序的
+历史条目（元组，下标 1 为秒级时间戳）中二分查找。二分查找需要
+O(1) 随机访问，历史保存在 TimeRing 中而不是 deque。
+"""
+from typing import Optional, Union
+from datetime import datetime
+from itertools import islice
+
+TimeBound = Union[None, float, datetime, str]
+
+
+def to_epoch(value: TimeBound) -> Optional[float]:
+    """把时间边界（时间戳、datetime 或 ISO 字符串）转换为秒级时间戳"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def bisect_time(entries, ts: float) -> int:
+    """在按时间排序的历史条目中查找第一个时间不早于 ts 的位置"""
+    low, high = 0, len(entries)
+    while low < high:
+        middle = (low + high) // 2
+        if entries[middle][1] < ts:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+class TimeRing:
+    """按下标随机访问的先进先出序列：出队只移动队首偏移，空位过半时整体压缩，均摊 O(1)"""
+    
+    __slots__ = ("_items", "_head")
+    
+    def __init__(self):
+        self._items: list = []
+        self._head = 0
+    
+    def append(self, item):
+        self._items.append(item)
+    
+    def popleft(self):
+        item = self._items[self._head]
+        self._items[self._head] = None
+        self._head += 1
+        if self._head * 2 >= len(self._items):
+            del self._items[:self._head]
+            self._head = 0
+        return item
+    
+    def clear(self):
+        self._items.clear()
+        self._head = 0
+    
+    def __getitem__(self, index):
+        """按下标取元素；切片（非负起止）返回列表副本"""
+        if isinstance(index, slice):
+            start = self._head + (index.start or 0)
+            stop = len(self._items) if index.stop is None else self._head + index.stop
+            return self._items[start:stop]
+        return self._items[self._head + index]
+    
+    def __iter__(self):
+        return islice(self._items, self._head, None)
+    
+    def __len__(self) -> int:
+        return len(self._items) - self._head
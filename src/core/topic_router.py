@@ -0,0 +1,174 @@
+"""层级主题路由
+
+主题按 "." 分为多级（如 task.42.completed）。订阅模式中 "*" 匹配
+恰好一级，"#" 匹配零级或多级。模式存放在前缀树中，发布时按主题
+逐级匹配；每个具体主题的匹配结果会被缓存，订阅变更时整体失效，
+因此稳定运行时的路由只需一次字典查找。
+"""
+from typing import Dict, Any, List, Tuple
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "."
+SINGLE_WILDCARD = "*"
+MULTI_WILDCARD = "#"
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """
+    判断具体主题是否匹配订阅模式
+    
+    Args:
+        pattern: 订阅模式
+        topic: 具体主题
+    
+    Returns:
+        是否匹配
+    """
+    return _match_levels(pattern.split(SEPARATOR), 0, topic.split(SEPARATOR), 0)
+
+
+def _match_levels(pattern: List[str], i: int, levels: List[str], j: int) -> bool:
+    """逐级匹配模式与主题"""
+    while i < len(pattern):
+        if pattern[i] == MULTI_WILDCARD:
+            return any(_match_levels(pattern, i + 1, levels, k) for k in range(j, len(levels) + 1))
+        if j >= len(levels) or (pattern[i] != SINGLE_WILDCARD and pattern[i] != levels[j]):
+            return False
+        i, j = i + 1, j + 1
+    return j == len(levels)
+
+
+class _Node:
+    """前缀树节点"""
+    
+    __slots__ = ("children", "values")
+    
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # (注册序号, 值)，按注册顺序排列
+        self.values: List[Tuple[int, Any]] = []
+
+
+class TopicRouter:
+    """基于前缀树的主题路由器，支持 * 与 # 通配符并缓存具体主题的匹配结果"""
+    
+    def __init__(self, cache_size: int = 4096):
+        """
+        初始化路由器
+        
+        Args:
+            cache_size: 最多缓存多少个具体主题的匹配结果
+        """
+        self.cache_size = max(0, cache_size)
+        self._root = _Node()
+        self._order = 0
+        self._cache: Dict[str, Tuple[Any, ...]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+    
+    def add(self, pattern: str, value: Any):
+        """
+        注册订阅模式
+        
+        Args:
+            pattern: 订阅模式
+            value: 匹配时返回的值
+        """
+        with self._lock:
+            node = self._root
+            for level in pattern.split(SEPARATOR):
+                node = node.children.setdefault(level, _Node())
+            self._order += 1
+            node.values.append((self._order, value))
+            self._cache = {}
+    
+    def remove(self, pattern: str, value: Any) -> bool:
+        """
+        注销订阅模式
+        
+        Args:
+            pattern: 订阅模式
+            value: 注册时的值
+        
+        Returns:
+            是否找到并注销
+        """
+        with self._lock:
+            path = [self._root]
+            for level in pattern.split(SEPARATOR):
+                node = path[-1].children.get(level)
+                if node is None:
+                    return False
+                path.append(node)
+            values = path[-1].values
+            remaining = [item for item in values if item[1] is not value]
+            if len(remaining) == len(values):
+                return False
+            path[-1].values = remaining
+            # 删除不再使用的分支
+            levels = pattern.split(SEPARATOR)
+            for depth in range(len(levels), 0, -1):
+                node = path[depth]
+                if node.values or node.children:
+                    break
+                del path[depth - 1].children[levels[depth - 1]]
+            self._cache = {}
+            return True
+    
+    def route(self, topic: str) -> Tuple[Any, ...]:
+        """
+        查找匹配具体主题的全部值
+        
+        Args:
+            topic: 具体主题
+        
+        Returns:
+            按注册顺序排列的值
+        """
+        cached = self._cache.get(topic)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+        
+        with self._lock:
+            self.stats["misses"] += 1
+            found: Dict[int, Any] = {}
+            self._collect(self._root, topic.split(SEPARATOR), 0, found)
+            result = tuple(found[order] for order in sorted(found))
+            if self.cache_size:
+                if len(self._cache) >= self.cache_size:
+                    # 淘汰最早缓存的主题
+                    del self._cache[next(iter(self._cache))]
+                self._cache[topic] = result
+            return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取路由统计
+        
+        Returns:
+            缓存命中/未命中次数与缓存大小
+        """
+        stats = dict(self.stats)
+        stats["cached_topics"] = len(self._cache)
+        return stats
+    
+    def _collect(self, node: _Node, levels: List[str], i: int, found: Dict[int, Any]):
+        """收集从第 i 级起匹配的节点上的值"""
+        multi = node.children.get(MULTI_WILDCARD)
+        if multi is not None:
+            # "#" 匹配零级或多级
+            for k in range(i, len(levels) + 1):
+                self._collect(multi, levels, k, found)
+        if i == len(levels):
+            found.update(node.values)
+            return
+        child = node.children.get(levels[i])
+        if child is not None:
+            self._collect(child, levels, i + 1, found)
+        single = node.children.get(SINGLE_WILDCARD)
+        if single is not None:
+            self._collect(single, levels, i + 1, found)
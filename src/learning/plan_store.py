@@ -0,0 +1,343 @@
+"""计划库
+
+记录评估良好的执行计划，相同或近似的指令再次出现时直接复用。
+指令先按归一化文本精确查找，未命中时按向量相似度查找最近邻
+（默认使用字符n-gram向量，可选 sentence-transformers）。
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from collections import Counter, defaultdict
+import copy
+import difflib
+import importlib.util
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 默认计划库配置
+DEFAULT_PLAN_STORE_SETTINGS = {
+    "enabled": True,
+    "path": ":memory:",
+    "similarity_threshold": 0.8,
+    "min_score": 0.8,  # 评估完成度达到该分数的计划才会被记录
+    "max_entries": 1000,
+    "embedder": "ngram",  # ngram | sentence_transformers
+    "model": "paraphrase-multilingual-MiniLM-L12-v2",
+}
+
+_PUNCTUATION = re.compile(r"[\s，,。.!！?？;；:：、\"'“”‘’()（）]+")
+_CJK_SPACE = re.compile(r"\s*([^\x00-\x7f])\s*")
+_WORD = re.compile(r"[a-z0-9_]+|[^a-z0-9_\s]")
+
+
+def normalize_instruction(instruction: str) -> str:
+    """
+    归一化指令：转小写、去除标点，英文单词之间保留一个空格
+    
+    Args:
+        instruction: 用户指令
+    
+    Returns:
+        归一化后的文本
+    """
+    text = _PUNCTUATION.sub(" ", instruction.lower()).strip()
+    return _CJK_SPACE.sub(r"\1", text)
+
+
+def adapt_plan(plan: Dict[str, Any], source: str, target: str) -> Dict[str, Any]:
+    """
+    将为 source 指令生成的计划改写为 target 指令的计划
+    
+    对两条指令做字符级对比，把 source 中被替换的片段在子任务描述中
+    替换为 target 中对应的片段（如 "搜索Python教程" -> "搜索Java教程"）。
+    
+    Args:
+        plan: 原计划
+        source: 原指令
+        target: 新指令
+    
+    Returns:
+        改写后的计划副本
+    """
+    adapted = copy.deepcopy(plan)
+    replacements = []
+    matcher = difflib.SequenceMatcher(None, source, target, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        old = source[i1:i2].strip()
+        if op == "replace" and old:
+            replacements.append((old, target[j1:j2].strip()))
+    
+    for subtask in adapted.get("subtasks", []):
+        description = subtask.get("description", "")
+        for old, new in replacements:
+            description = description.replace(old, new)
+        subtask["description"] = description
+    return adapted
+
+
+class NgramEmbedder:
+    """字符n-gram稀疏向量：中文按字与相邻字对，英文与数字按单词"""
+    
+    def __init__(self, max_n: int = 2):
+        self.max_n = max_n
+    
+    def embed(self, text: str) -> Dict[str, float]:
+        """
+        计算归一化的稀疏向量
+        
+        Args:
+            text: 归一化后的文本
+        
+        Returns:
+            特征到权重的映射（L2范数为1）
+        """
+        tokens = _WORD.findall(text)
+        counts = Counter()
+        for n in range(1, self.max_n + 1):
+            for i in range(len(tokens) - n + 1):
+                counts["".join(tokens[i:i + n])] += 1
+        norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+        return {feature: value / norm for feature, value in counts.items()}
+
+
+class _SparseIndex:
+    """稀疏向量的倒排索引，只对共享特征的条目计算余弦相似度"""
+    
+    def __init__(self, embedder: NgramEmbedder):
+        self.embedder = embedder
+        self._vectors: Dict[str, Dict[str, float]] = {}
+        self._postings: Dict[str, set] = defaultdict(set)
+    
+    def add(self, key: str, text: str):
+        self.remove(key)
+        vector = self.embedder.embed(text)
+        self._vectors[key] = vector
+        for feature in vector:
+            self._postings[feature].add(key)
+    
+    def remove(self, key: str):
+        vector = self._vectors.pop(key, None)
+        for feature in vector or ():
+            postings = self._postings.get(feature)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._postings[feature]
+    
+    def nearest(self, text: str) -> Tuple[Optional[str], float]:
+        query = self.embedder.embed(text)
+        scores: Dict[str, float] = defaultdict(float)
+        for feature, weight in query.items():
+            for key in self._postings.get(feature, ()):
+                scores[key] += weight * self._vectors[key][feature]
+        if not scores:
+            return None, 0.0
+        key = max(scores, key=scores.get)
+        return key, scores[key]
+
+
+class _DenseIndex:
+    """sentence-transformers 稠密向量的暴力最近邻索引"""
+    
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        import numpy
+        
+        self._numpy = numpy
+        self._model = SentenceTransformer(model_name)
+        self._keys: List[str] = []
+        self._matrix = None
+    
+    def _embed(self, text: str):
+        return self._model.encode([text], normalize_embeddings=True)[0]
+    
+    def add(self, key: str, text: str):
+        self.remove(key)
+        vector = self._embed(text)[None, :]
+        self._keys.append(key)
+        self._matrix = vector if self._matrix is None else self._numpy.vstack([self._matrix, vector])
+    
+    def remove(self, key: str):
+        if key not in self._keys:
+            return
+        index = self._keys.index(key)
+        del self._keys[index]
+        self._matrix = self._numpy.delete(self._matrix, index, axis=0) if self._keys else None
+    
+    def nearest(self, text: str) -> Tuple[Optional[str], float]:
+        if self._matrix is None:
+            return None, 0.0
+        scores = self._matrix @ self._embed(text)
+        index = int(scores.argmax())
+        return self._keys[index], float(scores[index])
+
+
+class PlanStore:
+    """SQLite支持的计划库"""
+    
+    def __init__(self, path: str = ":memory:", similarity_threshold: float = 0.8,
+                 min_score: float = 0.8, max_entries: int = 1000,
+                 embedder: str = "ngram", model: Optional[str] = None):
+        """
+        初始化计划库
+        
+        Args:
+            path: SQLite数据库路径，":memory:" 表示仅内存
+            similarity_threshold: 近似查找的最低相似度
+            min_score: 记录计划所需的最低评估分数
+            max_entries: 最多保存的计划数，超过后淘汰最久未使用的计划
+            embedder: 向量化方式，ngram 或 sentence_transformers
+            model: sentence-transformers 模型名称
+        """
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.min_score = min_score
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._index = self._create_index(embedder, model)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_store ("
+            "key TEXT PRIMARY KEY, instruction TEXT, plan TEXT, score REAL, "
+            "uses INTEGER, created REAL, last_used REAL)"
+        )
+        self._conn.commit()
+        for (key,) in self._conn.execute("SELECT key FROM plan_store").fetchall():
+            self._index.add(key, key)
+        self.stats = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "records": 0,
+            "evictions": 0,
+        }
+    
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "PlanStore":
+        """根据配置创建计划库"""
+        merged = dict(DEFAULT_PLAN_STORE_SETTINGS)
+        merged.update(settings)
+        return cls(merged["path"], merged["similarity_threshold"], merged["min_score"],
+                   merged["max_entries"], merged["embedder"], merged["model"])
+    
+    @staticmethod
+    def _create_index(embedder: str, model: Optional[str]):
+        """创建向量索引，sentence-transformers 未安装时退回n-gram"""
+        if embedder == "sentence_transformers":
+            if importlib.util.find_spec("sentence_transformers") is not None:
+                return _DenseIndex(model or DEFAULT_PLAN_STORE_SETTINGS["model"])
+            logger.warning("sentence_transformers 未安装，计划库使用n-gram向量")
+        return _SparseIndex(NgramEmbedder())
+    
+    def record(self, instruction: str, plan: Dict[str, Any], score: float) -> bool:
+        """
+        记录评估良好的计划
+        
+        Args:
+            instruction: 用户指令
+            plan: 执行计划
+            score: 评估分数（0-1）
+        
+        Returns:
+            是否已记录
+        """
+        key = normalize_instruction(instruction)
+        if not key or score < self.min_score or plan.get("status") != "success" or not plan.get("subtasks"):
+            return False
+        
+        stored = {name: value for name, value in plan.items()
+                  if name not in ("execution_time", "results", "planner_tier", "reused_from", "similarity")}
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT uses, created FROM plan_store WHERE key = ?", (key,)).fetchone()
+            uses, created = row if row else (0, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plan_store VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, instruction, json.dumps(stored, ensure_ascii=False), score, uses, created, now)
+            )
+            self._index.add(key, key)
+            self.stats["records"] += 1
+            self._evict()
+            self._conn.commit()
+        return True
+    
+    def lookup(self, instruction: str) -> Optional[Dict[str, Any]]:
+        """
+        查找可复用的计划
+        
+        Args:
+            instruction: 用户指令
+        
+        Returns:
+            包含 plan、instruction（原指令）、similarity、exact 的字典，
+            没有足够相似的计划时返回None
+        """
+        key = normalize_instruction(instruction)
+        if not key:
+            return None
+        
+        with self._lock:
+            self.stats["lookups"] += 1
+            exact = True
+            similarity = 1.0
+            row = self._fetch(key)
+            if row is None:
+                exact = False
+                key, similarity = self._index.nearest(key)
+                if key is None or similarity < self.similarity_threshold:
+                    return None
+                row = self._fetch(key)
+                if row is None:
+                    return None
+            self.stats["exact_hits" if exact else "similar_hits"] += 1
+            self._conn.execute("UPDATE plan_store SET uses = uses + 1, last_used = ? WHERE key = ?",
+                               (time.time(), key))
+            self._conn.commit()
+        
+        return {
+            "plan": json.loads(row[1]),
+            "instruction": row[0],
+            "similarity": similarity,
+            "exact": exact
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取计划库统计
+        
+        Returns:
+            查找次数、精确/近似命中次数、命中率与条目数
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM plan_store").fetchone()[0]
+        hits = stats["exact_hits"] + stats["similar_hits"]
+        stats["hit_rate"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+    
+    def _fetch(self, key: str) -> Optional[Tuple[str, str]]:
+        """读取 (原指令, 计划JSON)（需持有锁）"""
+        return self._conn.execute("SELECT instruction, plan FROM plan_store WHERE key = ?", (key,)).fetchone()
+    
+    def _evict(self):
+        """淘汰最久未使用的计划直到不超过上限（需持有锁）"""
+        count = self._conn.execute("SELECT COUNT(*) FROM plan_store").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        rows = self._conn.execute(
+            "SELECT key FROM plan_store ORDER BY last_used LIMIT ?", (count - self.max_entries,)
+        ).fetchall()
+        for (key,) in rows:
+            self._conn.execute("DELETE FROM plan_store WHERE key = ?", (key,))
+            self._index.remove(key)
+            self.stats["evictions"] += 1
@@ -0,0 +1,199 @@
+"""执行耗时估计
+
+按子任务类型与执行智能体在线记录耗时分布，并沿计划依赖图的
+关键路径给出整个计划的 p50/p95 耗时估计。计划的 p95 由各子任务
+耗时分布抽样得到的完成时间分布计算，而不是各子任务 p95 之和
+（后者只是上界，计划越长越偏大）。
+"""
+from typing import Dict, Any, List, Optional, Tuple
+import math
+import random
+import threading
+
+from ..core.latency import LatencyHistogram
+
+# 默认估计器配置
+DEFAULT_ESTIMATOR_SETTINGS = {
+    "min_samples": 5,  # 样本数不足时退回更粗的分组或先验
+    "prior_p50": 5.0,  # 无任何样本时单个子任务的耗时先验（秒）
+    "prior_p95": 15.0,
+    "samples": 1000,  # 估计计划 p95 时的抽样次数
+}
+
+# 标准正态分布的 0.95 分位，用于由先验的 p50/p95 得到对数正态分布
+_Z95 = 1.6449
+
+
+class ExecutionTimeEstimator:
+    """执行耗时估计器"""
+    
+    def __init__(self, min_samples: int = 5, prior_p50: float = 5.0, prior_p95: float = 15.0,
+                 samples: int = 1000):
+        """
+        初始化估计器
+        
+        Args:
+            min_samples: 使用某个分组分布所需的最少样本数
+            prior_p50: 无样本时单个子任务的 p50 先验（秒）
+            prior_p95: 无样本时单个子任务的 p95 先验（秒）
+            samples: 估计计划 p95 时的抽样次数
+        """
+        self.min_samples = min_samples
+        self.prior = (prior_p50, prior_p95)
+        self.samples = max(1, samples)
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._agents: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "ExecutionTimeEstimator":
+        """根据配置创建估计器"""
+        merged = dict(DEFAULT_ESTIMATOR_SETTINGS)
+        merged.update(settings)
+        return cls(merged["min_samples"], merged["prior_p50"], merged["prior_p95"], merged["samples"])
+    
+    def observe(self, subtask_type: str, agent: Optional[str], seconds: float):
+        """
+        记录一次子任务耗时
+        
+        Args:
+            subtask_type: 子任务类型
+            agent: 执行智能体名称
+            seconds: 耗时（秒）
+        """
+        self._histogram(("type", subtask_type)).record(seconds)
+        if agent:
+            self._agents[subtask_type] = agent
+            self._histogram(("agent", agent)).record(seconds)
+        self._histogram(("all", "")).record(seconds)
+    
+    def estimate_subtask(self, subtask: Dict[str, Any], agent: Optional[str] = None) -> Tuple[float, float]:
+        """
+        估计单个子任务的耗时
+        
+        依次使用子任务类型、执行智能体、全部子任务的分布，样本不足时
+        退回下一级，最后使用先验。
+        
+        Args:
+            subtask: 子任务字典
+            agent: 执行智能体名称，默认使用观测到的该类型子任务的执行智能体
+        
+        Returns:
+            (p50, p95) 秒
+        """
+        histogram = self._distribution(subtask, agent)
+        if histogram is None:
+            return self.prior
+        return histogram.percentile(0.5), histogram.percentile(0.95)
+    
+    def estimate_plan(self, subtasks: List[Dict[str, Any]],
+                      agents: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        估计计划耗时：依赖图上的最长路径
+        
+        p50 与关键路径按各子任务的 p50 计算；p95 是计划完成时间的 0.95
+        分位：从各子任务的耗时分布（无样本时为由先验得到的对数正态分布）
+        抽样，沿依赖图计算每次抽样的完成时间后取分位。
+        
+        Args:
+            subtasks: 按拓扑顺序排列、带 dependencies 的子任务列表
+            agents: 子任务类型到执行智能体的映射，默认使用观测到的映射
+        
+        Returns:
+            包含 p50、p95 与关键路径（按 p50 计算）的字典
+        """
+        agents = agents or {}
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        sampled: Dict[str, List[float]] = {}
+        # 固定种子，相同的分布得到相同的估计
+        rng = random.Random(0)
+        
+        for subtask in subtasks:
+            histogram = self._distribution(subtask, agents.get(subtask.get("type")))
+            if histogram is None:
+                p50 = self.prior[0]
+                draws = self._sample_prior(rng)
+            else:
+                p50 = histogram.percentile(0.5)
+                draws = histogram.quantiles([rng.random() for _ in range(self.samples)])
+            start, parent = 0.0, None
+            starts = [0.0] * self.samples
+            for dep in subtask.get("dependencies", []):
+                if dep not in finish:
+                    continue
+                if finish[dep] > start:
+                    start, parent = finish[dep], dep
+                starts = [max(a, b) for a, b in zip(starts, sampled[dep])]
+            finish[subtask["id"]] = start + p50
+            previous[subtask["id"]] = parent
+            sampled[subtask["id"]] = [a + b for a, b in zip(starts, draws)]
+        
+        if not finish:
+            return {"p50": 0.0, "p95": 0.0, "critical_path": []}
+        
+        last = max(finish, key=finish.get)
+        path = []
+        while last is not None:
+            path.append(last)
+            last = previous[last]
+        path.reverse()
+        
+        makespans = sorted(max(values) for values in zip(*sampled.values()))
+        p50 = max(finish.values())
+        p95 = makespans[max(1, math.ceil(0.95 * len(makespans))) - 1]
+        return {
+            "p50": p50,
+            "p95": max(p50, p95),
+            "critical_path": path
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取各分组的耗时分布摘要
+        
+        Returns:
+            {"type": {...}, "agent": {...}, "all": {...}}
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+        stats: Dict[str, Any] = {"type": {}, "agent": {}}
+        for (kind, name), histogram in histograms.items():
+            if kind == "all":
+                stats["all"] = histogram.summary()
+            else:
+                stats[kind][name] = histogram.summary()
+        return stats
+    
+    def _distribution(self, subtask: Dict[str, Any], agent: Optional[str]) -> Optional[LatencyHistogram]:
+        """按子任务类型、执行智能体、全部子任务的顺序选择样本足够的分布，都不足时返回None"""
+        subtask_type = subtask.get("type", "unknown")
+        agent = agent or self._agents.get(subtask_type)
+        keys = [("type", subtask_type)]
+        if agent:
+            keys.append(("agent", agent))
+        keys.append(("all", ""))
+        
+        with self._lock:
+            histograms = [self._histograms.get(key) for key in keys]
+        for histogram in histograms:
+            if histogram is not None and histogram.count >= self.min_samples:
+                return histogram
+        return None
+    
+    def _sample_prior(self, rng: random.Random) -> List[float]:
+        """从中位数与 0.95 分位等于先验的对数正态分布抽样"""
+        p50, p95 = self.prior
+        if p50 <= 0:
+            return [0.0] * self.samples
+        sigma = math.log(p95 / p50) / _Z95 if p95 > p50 else 0.0
+        return [rng.lognormvariate(math.log(p50), sigma) for _ in range(self.samples)]
+    
+    def _histogram(self, key: Tuple[str, str]) -> LatencyHistogram:
+        """获取分组的直方图"""
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self._histograms[key] = histogram
+            return histogram
@@ -0,0 +1,256 @@
+"""产物存储
+
+截图、代码输出等较大的产物按内容哈希保存在磁盘上，相同内容只存一份。
+任务结果中只保留引用（产物ID、大小、类型与文本预览），需要时再按ID
+读取，使返回给界面的结果保持在KB级别。
+"""
+from typing import Dict, Any, Optional, Union
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+
+from ..core.blob_store import BlobHandle, get_blob_store, open_blob
+
+logger = logging.getLogger(__name__)
+
+# 默认产物存储配置
+DEFAULT_ARTIFACT_STORE_SETTINGS = {
+    "directory": None,  # 存放目录，None表示临时目录下的 manus-artifacts
+    "max_bytes": 1024 * 1024 * 1024,  # 总大小上限，超过后删除最久未访问的产物
+}
+
+# 默认结果负载策略
+DEFAULT_RESULT_PAYLOAD_SETTINGS = {
+    "inline_bytes": 4096,  # 不超过该大小的二进制数据保留在结果中
+    "inline_chars": 16384,  # 不超过该长度的文本保留在结果中
+    "preview_chars": 200,  # 移出结果的文本保留的预览长度
+}
+
+BinaryData = Union[bytes, bytearray, memoryview]
+
+
+def is_artifact_ref(value: Any) -> bool:
+    """是否为产物引用"""
+    return isinstance(value, dict) and "artifact_id" in value and "content_type" in value
+
+
+class ArtifactStore:
+    """按内容哈希去重的产物存储"""
+    
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        初始化产物存储，已有的产物会被重新统计
+        
+        Args:
+            directory: 存放目录
+            max_bytes: 总大小上限
+        """
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "manus-artifacts")
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._bytes = sum(
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory) if name.endswith(".bin")
+        )
+        self.stats = {"puts": 0, "deduplicated": 0, "fetches": 0, "evicted": 0}
+    
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "ArtifactStore":
+        """根据配置创建产物存储"""
+        merged = dict(DEFAULT_ARTIFACT_STORE_SETTINGS)
+        merged.update(settings)
+        return cls(merged["directory"], merged["max_bytes"])
+    
+    def put(self, data: BinaryData, content_type: str = "application/octet-stream") -> Dict[str, Any]:
+        """
+        保存产物
+        
+        Args:
+            data: 字节数据
+            content_type: 数据类型
+        
+        Returns:
+            产物引用 {"artifact_id", "size", "content_type"}
+        """
+        view = memoryview(data)
+        artifact_id = hashlib.sha256(view).hexdigest()[:32]
+        path = self._path(artifact_id)
+        
+        with self._lock:
+            self.stats["puts"] += 1
+            if os.path.exists(path):
+                self.stats["deduplicated"] += 1
+                os.utime(path)
+            else:
+                # 先写临时文件再改名，读取方不会看到写了一半的产物
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(view)
+                os.replace(tmp_path, path)
+                with open(self._meta_path(artifact_id), "w", encoding="utf-8") as f:
+                    json.dump({"content_type": content_type, "size": view.nbytes}, f)
+                self._bytes += view.nbytes
+                self._evict(keep=artifact_id)
+        return {"artifact_id": artifact_id, "size": view.nbytes, "content_type": content_type}
+    
+    def open(self, artifact_id: str) -> Optional[memoryview]:
+        """
+        只读映射产物
+        
+        Args:
+            artifact_id: 产物ID
+        
+        Returns:
+            memoryview，产物不存在时返回None
+        """
+        try:
+            with open(self._path(artifact_id), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return memoryview(b"")
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        self.stats["fetches"] += 1
+        return memoryview(mapped)
+    
+    def read(self, artifact_id: str) -> Optional[bytes]:
+        """
+        读取产物内容
+        
+        Args:
+            artifact_id: 产物ID
+        
+        Returns:
+            字节数据，产物不存在时返回None
+        """
+        view = self.open(artifact_id)
+        return None if view is None else bytes(view)
+    
+    def info(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取产物信息
+        
+        Args:
+            artifact_id: 产物ID
+        
+        Returns:
+            产物引用，产物不存在时返回None
+        """
+        try:
+            with open(self._meta_path(artifact_id), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return {"artifact_id": artifact_id, "size": meta["size"], "content_type": meta["content_type"]}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取存储统计
+        
+        Returns:
+            保存、去重、读取、淘汰次数与总字节数
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["bytes"] = self._bytes
+        return stats
+    
+    def _path(self, artifact_id: str) -> str:
+        """产物文件路径（ID只含十六进制字符，不会越出目录）"""
+        if not artifact_id or any(c not in "0123456789abcdef" for c in artifact_id):
+            raise ValueError(f"无效的产物ID: {artifact_id}")
+        return os.path.join(self.directory, f"{artifact_id}.bin")
+    
+    def _meta_path(self, artifact_id: str) -> str:
+        """产物信息文件路径"""
+        return self._path(artifact_id)[:-len(".bin")] + ".json"
+    
+    def _evict(self, keep: str):
+        """超过总大小上限时删除最久未访问的产物"""
+        if self._bytes <= self.max_bytes:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin") and name[:-len(".bin")] != keep:
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        for _, size, path in sorted(entries):
+            if self._bytes <= self.max_bytes:
+                break
+            for victim in (path, path[:-len(".bin")] + ".json"):
+                try:
+                    os.unlink(victim)
+                except FileNotFoundError:
+                    pass
+            self._bytes -= size
+            self.stats["evicted"] += 1
+
+
+class PayloadPolicy:
+    """结果负载策略：把结果中的大块二进制数据、数据句柄与长文本移入产物存储"""
+    
+    def __init__(self, store: ArtifactStore, inline_bytes: int = 4096,
+                 inline_chars: int = 16384, preview_chars: int = 200):
+        """
+        初始化策略
+        
+        Args:
+            store: 产物存储
+            inline_bytes: 保留在结果中的二进制数据大小上限
+            inline_chars: 保留在结果中的文本长度上限
+            preview_chars: 移出结果的文本保留的预览长度
+        """
+        self.store = store
+        self.inline_bytes = inline_bytes
+        self.inline_chars = inline_chars
+        self.preview_chars = preview_chars
+    
+    @classmethod
+    def from_settings(cls, store: ArtifactStore, settings: Dict[str, Any]) -> "PayloadPolicy":
+        """根据配置创建策略"""
+        merged = dict(DEFAULT_RESULT_PAYLOAD_SETTINGS)
+        merged.update(settings)
+        return cls(store, merged["inline_bytes"], merged["inline_chars"], merged["preview_chars"])
+    
+    def slim(self, value: Any) -> Any:
+        """
+        返回替换了大块内容的结果（不修改原结果）
+        
+        数据句柄的内容保存后释放句柄。
+        
+        Args:
+            value: 结果（字典、列表或其中的值）
+        
+        Returns:
+            精简后的结果
+        """
+        if isinstance(value, dict):
+            return {key: self.slim(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.slim(item) for item in value]
+        if type(value) is tuple:
+            return tuple(self.slim(item) for item in value)
+        if isinstance(value, BlobHandle):
+            view = open_blob(value)
+            if view is None:
+                return {"artifact_id": None, "size": value.size, "content_type": value.content_type,
+                        "message": "数据已被释放"}
+            ref = self.store.put(view, value.content_type)
+            get_blob_store().release(value)
+            return ref
+        if isinstance(value, (bytes, bytearray, memoryview)) and memoryview(value).nbytes > self.inline_bytes:
+            return self.store.put(value)
+        if isinstance(value, str) and len(value) > self.inline_chars:
+            ref = self.store.put(value.encode("utf-8"), "text/plain; charset=utf-8")
+            ref["preview"] = value[:self.preview_chars]
+            return ref
+        return value
@@ -0,0 +1,407 @@
+"""执行链路追踪
+
+任务 → 子任务 → 智能体操作 → LLM/工具调用 各记录为一个跨度（span），
+当前跨度通过 contextvars 向下传递：调度器与 run_in_executor 在工作线程中
+复制调用方的上下文，asyncio 任务创建时也会复制，因此线程池与异步代码中
+的跨度都能挂到正确的父跨度下。
+
+采样在根跨度处决定：未采样的链路只在上下文中放一个标记，其下的跨度
+直接返回空操作，开销只有一次 ContextVar 读取。根跨度结束后，整条链路
+可导出为 Chrome trace-event JSON（chrome://tracing、Perfetto）与
+OTLP/JSON 文件。
+"""
+from typing import Dict, Any, List, Optional, Iterable
+from collections import OrderedDict
+from contextvars import ContextVar
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 默认追踪配置
+DEFAULT_TRACING_SETTINGS = {
+    "sample_rate": 0.0,  # 根跨度的采样率（0~1），0表示关闭追踪
+    "directory": None,  # 链路文件输出目录，None表示只保留在内存中
+    "formats": ("chrome", "otlp"),  # 输出格式
+    "max_traces": 100,  # 内存中保留的最近链路条数
+    "service_name": "manus-ai-system",  # OTLP 中的服务名
+}
+
+# 未采样链路在上下文中的标记
+_UNSAMPLED = object()
+
+_current_span: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """一次操作的跨度，作为上下文管理器使用"""
+    
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start_ns", "end_ns", "thread_id", "status", "message", "_perf_ns", "_token")
+    
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any]):
+        """
+        初始化跨度
+        
+        Args:
+            tracer: 所属的追踪器
+            name: 跨度名称
+            trace_id: 链路ID（32位十六进制）
+            parent_id: 父跨度ID，根跨度为None
+            attributes: 属性
+        """
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.thread_id = 0
+        self.status = "ok"
+        self.message: Optional[str] = None
+        self._perf_ns = 0
+        self._token = None
+    
+    def set_attribute(self, key: str, value: Any):
+        """设置属性"""
+        self.attributes[key] = value
+    
+    @property
+    def duration(self) -> float:
+        """耗时（秒），未结束时为0"""
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns else 0.0
+    
+    def __enter__(self) -> "Span":
+        self.thread_id = threading.get_ident()
+        self.start_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+        self._token = _current_span.set(self)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        # 墙上时钟只取开始时刻，耗时用单调时钟计算
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._perf_ns)
+        if exc_type is not None:
+            self.status = "error"
+            self.message = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self._token = None
+        self.tracer._finish(self)
+        return False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可 JSON 序列化的字典"""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "thread_id": self.thread_id,
+            "status": self.status,
+            "message": self.message,
+            "attributes": dict(self.attributes),
+        }
+    
+    def __repr__(self) -> str:
+        return f"Span({self.name!r}, trace_id={self.trace_id!r}, duration={self.duration:.6f})"
+
+
+class _Scope:
+    """不记录的跨度（未采样或追踪关闭），只维护上下文中的标记"""
+    
+    __slots__ = ("marker", "_token")
+    
+    def __init__(self, marker: Any):
+        self.marker = marker
+        self._token = None
+    
+    def __enter__(self) -> None:
+        self._token = _current_span.set(self.marker)
+        return None
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        return False
+
+
+class _NoopScope:
+    """未采样链路内的子跨度，不修改上下文"""
+    
+    __slots__ = ()
+    
+    def __enter__(self) -> None:
+        return None
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP = _NoopScope()
+
+
+def current_span() -> Optional[Span]:
+    """获取当前跨度，未采样或不在链路中时返回None"""
+    span = _current_span.get()
+    return span if isinstance(span, Span) else None
+
+
+class Tracer:
+    """按根跨度采样、在内存中汇集链路并导出的追踪器"""
+    
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """
+        初始化追踪器
+        
+        Args:
+            settings: 追踪配置，未提供的项使用 DEFAULT_TRACING_SETTINGS
+        """
+        merged = dict(DEFAULT_TRACING_SETTINGS)
+        merged.update(settings or {})
+        self.settings = merged
+        self.sample_rate = merged["sample_rate"]
+        self.directory = merged["directory"]
+        self.formats = tuple(merged["formats"])
+        self.max_traces = merged["max_traces"]
+        self.service_name = merged["service_name"]
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        # 进行中的链路：链路ID -> 已结束的跨度
+        self._active: Dict[str, List[Span]] = {}
+        # 已完成的链路（按完成顺序，超过上限时丢弃最早的）
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"sampled": 0, "unsampled": 0, "spans": 0, "late_spans": 0}
+    
+    def span(self, name: str, **attributes):
+        """
+        创建跨度
+        
+        不在链路中时作为根跨度并决定是否采样；父链路未采样时返回空操作。
+        子跨度总是记录到父跨度所属的追踪器，追踪器被替换时进行中的链路不会丢失。
+        
+        Args:
+            name: 跨度名称，如 task、subtask、PlanningAgent.llm
+            **attributes: 属性
+        
+        Returns:
+            上下文管理器，进入后得到 Span（未采样时为None）
+        """
+        parent = _current_span.get()
+        if parent is _UNSAMPLED:
+            return _NOOP
+        if parent is not None:
+            return Span(parent.tracer, name, parent.trace_id, parent.span_id, attributes)
+        
+        if self.sample_rate <= 0.0 or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            self.stats["unsampled"] += 1  # 未采样路径不加锁，计数为近似值
+            return _Scope(_UNSAMPLED)
+        trace_id = f"{random.getrandbits(128):032x}"
+        with self._lock:
+            self._active[trace_id] = []
+            self.stats["sampled"] += 1
+        return Span(self, name, trace_id, None, attributes)
+    
+    def get_trace(self, trace_id: str) -> Optional[List[Span]]:
+        """
+        获取已完成的链路
+        
+        Args:
+            trace_id: 链路ID
+        
+        Returns:
+            按开始时间排列的跨度，链路不存在或未完成时返回None
+        """
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            return None if spans is None else sorted(spans, key=lambda span: span.start_ns)
+    
+    def recent_traces(self) -> List[str]:
+        """最近完成的链路ID（从旧到新）"""
+        with self._lock:
+            return list(self._traces)
+    
+    def write_trace(self, trace_id: str, directory: Optional[str] = None) -> Dict[str, str]:
+        """
+        把链路写入文件
+        
+        Args:
+            trace_id: 链路ID
+            directory: 输出目录，默认为配置的目录
+        
+        Returns:
+            格式 -> 文件路径
+        """
+        spans = self.get_trace(trace_id)
+        directory = directory or self.directory
+        if spans is None or not directory:
+            return {}
+        os.makedirs(directory, exist_ok=True)
+        paths = {}
+        for fmt in self.formats:
+            if fmt == "chrome":
+                document = to_chrome_trace(spans)
+            elif fmt == "otlp":
+                document = to_otlp(spans, self.service_name)
+            else:
+                logger.warning(f"未知的链路输出格式: {fmt}")
+                continue
+            path = os.path.join(directory, f"{trace_id}.{fmt}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(document, f, ensure_ascii=False, default=str)
+            paths[fmt] = path
+        return paths
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取追踪统计
+        
+        Returns:
+            采样/未采样的链路数、记录的跨度数、链路完成后才结束的跨度数
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["active_traces"] = len(self._active)
+            stats["completed_traces"] = len(self._traces)
+        return stats
+    
+    def _finish(self, span: Span):
+        """记录结束的跨度；根跨度结束时链路完成并写入文件"""
+        with self._lock:
+            self.stats["spans"] += 1
+            spans = self._active.get(span.trace_id)
+            if spans is None:
+                # 链路已完成（如对冲请求中被放弃的调用），归入已完成的链路
+                completed = self._traces.get(span.trace_id)
+                if completed is not None:
+                    completed.append(span)
+                self.stats["late_spans"] += 1
+                return
+            spans.append(span)
+            if span.parent_id is not None:
+                return
+            del self._active[span.trace_id]
+            self._traces[span.trace_id] = spans
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        if self.directory:
+            try:
+                self.write_trace(span.trace_id)
+            except OSError as e:
+                logger.warning(f"写入链路文件失败: {e}")
+
+
+def to_chrome_trace(spans: Iterable[Span]) -> Dict[str, Any]:
+    """
+    转换为 Chrome trace-event 格式（完整事件 "X"，时间单位为微秒）
+    
+    Args:
+        spans: 跨度
+    
+    Returns:
+        可直接在 chrome://tracing 或 Perfetto 中打开的字典
+    """
+    pid = os.getpid()
+    events = []
+    for span in spans:
+        args = dict(span.attributes)
+        args.update(trace_id=span.trace_id, span_id=span.span_id, parent_id=span.parent_id)
+        if span.status != "ok":
+            args["error"] = span.message
+        events.append({
+            "name": span.name,
+            "cat": span.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": span.start_ns / 1000,
+            "dur": (span.end_ns - span.start_ns) / 1000,
+            "pid": pid,
+            "tid": span.thread_id,
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """转换为 OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: Iterable[Span], service_name: str = "manus-ai-system") -> Dict[str, Any]:
+    """
+    转换为 OTLP/JSON 格式（ExportTraceServiceRequest）
+    
+    Args:
+        spans: 跨度
+        service_name: 服务名
+    
+    Returns:
+        可由 OpenTelemetry Collector 的 otlpjsonfile 接收器读取的字典
+    """
+    otlp_spans = []
+    for span in spans:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.message} if span.status != "ok" else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        otlp_spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}],
+        }]
+    }
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """获取进程内共享的追踪器（首次调用时使用默认配置创建，默认不采样）"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def configure_tracer(settings: Dict[str, Any]) -> Tracer:
+    """
+    使用指定配置重建共享的追踪器，配置未变化时沿用当前追踪器
+    
+    Args:
+        settings: 追踪配置
+    
+    Returns:
+        共享的追踪器
+    """
+    global _tracer
+    merged = dict(DEFAULT_TRACING_SETTINGS)
+    merged.update(settings)
+    with _tracer_lock:
+        if _tracer is None or _tracer.settings != merged:
+            _tracer = Tracer(settings)
+        return _tracer
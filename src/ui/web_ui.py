@@ -1,5 +1,4 @@
 """Web用户界面"""
-import gradio as gr
 import logging
 import os
 from typing import Dict, Any
@@ -23,7 +22,7 @@ class ManusAIWebUI:
     def __init__(self):
         """初始化Web界面"""
         self.config = self._load_config()
-        self.agent_manager = AgentManager(self.config.get("agents", {}))
+        self.agent_manager = AgentManager(self.config)
         self.task_planner = TaskPlanner(self.config)
         self.task_executor = TaskExecutor(self.config)
     
@@ -108,6 +107,8 @@ class ManusAIWebUI:
     
     def create_interface(self):
         """创建Gradio界面"""
+        import gradio as gr
+        
         with gr.Blocks(title="Manus AI 代理系统") as interface:
             gr.Markdown("""
             # 🤖 Manus AI 代理系统
@@ -0,0 +1,106 @@
+"""本地 OpenAI 兼容桩服务，用于LLM网关测试与基准"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+
+
+class StubLLMServer:
+    """
+    OpenAI 兼容的 Chat Completions 桩服务
+    
+    Args:
+        reply: 根据请求体生成回复文本的函数，默认回显最后一条消息
+        delay: 根据请求序号返回响应延迟（秒）的函数
+    """
+    
+    def __init__(self, reply: Optional[Callable[[dict], str]] = None,
+                 delay: Optional[Callable[[int], float]] = None):
+        self.reply = reply or (lambda body: "echo: " + body["messages"][-1]["content"])
+        self.delay = delay or (lambda index: 0.0)
+        self.requests: List[dict] = []
+        self.client_ports = set()
+        self.rate_limit_next = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def _handler_class(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, *args):
+                pass
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    index = len(stub.requests)
+                    stub.requests.append(body)
+                    stub.client_ports.add(self.client_address[1])
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    limited = stub.rate_limit_next > 0
+                    if limited:
+                        stub.rate_limit_next -= 1
+                try:
+                    if limited:
+                        self._send(429, b"{}", {"Retry-After": "0.05"})
+                        return
+                    time.sleep(stub.delay(index))
+                    content = stub.reply(body)
+                    if body.get("stream"):
+                        self._send_stream(content)
+                    else:
+                        payload = json.dumps({
+                            "choices": [{"message": {"role": "assistant", "content": content}}],
+                            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+                        }).encode("utf-8")
+                        self._send(200, payload)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+            
+            def _send(self, status, payload, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def _send_stream(self, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = [content[i:i + 8] for i in range(0, len(content), 8)] + [None]
+                for piece in pieces:
+                    data = "[DONE]" if piece is None else json.dumps(
+                        {"choices": [{"delta": {"content": piece}}]}, ensure_ascii=False)
+                    chunk = f"data: {data}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+        
+        return Handler
@@ -36,8 +36,11 @@ def test_agent_manager_initialization():
     
     manager = AgentManager(config)
     
-    assert "planning" in manager.agents
+    # 智能体延迟构造
+    assert "planning" not in manager.agents
+    assert "planning" in manager.get_agent_names()
     assert manager.get_agent("planning") is not None
+    assert "planning" in manager.agents
 
 
 def test_agent_manager_get_agent():
@@ -74,3 +77,61 @@ def test_agent_manager_status():
     status = manager.get_agent_status()
     assert isinstance(status, dict)
 
+
+
+def test_agent_manager_lazy_once():
+    """测试并发首次访问只构造一次"""
+    import threading
+    from src.core import agent_manager as agent_manager_module
+    from src.agents.base_agent import BaseAgent
+    
+    created = []
+    
+    class CountingAgent(BaseAgent):
+        def __init__(self, config):
+            super().__init__("CountingAgent", config)
+            created.append(self)
+        
+        def process(self, input_data):
+            return {"status": "success"}
+    
+    original = agent_manager_module.AGENT_CLASSES["planning"]
+    agent_manager_module.AGENT_CLASSES["planning"] = CountingAgent
+    try:
+        manager = AgentManager({"agents": {"planning": {}}})
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(manager.get_agent("planning")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        agent_manager_module.AGENT_CLASSES["planning"] = original
+    
+    assert len(created) == 1
+    assert all(agent is created[0] for agent in results)
+
+
+def test_agent_manager_warmup():
+    """测试预加载智能体"""
+    config = {"agents": {"planning": {"openai_api_key": None}}}
+    manager = AgentManager(config)
+    
+    assert manager.get_agent_status()["planning"]["state"] == "unloaded"
+    
+    loaded = manager.warmup()
+    
+    assert "planning" in loaded
+    assert manager.get_agent_status()["planning"]["state"] == "idle"
+
+
+def test_agent_manager_warmup_accepts_generator():
+    """测试以生成器传入名称时也返回已加载的智能体"""
+    manager = AgentManager({"agents": {"planning": {"openai_api_key": None}}})
+    
+    loaded = manager.warmup(name for name in ["planning"])
+    
+    assert list(loaded) == ["planning"]
@@ -0,0 +1,53 @@
+"""测试产物存储与结果负载策略"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.recording.artifact_store import ArtifactStore, PayloadPolicy, is_artifact_ref
+
+
+def test_put_deduplicates_and_fetches(tmp_path):
+    """测试相同内容只保存一份，可按ID读取"""
+    store = ArtifactStore(str(tmp_path))
+    first = store.put(b"abc" * 1000, "image/png")
+    second = store.put(b"abc" * 1000, "image/png")
+    
+    assert first == second and is_artifact_ref(first)
+    assert store.read(first["artifact_id"]) == b"abc" * 1000
+    assert store.info(first["artifact_id"])["content_type"] == "image/png"
+    assert store.read("0" * 32) is None
+    stats = store.get_stats()
+    assert stats["deduplicated"] == 1 and stats["bytes"] == 3000
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    """测试超过总大小上限时删除最久未访问的产物"""
+    import os
+    import time
+    store = ArtifactStore(str(tmp_path), max_bytes=250)
+    old = store.put(b"a" * 100)
+    path = tmp_path / f"{old['artifact_id']}.bin"
+    os.utime(path, (time.time() - 60, time.time() - 60))
+    store.put(b"b" * 100)
+    store.put(b"c" * 100)
+    
+    assert store.read(old["artifact_id"]) is None
+    assert store.get_stats()["evicted"] == 1
+
+
+def test_policy_slims_large_values(tmp_path):
+    """测试大块二进制数据与长文本被替换为引用，小数据保留且原结果不变"""
+    policy = PayloadPolicy(ArtifactStore(str(tmp_path)), inline_bytes=16, inline_chars=50, preview_chars=10)
+    code = "print('hello')\n" * 20
+    result = {"status": "success", "code": code, "icon": b"x" * 8,
+              "files": [{"content": b"y" * 100}]}
+    
+    slim = policy.slim(result)
+    
+    assert slim["status"] == "success" and slim["icon"] == b"x" * 8
+    assert slim["code"]["preview"] == code[:10]
+    assert policy.store.read(slim["code"]["artifact_id"]).decode("utf-8") == code
+    assert is_artifact_ref(slim["files"][0]["content"])
+    assert result["code"] == code
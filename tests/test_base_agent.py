@@ -68,3 +68,57 @@ def test_base_agent_statistics():
     assert agent.statistics["tasks_failed"] == 1
     assert agent.statistics["average_time"] == 1.5
 
+
+
+def test_base_agent_aprocess():
+    """测试默认异步处理在线程池中运行process"""
+    import asyncio
+    
+    agent = TestAgent("TestAgent", {})
+    
+    result = asyncio.run(agent.aprocess({"test": "data"}))
+    
+    assert result["status"] == "success"
+    assert result["data"]["test"] == "data"
+
+
+def test_memory_backend_from_config(tmp_path):
+    """测试按配置选择记忆后端并查询记忆"""
+    config = {"memory": {"backend": "sqlite", "path": str(tmp_path / "agent.db")}, "max_memory": 5}
+    agent = TestAgent("TestAgent", config)
+    item = {"type": "recommendation", "content": "推荐书籍"}
+    
+    record = agent.add_to_memory(item)
+    
+    assert "timestamp" in record and "timestamp" not in item
+    assert agent.search_memory(type="recommendation", keyword="书籍")[0]["content"] == "推荐书籍"
+    assert len(TestAgent("TestAgent", config).memory) == 1
+    
+    agent.reset()
+    assert len(agent.memory) == 0
+
+
+def test_operation_latency_percentiles_and_merge():
+    """测试按操作记录延迟分位数，并跨智能体、跨进程合并"""
+    from src.core.latency import LatencyRecorder
+    
+    first = TestAgent("First", {})
+    second = TestAgent("Second", {})
+    for seconds in [0.01] * 98 + [1.0, 2.0]:
+        first.latency.record("llm", seconds)
+    with second.measure("retrieve"):
+        pass
+    second.update_statistics(True, 0.5)
+    
+    latency = first.get_status()["latency"]["llm"]
+    assert latency["count"] == 100
+    assert latency["p50"] == pytest.approx(0.01, rel=0.1)
+    assert latency["p99"] == pytest.approx(1.0, rel=0.1)
+    
+    # 其他工作进程的统计以字典形式传回后合并
+    merged = LatencyRecorder.from_dict(first.latency.to_dict())
+    merged.merge(second.latency)
+    summary = merged.summary()
+    assert set(summary) == {"llm", "retrieve", "task"}
+    assert summary["llm"]["p99"] == latency["p99"]
+    assert merged.histogram("llm").cumulative_counts([0.05, 1.5, 10.0]) == [98, 99, 100]
@@ -0,0 +1,73 @@
+"""测试共享数据存储"""
+import os
+import pickle
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.blob_store import BlobHandle, BlobStore, open_blob
+from src.core.bus_transport import _encode_payload, decode_batch, encode_batch
+
+
+def test_put_open_and_refcount(tmp_path):
+    """测试写入后零复制读取，引用计数到0时删除数据"""
+    store = BlobStore({"directory": str(tmp_path)})
+    handle = store.put(b"\x89PNG" + b"x" * 1000, content_type="image/png")
+    
+    view = open_blob(handle)
+    assert isinstance(view, memoryview) and view.readonly
+    assert bytes(view[:4]) == b"\x89PNG" and len(view) == handle.size == 1004
+    
+    store.retain(handle)
+    assert not store.release(handle)
+    assert store.release(handle)
+    assert not os.path.exists(handle.path)
+    # 已映射的视图在文件删除后仍可读取
+    assert bytes(view[-1:]) == b"x"
+    assert open_blob(handle) is None
+    assert store.get_stats()["blobs"] == 0
+
+
+def test_eviction_over_budget(tmp_path):
+    """测试总大小超过上限时淘汰最早写入的数据"""
+    store = BlobStore({"directory": str(tmp_path), "max_bytes": 250})
+    handles = [store.put(bytes([i]) * 100) for i in range(3)]
+    
+    assert not os.path.exists(handles[0].path)
+    assert bytes(open_blob(handles[2])[:1]) == b"\x02"
+    stats = store.get_stats()
+    assert stats["evicted"] == 1 and stats["bytes"] == 200
+    store.close()
+    assert not os.path.exists(handles[2].path)
+
+
+def test_handle_survives_pickle_and_bus_framing(tmp_path):
+    """测试句柄经 pickle 与消息总线帧编码后仍指向同一数据"""
+    store = BlobStore({"directory": str(tmp_path)})
+    handle = store.put(b"payload")
+    
+    assert pickle.loads(pickle.dumps(handle)) == handle
+    body = encode_batch([("gui.observation", _encode_payload({"screenshot": handle, "step": 1}))])
+    [(topic, payload)] = decode_batch(body)
+    assert isinstance(payload["screenshot"], BlobHandle)
+    assert bytes(open_blob(payload["screenshot"])) == b"payload"
+    store.close()
+
+
+def test_reconfigure_keeps_live_blobs(tmp_path):
+    """测试重复配置时沿用同一存储，替换存储时不删除仍被持有的数据"""
+    from src.core.blob_store import configure_blob_store
+    
+    settings = {"directory": str(tmp_path / "first")}
+    try:
+        store = configure_blob_store(settings)
+        handle = store.put(b"screenshot")
+        assert configure_blob_store(dict(settings)) is store
+        
+        assert configure_blob_store({"directory": str(tmp_path / "second")}) is not store
+        assert bytes(open_blob(handle)) == b"screenshot"
+        assert store.release(handle)
+    finally:
+        configure_blob_store({})
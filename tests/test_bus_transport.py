@@ -0,0 +1,131 @@
+"""测试消息总线跨进程传输"""
+import pytest
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.bus_transport import BusHub, BusLink, decode_batch, encode_batch
+from src.core.message_bus import MessageBus
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def wait_until(condition, timeout=5.0):
+    """轮询等待条件成立"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_batch_framing_roundtrip():
+    """测试发布帧编码与解码"""
+    records = [("task.1.completed", b'{"index":1}'), ("中文.主题", '{"text":"你好"}'.encode("utf-8"))]
+    assert decode_batch(encode_batch(records)) == [("task.1.completed", {"index": 1}), ("中文.主题", {"text": "你好"})]
+
+
+def test_hub_and_links_route_by_subscription(tmp_path):
+    """测试经 Unix 域套接字在多个总线之间按订阅转发，且不回传给来源"""
+    hub_bus, bus_a, bus_b = MessageBus(), MessageBus(), MessageBus()
+    hub = BusHub(hub_bus, str(tmp_path / "bus.sock"))
+    on_hub, on_a, on_b = [], [], []
+    hub_bus.subscribe("task.#", on_hub.append)
+    bus_a.subscribe("task.*.completed", on_a.append)
+    link_a = BusLink(bus_a, hub.address)
+    link_b = BusLink(bus_b, hub.address)
+    bus_b.subscribe("task.*.completed", on_b.append)
+    assert wait_until(lambda: sum(len(p.patterns) for p in hub.peers) == 2)
+    
+    bus_a.publish_many([("task.1.completed", {"index": 1}), ("task.1.failed", {"index": 2})])
+    hub_bus.publish("task.2.completed", {"index": 3})
+    bus_b.publish("other", {"index": 4})
+    
+    assert wait_until(lambda: len(on_hub) == 3 and len(on_b) == 2 and len(on_a) == 2)
+    time.sleep(0.05)
+    # 不同来源之间不保证先后顺序，同一来源内保持发布顺序
+    assert sorted(m["index"] for m in on_hub) == [1, 2, 3]
+    assert sorted(m["index"] for m in on_a) == [1, 3]
+    assert sorted(m["index"] for m in on_b) == [1, 3]
+    
+    link_a.close()
+    link_b.close()
+    hub.close()
+
+
+def test_unsubscribe_stops_forwarding(tmp_path):
+    """测试远端退订后集线器不再转发该模式的消息"""
+    hub_bus, bus_a = MessageBus(), MessageBus()
+    hub = BusHub(hub_bus, str(tmp_path / "bus.sock"))
+    link = BusLink(bus_a, hub.address)
+    received = []
+    first = bus_a.subscribe("task.*", received.append)
+    second = bus_a.subscribe("task.*", received.append)
+    assert wait_until(lambda: hub.peers and "task.*" in hub.peers[0].patterns)
+    
+    bus_a.unsubscribe(first)
+    hub_bus.publish("task.1", {"index": 1})
+    assert wait_until(lambda: len(received) == 1)
+    
+    bus_a.unsubscribe(second)
+    assert wait_until(lambda: not hub.peers[0].patterns)
+    hub_bus.publish("task.2", {"index": 2})
+    time.sleep(0.1)
+    assert [m["index"] for m in received] == [1]
+    assert hub.peers[0].connection.stats["messages_sent"] == 1
+    
+    link.close()
+    hub.close()
+
+
+def test_link_from_another_process_over_tcp():
+    """测试另一个进程经 localhost TCP 连接并批量发布"""
+    bus = MessageBus()
+    hub = BusHub(bus, ("127.0.0.1", 0))
+    received = []
+    bus.subscribe("worker.*", received.append)
+    
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {str(PROJECT_ROOT)!r})
+        from src.core.bus_transport import BusLink
+        from src.core.message_bus import MessageBus
+        bus = MessageBus()
+        link = BusLink(bus, ("127.0.0.1", {hub.address[1]}))
+        bus.publish_many([("worker.result", {{"index": i}}) for i in range(100)])
+        link.close()
+    """)
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=30)
+    
+    assert wait_until(lambda: len(received) == 100)
+    assert [m["index"] for m in received] == list(range(100))
+    assert wait_until(lambda: not hub.peers)
+    hub.close()
+
+
+def test_second_listener_in_process_links_to_existing_hub(tmp_path):
+    """测试同一进程中重复在同一地址监听时连接到已有的中心"""
+    from src.core.bus_transport import open_transport
+    
+    settings = {"listen": str(tmp_path / "bus.sock")}
+    first_bus, second_bus = MessageBus(), MessageBus()
+    hub = open_transport(first_bus, settings)
+    link = open_transport(second_bus, settings)
+    assert isinstance(hub, BusHub) and isinstance(link, BusLink)
+    
+    received = []
+    first_bus.subscribe("task.*", received.append)
+    second_bus.publish("task.1", {"index": 1})
+    assert wait_until(lambda: len(received) == 1)
+    
+    link.close()
+    hub.close()
+    # 原中心关闭后可重新监听
+    new_hub = open_transport(MessageBus(), settings)
+    assert isinstance(new_hub, BusHub) and new_hub is not hub
+    new_hub.close()
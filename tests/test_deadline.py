@@ -0,0 +1,87 @@
+"""测试截止时间与协作式取消"""
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.deadline import (Deadline, DeadlineExceeded, check_deadline,
+                               current_deadline, deadline_scope)
+from src.core.scheduler import DAGScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_child_deadline_never_outlives_parent():
+    """测试子截止时间不晚于父截止时间，取消会向下传递"""
+    clock = FakeClock()
+    parent = Deadline(10.0, clock=clock)
+    assert parent.child(30.0).remaining() == pytest.approx(10.0)
+    child = parent.child(4.0)
+    assert child.remaining() == pytest.approx(4.0)
+    assert Deadline().remaining() is None
+    
+    clock.now += 5.0
+    assert child.expired and not parent.expired
+    with pytest.raises(DeadlineExceeded):
+        child.check()
+    
+    sibling = parent.child()
+    parent.cancel("用户取消")
+    assert sibling.cancelled and sibling.reason == "用户取消"
+    assert parent.child(1.0).expired
+
+
+def test_deadline_sleep_wakes_on_cancel():
+    """测试等待中的截止时间被取消后立即返回"""
+    deadline = Deadline(10.0)
+    threading.Timer(0.05, deadline.cancel).start()
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        deadline.sleep(5.0)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_scheduler_propagates_deadline_to_workers():
+    """测试调度器在工作线程中使用调用方的截止时间"""
+    scheduler = DAGScheduler(max_workers=2)
+    deadline = Deadline(5.0)
+    
+    def execute(subtask):
+        return {"status": "success", "deadline": current_deadline()}
+    
+    with deadline_scope(deadline):
+        results = scheduler.run([{"id": "task_1", "dependencies": []}], execute)
+        check_deadline()
+    assert results[0]["deadline"] is deadline
+    assert current_deadline() is None
+
+
+def test_scheduler_run_timeout_cancels_pending_subtasks():
+    """测试等待超时后取消尚未派发的子任务并返回已有结果"""
+    scheduler = DAGScheduler(max_workers=2)
+    
+    def execute(subtask):
+        if subtask["id"] == "task_1":
+            time.sleep(0.5)
+        return {"status": "success", "id": subtask["id"]}
+    
+    subtasks = [
+        {"id": "task_0", "dependencies": []},
+        {"id": "task_1", "dependencies": []},
+        {"id": "task_2", "dependencies": ["task_1"]},
+    ]
+    start = time.perf_counter()
+    results = scheduler.run(subtasks, execute, timeout=0.2)
+    assert time.perf_counter() - start < 0.4
+    assert [r["id"] for r in results] == ["task_0"]
+    time.sleep(0.4)
+    scheduler.shutdown()
@@ -6,6 +6,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.agents.gui_agent import GUIAgent, ActionParser
+from src.core.blob_store import get_blob_store
 
 
 def test_gui_agent_initialization():
@@ -21,6 +22,19 @@ def test_gui_agent_initialization():
     assert agent.state == "idle"
 
 
+def test_think_reads_screenshot_handle():
+    """测试思考步骤从数据存储句柄读取截图"""
+    agent = GUIAgent({"openai_api_key": "test_key"})
+    agent.vl_model = object()  # 思考步骤当前不调用模型，只需已初始化
+    handle = get_blob_store().put(b"\x89PNG fake", content_type="image/png")
+    
+    result = agent.think({"status": "success", "screenshot": handle}, "点击按钮")
+    
+    assert result["status"] == "success"
+    assert result["actions"]
+    assert get_blob_store().release(handle)
+
+
 def test_action_parser():
     """测试动作解析器"""
     parser = ActionParser()
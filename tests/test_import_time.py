@@ -0,0 +1,50 @@
+"""测试导入耗时回归"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+from bench_import_time import heavy_imports, measure, parse_importtime
+
+
+def test_parse_importtime():
+    """测试解析 -X importtime 输出"""
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   src.core.agent_manager\n"
+        "import time:        80 |        200 | src.core\n"
+    )
+    
+    entries = parse_importtime(stderr)
+    
+    assert entries == [("src.core.agent_manager", 120, 120), ("src.core", 80, 200)]
+
+
+@pytest.mark.parametrize("module", ["src.agents", "src.core", "src.ui.cli", "src.ui.web_ui"])
+def test_entry_modules_skip_heavy_imports(module):
+    """测试入口模块不会提前加载重量级依赖"""
+    entries = measure(module)
+    
+    assert any(name == module for name, _, _ in entries)
+    assert heavy_imports(entries) == []
+
+
+def test_lazy_package_attributes():
+    """测试包级属性按需加载"""
+    code = (
+        "import sys, src.agents, src.core\n"
+        "assert 'src.agents.gui_agent' not in sys.modules\n"
+        "from src.core import TaskExecutor\n"
+        "assert 'src.agents.gui_agent' not in sys.modules\n"
+        "from src.agents import PlanningAgent\n"
+        "assert PlanningAgent.__name__ == 'PlanningAgent'\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=str(PROJECT_ROOT),
+                          capture_output=True, text=True)
+    
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,38 @@
+"""测试意图关键词匹配"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.intent_matcher import IntentMatcher, get_intent_matcher
+
+
+def test_find_all_reports_overlapping_matches():
+    """测试重叠关键词全部命中并给出位置"""
+    matcher = IntentMatcher({"demo": {"a": ["he", "she", "hers"], "b": ["his"]}})
+    found = {(m.start, m.end, m.keyword) for m in matcher.find_all("ushers")}
+    assert found == {(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")}
+
+
+def test_classify_keeps_table_priority():
+    """测试同一类别按标签顺序取优先级最高的标签"""
+    matcher = get_intent_matcher()
+    # 同时包含 knowledge_query 与 gui_action 关键词时取优先级更高的前者
+    assert matcher.classify("打开浏览器搜索资料", "task_type") == "knowledge_query"
+    assert matcher.classify("点击按钮", "task_type") == "gui_action"
+    assert matcher.classify("随便聊聊", "task_type", default="unknown") == "unknown"
+    
+    tags = matcher.tag("我是大学生，预算有限，经常打电话")
+    assert tags["identity"] == ["在校生"]
+    assert tags["budget"] == ["低"]
+    assert tags["call_need"] == ["高"]
+
+
+def test_overrides_replace_category_tables():
+    """测试覆盖配置按类别替换关键词表"""
+    matcher = get_intent_matcher({"task_type": {"gui_action": ["Click"]}})
+    assert matcher.classify("please CLICK here", "task_type") == "gui_action"
+    assert matcher.classify("搜索资料", "task_type") is None
+    assert matcher.tag("保存文件")["task_keyword"] == ["保存"]
+    assert get_intent_matcher() is get_intent_matcher()
@@ -0,0 +1,94 @@
+"""测试LLM响应缓存"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.core.llm_cache import LLMResponseCache
+from src.core.llm_gateway import LLMGateway
+from llm_stub_server import StubLLMServer
+
+
+def test_cache_key_depends_on_model_temperature_and_messages():
+    """测试缓存键"""
+    messages = [{"role": "user", "content": "你好"}]
+    key = LLMResponseCache.make_key("gpt-4", 0.1, messages)
+    
+    assert key == LLMResponseCache.make_key("gpt-4", 0.1, [{"role": "user", "content": "你好"}])
+    assert key != LLMResponseCache.make_key("gpt-4", 0.2, messages)
+    assert key != LLMResponseCache.make_key("gpt-3.5", 0.1, messages)
+
+
+def test_cache_hit_rate_and_saved_latency():
+    """测试命中率与节省延迟统计"""
+    cache = LLMResponseCache()
+    cache.put("k1", "gpt-4", "回答", {"total_tokens": 3}, 1.5)
+    
+    assert cache.get("k1")["content"] == "回答"
+    assert cache.get("k2") is None
+    
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["saved_latency"] == 1.5
+
+
+def test_cache_size_eviction():
+    """测试按大小淘汰最久未访问的条目"""
+    cache = LLMResponseCache(max_bytes=20)
+    cache.put("a", "gpt-4", "x" * 8, {}, 0.1)
+    cache.put("b", "gpt-4", "y" * 8, {}, 0.1)
+    cache.get("a")
+    cache.put("c", "gpt-4", "z" * 8, {}, 0.1)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.get_stats()["size_bytes"] <= 20
+
+
+def test_cache_persists_to_disk(tmp_path):
+    """测试持久化到SQLite文件"""
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMResponseCache(path)
+    cache.put("k", "gpt-4", "持久化", {}, 0.2)
+    cache.close()
+    
+    reopened = LLMResponseCache(path)
+    
+    assert reopened.get("k")["content"] == "持久化"
+    assert reopened.get_stats()["size_bytes"] > 0
+
+
+def test_gateway_serves_repeats_from_cache():
+    """测试网关对重复请求使用缓存"""
+    with StubLLMServer(delay=lambda index: 0.05) as server:
+        gateway = LLMGateway({"backend": "http", "cache": {"enabled": True}})
+        first = gateway.invoke("gpt-4", "同样的问题", temperature=0.1, base_url=server.base_url)
+        second = gateway.invoke("gpt-4", "同样的问题", temperature=0.1, base_url=server.base_url)
+        gateway.close()
+    
+    assert len(server.requests) == 1
+    assert not first.cached
+    assert second.cached
+    assert second.content == first.content
+    assert second.latency < first.latency
+
+
+def test_gateway_skips_cache_for_nonzero_temperature_when_opted_out():
+    """测试关闭温度大于0的缓存"""
+    with StubLLMServer() as server:
+        gateway = LLMGateway({
+            "backend": "http",
+            "cache": {"enabled": True, "cache_nonzero_temperature": False}
+        })
+        for _ in range(2):
+            gateway.invoke("gpt-4", "问题", temperature=0.7, base_url=server.base_url)
+        for _ in range(2):
+            gateway.invoke("gpt-4", "问题", temperature=0.0, base_url=server.base_url)
+        gateway.close()
+    
+    assert len(server.requests) == 3
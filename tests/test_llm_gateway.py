@@ -0,0 +1,315 @@
+"""测试LLM网关"""
+import asyncio
+import json
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.core.llm_gateway import LLMGateway, TokenBucket, ConcurrencyLimiter
+from src.core.latency import LatencyHistogram
+from llm_stub_server import StubLLMServer
+
+
+def _gateway(**settings):
+    config = {"backend": "http"}
+    config.update(settings)
+    return LLMGateway(config)
+
+
+def test_token_bucket_reservation():
+    """测试令牌桶按预约排队"""
+    now = [0.0]
+    bucket = TokenBucket(60, capacity=2, clock=lambda: now[0])
+    
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+    
+    now[0] = 10.0
+    assert bucket.reserve() == 0.0
+
+
+def test_concurrency_limiter_mixed_waiters():
+    """测试线程与协程共享并发上限"""
+    limiter = ConcurrencyLimiter(1)
+    limiter.acquire()
+    
+    async def waiter():
+        await limiter.aacquire()
+        limiter.release()
+        return True
+    
+    async def main():
+        task = asyncio.ensure_future(waiter())
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        limiter.release()
+        return await task
+    
+    assert asyncio.run(main())
+    assert limiter.in_flight == 0
+
+
+def test_gateway_invoke_reuses_connection():
+    """测试同一模型复用连接池"""
+    with StubLLMServer() as server:
+        gateway = _gateway()
+        client = gateway.client("gpt-4", base_url=server.base_url, api_key="key")
+        
+        for i in range(10):
+            response = client.invoke(f"问题{i}")
+            assert response.content == f"echo: 问题{i}"
+        gateway.close()
+    
+    assert len(server.client_ports) == 1
+    stats = gateway.get_stats()["models"]["gpt-4"]
+    assert stats["requests"] == 10
+    assert stats["tokens"] == 150
+
+
+def test_gateway_concurrency_limit():
+    """测试全局并发上限"""
+    with StubLLMServer(delay=lambda index: 0.05) as server:
+        gateway = _gateway(max_concurrency=2)
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        threads = [threading.Thread(target=client.invoke, args=(f"q{i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gateway.close()
+    
+    assert len(server.requests) == 8
+    assert server.max_active <= 2
+
+
+def test_gateway_request_rate_limit():
+    """测试请求速率限制"""
+    import time
+    
+    with StubLLMServer() as server:
+        gateway = _gateway(requests_per_minute=1200, burst_seconds=0.1)
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        
+        start = time.perf_counter()
+        for i in range(10):
+            client.invoke(f"q{i}")
+        elapsed = time.perf_counter() - start
+        gateway.close()
+    
+    # 20次/秒，突发2次，其余8次至少需要0.4秒
+    assert elapsed >= 0.35
+
+
+def test_gateway_retries_after_429():
+    """测试服务端限流后退避重试"""
+    with StubLLMServer() as server:
+        server.rate_limit_next = 1
+        gateway = _gateway()
+        response = gateway.invoke("gpt-4", "你好", base_url=server.base_url)
+        gateway.close()
+    
+    assert response.content == "echo: 你好"
+    assert gateway.get_stats()["models"]["gpt-4"]["rate_limited"] == 1
+
+
+def test_gateway_ainvoke_and_stream():
+    """测试异步与流式调用"""
+    with StubLLMServer() as server:
+        gateway = _gateway()
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        
+        async def main():
+            return await asyncio.gather(*[client.ainvoke(f"q{i}") for i in range(5)])
+        
+        responses = asyncio.run(main())
+        chunks = list(client.stream("流式输出的一段比较长的内容"))
+        gateway.close()
+    
+    assert [r.content for r in responses] == [f"echo: q{i}" for i in range(5)]
+    assert len(chunks) > 1
+    assert "".join(chunks) == "echo: 流式输出的一段比较长的内容"
+
+
+def test_gateway_langchain_backend_against_stub():
+    """测试 langchain 后端对接本地桩服务"""
+    pytest.importorskip("langchain_openai")
+    
+    with StubLLMServer() as server:
+        gateway = LLMGateway({"backend": "langchain"})
+        response = gateway.invoke("gpt-4", "你好", api_key="key", base_url=server.base_url)
+        gateway.close()
+    
+    assert response.content == "echo: 你好"
+
+
+def test_planning_agent_uses_gateway():
+    """测试规划智能体通过网关调用LLM"""
+    from src.core import llm_gateway
+    from src.agents.planning_agent import PlanningAgent
+    
+    reply = json.dumps({"steps": ["搜索资料", "生成代码"]}, ensure_ascii=False)
+    with StubLLMServer(reply=lambda body: reply) as server:
+        llm_gateway.configure_llm_gateway({"backend": "http"})
+        try:
+            agent = PlanningAgent({"openai_api_key": "key", "openai_base_url": server.base_url,
+                                   "plan_templates": []})
+            plan = agent.decompose_task({"instruction": "搜索资料并生成代码"})
+        finally:
+            llm_gateway.configure_llm_gateway({})
+    
+    assert [t["type"] for t in plan["subtasks"]] == ["knowledge_query", "code_generation"]
+    assert len(server.requests) == 1
+
+
+def test_latency_histogram_percentiles_and_merge():
+    """测试延迟直方图分位数与合并"""
+    histogram = LatencyHistogram()
+    for i in range(1, 101):
+        histogram.record(i / 100)
+    
+    assert histogram.percentile(0.5) == pytest.approx(0.5, rel=0.1)
+    assert histogram.percentile(0.99) == pytest.approx(0.99, rel=0.1)
+    assert histogram.percentile(1.0) == pytest.approx(1.0)
+    
+    other = LatencyHistogram()
+    other.record(5.0)
+    histogram.merge(other)
+    summary = histogram.summary()
+    assert summary["count"] == 101
+    assert summary["max"] == 5.0
+
+
+def test_gateway_hedges_slow_requests():
+    """测试超过延迟阈值后发出对冲请求"""
+    slow = {5, 7}
+    with StubLLMServer(delay=lambda index: 1.0 if index in slow else 0.01) as server:
+        gateway = _gateway(hedging={"enabled": True, "min_samples": 5, "max_rate": 1.0})
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        for i in range(5):
+            client.invoke(f"预热{i}")
+        
+        start_time = time.perf_counter()
+        assert client.invoke("慢请求").content == "echo: 慢请求"
+        sync_elapsed = time.perf_counter() - start_time
+        
+        async def main():
+            start_time = time.perf_counter()
+            response = await client.ainvoke("异步慢请求")
+            return response, time.perf_counter() - start_time
+        
+        response, async_elapsed = asyncio.run(main())
+        assert response.content == "echo: 异步慢请求"
+        stats = gateway.get_stats()["models"]["gpt-4"]
+        gateway.close()
+    
+    assert sync_elapsed < 0.5
+    assert async_elapsed < 0.5
+    assert stats["hedged"] == 2
+    assert stats["hedge_wins"] == 2
+    assert stats["latency"]["count"] >= 7
+
+
+def test_gateway_hedge_rate_cap():
+    """测试对冲比例上限"""
+    with StubLLMServer(delay=lambda index: 0.0 if index < 5 else 0.05) as server:
+        gateway = _gateway(hedging={"enabled": True, "min_samples": 5, "max_rate": 0.0})
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        for i in range(8):
+            client.invoke(f"问题{i}")
+        gateway.close()
+    
+    assert len(server.requests) == 8
+    assert "hedged" not in gateway.get_stats()["models"]["gpt-4"]
+
+
+def test_gateway_hedge_and_abandoned_calls_hold_concurrency_slots():
+    """测试对冲请求需要空闲名额，截止时间到期后放弃的调用在结束前仍占用名额"""
+    from src.core.deadline import Deadline, DeadlineExceeded, deadline_scope
+    
+    with StubLLMServer(delay=lambda index: 0.3 if index >= 5 else 0.0) as server:
+        gateway = _gateway(max_concurrency=1, hedging={"enabled": True, "min_samples": 5, "max_rate": 1.0})
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        for i in range(5):
+            client.invoke(f"预热{i}")
+        
+        assert client.invoke("慢请求").content == "echo: 慢请求"
+        stats = gateway.get_stats()["models"]["gpt-4"]
+        assert stats["hedge_skipped"] == 1 and "hedged" not in stats
+        assert len(server.requests) == 6
+        
+        with deadline_scope(Deadline(0.1)):
+            with pytest.raises(DeadlineExceeded):
+                client.invoke("被放弃的请求")
+        assert gateway.concurrency.in_flight == 1
+        assert wait_for(lambda: gateway.concurrency.in_flight == 0)
+        gateway.close()
+
+
+def wait_for(condition, timeout=5.0):
+    """轮询等待条件成立"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_gateway_respects_deadline():
+    """测试LLM调用不超过当前截止时间"""
+    from src.core.deadline import Deadline, DeadlineExceeded, deadline_scope
+    
+    with StubLLMServer(delay=lambda index: 1.0) as server:
+        gateway = _gateway()
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        
+        start_time = time.perf_counter()
+        with deadline_scope(Deadline(0.2)):
+            with pytest.raises(DeadlineExceeded):
+                client.invoke("慢请求")
+        sync_elapsed = time.perf_counter() - start_time
+        
+        async def main():
+            with deadline_scope(Deadline(0.2)):
+                start_time = time.perf_counter()
+                with pytest.raises(DeadlineExceeded):
+                    await client.ainvoke("异步慢请求")
+                return time.perf_counter() - start_time
+        
+        async_elapsed = asyncio.run(main())
+        
+        expired = Deadline(0.0)
+        with deadline_scope(expired):
+            with pytest.raises(DeadlineExceeded):
+                client.invoke("不会发出的请求")
+        stats = gateway.get_stats()["models"]["gpt-4"]
+        gateway.close()
+    
+    assert sync_elapsed < 0.5
+    assert async_elapsed < 0.5
+    assert stats["deadline_exceeded"] == 3
+    assert "errors" not in stats
+
+
+def test_configure_gateway_keeps_live_clients_working(tmp_path):
+    """测试重复配置网关时沿用同一网关，替换后旧客户端仍可调用"""
+    from src.core import llm_gateway
+    
+    settings = {"backend": "http", "cache": {"enabled": True, "path": str(tmp_path / "cache.db")}}
+    with StubLLMServer(reply=lambda body: "ok") as server:
+        try:
+            gateway = llm_gateway.configure_llm_gateway(settings)
+            client = gateway.client("gpt-4", api_key="key", base_url=server.base_url)
+            assert llm_gateway.configure_llm_gateway(dict(settings)) is gateway
+            
+            llm_gateway.configure_llm_gateway({"backend": "http"})
+            assert client.invoke("你好").content == "ok"
+        finally:
+            llm_gateway.configure_llm_gateway({})
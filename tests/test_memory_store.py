@@ -0,0 +1,61 @@
+"""测试智能体记忆存储"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.memory_store import RingMemoryStore, SQLiteMemoryStore
+
+
+def test_ring_store_evicts_oldest():
+    """测试环形缓冲区按条数上限淘汰最早记忆"""
+    store = RingMemoryStore(max_items=3)
+    for i in range(5):
+        store.add({"type": "step" if i % 2 else "note", "content": f"item {i}"})
+    
+    assert len(store) == 3
+    assert [item["content"] for item in store] == ["item 2", "item 3", "item 4"]
+    assert [item["content"] for item in store.query(type="step")] == ["item 3"]
+    assert store.query(keyword="item 1") == []
+
+
+def test_ring_store_query():
+    """测试按类型、时间范围、关键词与条数查询"""
+    store = RingMemoryStore(max_items=10)
+    store.add({"type": "recommendation", "content": "推荐无线耳机"})
+    store.add({"type": "order", "content": "Order #A-1 shipped"})
+    middle = time.time()
+    time.sleep(0.01)
+    store.add({"type": "recommendation", "content": "推荐机械键盘"})
+    
+    assert len(store.query(type="recommendation")) == 2
+    assert [item["content"] for item in store.query(since=middle)] == ["推荐机械键盘"]
+    assert len(store.query(until=middle)) == 2
+    assert [item["content"] for item in store.query(keyword="键盘")] == ["推荐机械键盘"]
+    assert [item["type"] for item in store.query(keyword="SHIPPED")] == ["order"]
+    assert [item["content"] for item in store.query(keyword="推荐", limit=1)] == ["推荐机械键盘"]
+    assert store.query(type="order", keyword="耳机") == []
+    assert store.recent(1)[0]["content"] == "推荐机械键盘"
+
+
+def test_sqlite_store_persists_per_owner(tmp_path):
+    """测试SQLite存储跨重新打开保留记忆，并按智能体分别限制条数"""
+    path = str(tmp_path / "mem.db")
+    first = SQLiteMemoryStore("first", path, max_items=2)
+    second = SQLiteMemoryStore("second", path, max_items=2)
+    for i in range(3):
+        first.add({"type": "note", "content": f"first note {i}"})
+    second.add({"type": "note", "content": "second note"})
+    first.close()
+    second.close()
+    
+    reopened = SQLiteMemoryStore("first", path, max_items=2)
+    assert [item["content"] for item in reopened] == ["first note 1", "first note 2"]
+    assert [item["content"] for item in reopened.query(keyword="NOTE 2")] == ["first note 2"]
+    assert len(reopened.query(keyword="2")) == 1
+    assert reopened.query(keyword="second") == []
+    reopened.add({"type": "result", "content": "完成任务"})
+    assert [item["content"] for item in reopened.query(type="result", keyword="任务")] == ["完成任务"]
+    reopened.close()
+
@@ -0,0 +1,217 @@
+"""测试消息总线"""
+import asyncio
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.message_bus import MessageBus, Message
+
+
+def test_history_is_bounded():
+    """测试消息历史不超过容量，按主题回放只返回内存中的消息"""
+    bus = MessageBus(history_size=3)
+    for i in range(10):
+        bus.publish("a" if i % 2 else "b", {"index": i})
+    
+    assert [m["index"] for m in bus.message_history] == [7, 8, 9]
+    assert [m["index"] for m in bus.replay("a")] == [7, 9]
+    assert [m["index"] for m in bus.replay(limit=2)] == [8, 9]
+    stats = bus.get_stats()
+    assert stats["history"] == 3 and stats["evicted"] == 7
+
+
+def test_publish_does_not_mutate_payload():
+    """测试发布不修改调用方的字典，消息按映射访问并在序列化时生成时间字符串"""
+    bus = MessageBus()
+    received = []
+    bus.subscribe("a", received.append)
+    payload = {"index": 0}
+    message = bus.publish("a", payload)
+    
+    assert payload == {"index": 0}
+    assert isinstance(message, Message) and received == [message]
+    assert message["index"] == 0 and message["topic"] == "a"
+    assert message._iso is None
+    data = message.to_dict()
+    assert data["timestamp"] == message["timestamp"] and data["topic"] == "a"
+    assert set(message) == {"index", "topic", "timestamp"}
+    
+    batch = bus.publish_many([("a", {"index": 1}), ("b", {"index": 2})])
+    assert [m["index"] for m in received] == [0, 1]
+    assert [m.topic for m in batch] == ["a", "b"]
+    assert batch[0].monotonic_ns <= batch[1].monotonic_ns
+    assert bus.get_stats()["published"] == 3
+
+
+def test_wildcard_subscriptions():
+    """测试通配符订阅收到匹配的具体主题，取消订阅后不再收到"""
+    bus = MessageBus()
+    completed, everything = [], []
+    subscription = bus.subscribe("task.*.completed", completed.append)
+    bus.subscribe("task.#", everything.append)
+    
+    bus.publish_many([("task.1.completed", {"index": 1}), ("task.1.failed", {"index": 2})])
+    bus.publish("task.2.completed", {"index": 3})
+    assert [m["index"] for m in completed] == [1, 3]
+    assert [m["index"] for m in everything] == [1, 2, 3]
+    
+    bus.unsubscribe(subscription)
+    bus.publish("task.3.completed", {"index": 4})
+    bus.publish("task.3.completed", {"index": 5})
+    assert [m["index"] for m in completed] == [1, 3]
+    assert [m["index"] for m in everything] == [1, 2, 3, 4, 5]
+    assert bus.get_stats()["routing"]["hits"] == 1
+
+
+def test_replay_by_time_range():
+    """测试按时间范围回放"""
+    bus = MessageBus(history_size=100)
+    bus.publish("a", {"index": 0})
+    time.sleep(0.01)
+    middle = time.time()
+    bus.publish("a", {"index": 1})
+    bus.publish("b", {"index": 2})
+    time.sleep(0.01)
+    end = time.time()
+    bus.publish("a", {"index": 3})
+    
+    assert [m["index"] for m in bus.replay(since=middle)] == [1, 2, 3]
+    assert [m["index"] for m in bus.replay("a", since=middle, until=end)] == [1]
+    assert bus.replay("missing") == []
+
+
+def test_evicted_messages_spill_to_rotating_segments(tmp_path):
+    """测试被淘汰的消息写入轮转的分段日志，并可在重新打开后回放"""
+    bus = MessageBus(history_size=2, spill_dir=str(tmp_path), segment_bytes=200, max_segments=3)
+    for i in range(20):
+        bus.publish("a" if i % 2 else "b", {"index": i})
+    
+    segments = sorted(tmp_path.glob("segment-*.jsonl"))
+    assert len(segments) == 3
+    replayed = [m["index"] for m in bus.replay("a")]
+    # 最旧的分段已被删除，剩余消息按发布顺序回放且不重复
+    assert replayed == sorted(set(replayed)) and replayed[-2:] == [17, 19]
+    assert len(replayed) < 10
+    assert bus.get_stats()["spilled"] == 18
+    bus.close()
+    
+    reopened = MessageBus(history_size=2, spill_dir=str(tmp_path), segment_bytes=200, max_segments=3)
+    reopened.publish("a", {"index": 20})
+    assert [m["index"] for m in reopened.replay("a")][-3:] == [17, 19, 20]
+    reopened.close()
+
+
+def test_spill_writes_happen_outside_publish_lock(tmp_path):
+    """测试落盘时不占用发布锁，尚未写完的淘汰消息仍可回放"""
+    bus = MessageBus(history_size=2, spill_dir=str(tmp_path))
+    for i in range(2):
+        bus.publish("a", {"index": i})
+    
+    writing, release = threading.Event(), threading.Event()
+    append = bus.spill.append
+    
+    def slow_append(records):
+        writing.set()
+        release.wait(5)
+        append(records)
+    
+    bus.spill.append = slow_append
+    publisher = threading.Thread(target=bus.publish, args=("a", {"index": 2}))
+    publisher.start()
+    assert writing.wait(5)
+    
+    # 落盘进行中：回放不被阻塞，被淘汰的消息不丢失、不重复
+    replayed = []
+    reader = threading.Thread(target=lambda: replayed.extend(m["index"] for m in bus.replay("a")))
+    reader.start()
+    reader.join(2)
+    assert not reader.is_alive()
+    assert replayed == [0, 1, 2]
+    release.set()
+    publisher.join(5)
+    assert [m["index"] for m in bus.replay("a")] == [0, 1, 2]
+    assert bus.get_stats()["spilled"] == 1
+    bus.close()
+
+
+def test_async_subscriber_does_not_block_publish():
+    """测试慢订阅者在异步分发下不阻塞发布方，并记录滞后统计"""
+    bus = MessageBus(dispatch="async")
+    release = threading.Event()
+    received = []
+    
+    def slow(message):
+        release.wait(1)
+        received.append(message["index"])
+    
+    subscription = bus.subscribe("a", slow)
+    start = time.monotonic()
+    for i in range(5):
+        bus.publish("a", {"index": i})
+    assert time.monotonic() - start < 0.5
+    time.sleep(0.02)
+    stats = subscription.get_stats()
+    assert stats["queued"] >= 4 and stats["lag"] > 0
+    
+    release.set()
+    assert bus.flush(timeout=2)
+    assert received == [0, 1, 2, 3, 4]
+    assert bus.get_stats()["subscribers"][0]["delivered"] == 5
+    bus.close()
+
+
+@pytest.mark.parametrize("overflow,expected", [
+    ("drop_new", [0, 1]),
+    ("drop_oldest", [3, 4]),
+])
+def test_overflow_policies(overflow, expected):
+    """测试队列满时的丢弃策略"""
+    bus = MessageBus()
+    started, release = threading.Event(), threading.Event()
+    received = []
+    
+    def callback(message):
+        if message["index"] == -1:
+            started.set()
+            release.wait(1)
+        else:
+            received.append(message["index"])
+    
+    subscription = bus.subscribe("a", callback, dispatch="async", queue_size=2, overflow=overflow)
+    bus.publish("a", {"index": -1})
+    assert started.wait(1)
+    for i in range(5):
+        bus.publish("a", {"index": i})
+    release.set()
+    assert subscription.join(timeout=2)
+    assert received == expected
+    assert subscription.get_stats()["dropped"] == 3
+    bus.unsubscribe(subscription)
+    assert "a" not in bus.subscriptions
+
+
+def test_coroutine_subscriber_runs_on_event_loop():
+    """测试协程回调在事件循环中按顺序处理"""
+    async def main():
+        bus = MessageBus(dispatch="async")
+        received = []
+        
+        async def handler(message):
+            await asyncio.sleep(0)
+            received.append(message["index"])
+        
+        bus.subscribe("a", handler)
+        for i in range(3):
+            bus.publish("a", {"index": i})
+        for _ in range(100):
+            if len(received) == 3:
+                break
+            await asyncio.sleep(0.01)
+        bus.close()
+        return received
+    
+    assert asyncio.run(main()) == [0, 1, 2]
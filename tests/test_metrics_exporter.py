@@ -0,0 +1,105 @@
+"""测试Prometheus指标导出"""
+import gc
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.metrics_exporter import AgentLatencyCollector, start_metrics_server
+from src.agents.base_agent import BaseAgent
+
+
+class TestAgent(BaseAgent):
+    """测试用的智能体"""
+    
+    def process(self, input_data):
+        return {"status": "success", "data": input_data}
+
+
+def test_collector_exposes_histograms_and_quantiles():
+    """测试导出各智能体各操作的直方图与分位数"""
+    prometheus_client = pytest.importorskip("prometheus_client")
+    agent = TestAgent("TestAgent", {})
+    for seconds in [0.02, 0.02, 0.3]:
+        agent.latency.record("think", seconds)
+    
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(AgentLatencyCollector(lambda: {"gui": agent}, buckets=[0.1, 1.0]))
+    text = prometheus_client.generate_latest(registry).decode()
+    
+    assert 'manus_agent_operation_latency_seconds_bucket{agent="gui",le="0.1",operation="think"} 2.0' in text
+    assert 'manus_agent_operation_latency_seconds_count{agent="gui",operation="think"} 3.0' in text
+    assert 'manus_agent_operation_latency_quantile_seconds{agent="gui",operation="think",quantile="0.99"}' in text
+
+
+def test_server_not_started_without_port():
+    """测试未配置端口时不启动导出服务"""
+    assert start_metrics_server(dict, {}) is None
+
+
+def test_collector_merges_agents_from_all_sources():
+    """测试多个来源中的同名智能体在导出时合并"""
+    prometheus_client = pytest.importorskip("prometheus_client")
+    first, second = TestAgent("TestAgent", {}), TestAgent("TestAgent", {})
+    first.latency.record("llm", 0.02)
+    second.latency.record("llm", 0.5)
+    
+    collector = AgentLatencyCollector(lambda: {"planning": first}, buckets=[0.1, 1.0])
+    collector.add_source(lambda: {"planning": second})
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(collector)
+    text = prometheus_client.generate_latest(registry).decode()
+    
+    assert 'manus_agent_operation_latency_seconds_count{agent="planning",operation="llm"} 2.0' in text
+    assert 'manus_agent_operation_latency_seconds_bucket{agent="planning",le="0.1",operation="llm"} 1.0' in text
+    assert first.latency.histogram("llm").count == 1
+
+
+def test_collector_drops_collected_managers():
+    """测试以绑定方法登记的来源只被弱引用，对象回收后不再导出"""
+    prometheus_client = pytest.importorskip("prometheus_client")
+    
+    class Owner:
+        def __init__(self, agent):
+            self.agent = agent
+        
+        def agents(self):
+            return {"planning": self.agent}
+    
+    agent = TestAgent("TestAgent", {})
+    agent.latency.record("llm", 0.02)
+    owner = Owner(agent)
+    collector = AgentLatencyCollector(owner.agents, buckets=[0.1, 1.0])
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(collector)
+    assert 'agent="planning"' in prometheus_client.generate_latest(registry).decode()
+    
+    del owner
+    gc.collect()
+    assert 'agent="planning"' not in prometheus_client.generate_latest(registry).decode()
+    assert collector.sources == []
+
+
+def test_collector_exports_consistent_snapshot():
+    """测试抓取期间新增的记录不会让有限边界的桶超过 +Inf"""
+    prometheus_client = pytest.importorskip("prometheus_client")
+    agent = TestAgent("TestAgent", {})
+    agent.latency.record("llm", 0.02)
+    histogram = agent.latency.histogram("llm")
+    to_dict = histogram.to_dict
+    
+    def to_dict_then_record():
+        data = to_dict()
+        histogram.record(0.05)
+        return data
+    
+    histogram.to_dict = to_dict_then_record
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(AgentLatencyCollector(lambda: {"gui": agent}, buckets=[0.1, 1.0]))
+    text = prometheus_client.generate_latest(registry).decode()
+    
+    assert 'manus_agent_operation_latency_seconds_bucket{agent="gui",le="0.1",operation="llm"} 1.0' in text
+    assert 'manus_agent_operation_latency_seconds_bucket{agent="gui",le="+Inf",operation="llm"} 1.0' in text
+    assert 'manus_agent_operation_latency_seconds_sum{agent="gui",operation="llm"} 0.02' in text
+
@@ -0,0 +1,99 @@
+"""测试计划库"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.learning.plan_store import PlanStore, normalize_instruction, adapt_plan
+
+
+def _plan(*descriptions):
+    subtasks = [{"id": f"task_{i+1}", "description": d, "type": "knowledge_query", "dependencies": []}
+                for i, d in enumerate(descriptions)]
+    return {
+        "status": "success",
+        "subtasks": subtasks,
+        "execution_order": [t["id"] for t in subtasks],
+        "execution_levels": [[t["id"] for t in subtasks]],
+        "estimated_time": 5
+    }
+
+
+def test_normalize_instruction():
+    """测试指令归一化"""
+    assert normalize_instruction(" 搜索 Python 教程，并生成代码！") == "搜索python教程并生成代码"
+    assert normalize_instruction("Search Python docs, then write code.") == "search python docs then write code"
+
+
+def test_plan_store_exact_and_similar_lookup():
+    """测试精确查找与近似查找"""
+    store = PlanStore(similarity_threshold=0.8)
+    assert store.record("搜索Python教程并生成代码", _plan("搜索Python教程", "生成代码"), 1.0)
+    assert not store.record("低分任务", _plan("搜索"), 0.5)
+    
+    exact = store.lookup("搜索python教程，并生成代码")
+    assert exact["exact"] and exact["similarity"] == 1.0
+    
+    similar = store.lookup("搜索Java教程并生成代码")
+    assert not similar["exact"]
+    assert similar["similarity"] >= 0.8
+    assert similar["instruction"] == "搜索Python教程并生成代码"
+    
+    assert store.lookup("帮我订一张机票") is None
+    stats = store.get_stats()
+    assert stats["exact_hits"] == 1 and stats["similar_hits"] == 1
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_plan_store_eviction_and_persistence(tmp_path):
+    """测试按最久未使用淘汰与持久化"""
+    path = str(tmp_path / "plans.db")
+    store = PlanStore(path, max_entries=2)
+    store.record("搜索天气", _plan("搜索天气"), 1.0)
+    store.record("搜索新闻", _plan("搜索新闻"), 1.0)
+    store.lookup("搜索天气")
+    store.record("搜索股票", _plan("搜索股票"), 1.0)
+    assert store.get_stats()["entries"] == 2
+    store.close()
+    
+    reopened = PlanStore(path, max_entries=2)
+    assert reopened.lookup("搜索天气") is not None
+    assert reopened.lookup("搜索新闻") is None
+
+
+def test_adapt_plan_substitutes_changed_slots():
+    """测试按指令差异改写子任务描述"""
+    adapted = adapt_plan(_plan("搜索Python教程", "生成代码"), "搜索Python教程并生成代码", "搜索Java教程并生成代码")
+    assert [t["description"] for t in adapted["subtasks"]] == ["搜索Java教程", "生成代码"]
+
+
+def test_task_executor_reuses_successful_plan():
+    """测试评估良好的计划被记录，近似指令复用并改写"""
+    from src.agents.base_agent import BaseAgent
+    from src.agents.evaluation_agent import EvaluationAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    from src.core.task_executor import TaskExecutor
+    
+    class KnowledgeAgent(BaseAgent):
+        def process(self, input_data):
+            return {}
+        
+        def retrieve(self, query):
+            return {"status": "success", "query": query}
+    
+    planning_agent = PlanningAgent({"openai_api_key": None, "plan_templates": []})
+    executor = TaskExecutor({"agents": {}})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", planning_agent)
+    executor.agent_manager.register_agent("knowledge", KnowledgeAgent("knowledge", {}))
+    executor.agent_manager.register_agent("evaluation", EvaluationAgent({"openai_api_key": None}))
+    
+    first = executor.execute({"instruction": "搜索Python教程，搜索示例"})
+    assert first["plan"]["planner_tier"] == "rules"
+    assert first["evaluation"]["completion_score"] == 1.0
+    
+    second = executor.execute({"instruction": "搜索Java教程，搜索示例"})
+    assert second["plan"]["planner_tier"] == "store"
+    assert [r["query"] for r in second["results"]] == ["搜索Java教程", "搜索示例"]
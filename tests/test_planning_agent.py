@@ -69,3 +69,123 @@ def test_planning_agent_extract_keywords():
     assert len(keywords) > 0
     assert "打开" in keywords or "搜索" in keywords or "保存" in keywords
 
+
+
+def test_planning_agent_dependencies():
+    """测试按子任务类型分析依赖"""
+    config = {"openai_api_key": None}
+    agent = PlanningAgent(config)
+    
+    subtasks = agent._decompose({"steps": ["搜索资料A", "检索资料B", "生成代码", "点击按钮", "输入文本"]})
+    dependencies = agent._analyze_dependencies(subtasks)
+    
+    assert dependencies["task_1"] == []
+    assert dependencies["task_2"] == []
+    assert dependencies["task_3"] == ["task_1", "task_2"]
+    assert dependencies["task_4"] == []
+    assert dependencies["task_5"] == ["task_4"]
+    
+    plan = agent._generate_plan(subtasks, dependencies)
+    
+    assert plan["execution_levels"] == [["task_1", "task_2", "task_4"], ["task_3", "task_5"]]
+    assert plan["execution_order"] == ["task_1", "task_2", "task_4", "task_3", "task_5"]
+
+
+def test_planning_agent_topological_cycle():
+    """测试循环依赖检测"""
+    config = {"openai_api_key": None}
+    agent = PlanningAgent(config)
+    
+    subtasks = [{"id": "a"}, {"id": "b"}]
+    
+    with pytest.raises(ValueError):
+        agent._topological_levels(subtasks, {"a": ["b"], "b": ["a"]})
+
+
+def test_step_stream_parser_emits_steps_incrementally():
+    """测试增量解析在每个步骤完整时立即返回"""
+    import json
+    from src.agents.planning_agent import StepStreamParser
+    
+    text = json.dumps({
+        "goal": "含有\"steps\"字样, [括号]",
+        "steps": ["搜索资料，整理", {"description": "生成代码"}, "点击 \"保存\""],
+        "keywords": ["搜索"]
+    }, ensure_ascii=False)
+    parser = StepStreamParser()
+    emitted = []
+    for i, ch in enumerate(text):
+        for step in parser.feed(ch):
+            emitted.append((step, i))
+    
+    assert [step for step, _ in emitted] == ["搜索资料，整理", "生成代码", "点击 \"保存\""]
+    # 第一个步骤在整个响应结束前就已产出
+    assert emitted[0][1] < text.index("生成代码")
+
+
+def test_planning_agent_stream_plan():
+    """测试流式规划产出的子任务与一次性规划一致"""
+    import json
+    
+    class StreamLLM:
+        def __init__(self, content):
+            self.content = content
+        
+        def stream(self, prompt):
+            for i in range(0, len(self.content), 5):
+                yield self.content[i:i + 5]
+    
+    agent = PlanningAgent({"openai_api_key": None})
+    agent.llm = StreamLLM(json.dumps({"steps": ["搜索资料", "生成代码", "打开网页"]}, ensure_ascii=False))
+    events = list(agent.stream_plan({"instruction": "任务"}))
+    
+    assert [event["event"] for event in events] == ["subtask"] * 3 + ["plan"]
+    plan = events[-1]["plan"]
+    assert plan["status"] == "success"
+    assert plan["subtasks"][1]["dependencies"] == ["task_1"]
+    
+    # 无LLM时退回规则方法
+    agent.llm = None
+    events = list(agent.stream_plan({"instruction": "搜索资料，生成代码"}))
+    assert events[-1]["plan"]["execution_order"] == ["task_1", "task_2"]
+
+
+def test_plan_template_library_confidence():
+    """测试模板匹配与覆盖率折减的置信度"""
+    from src.core.plan_templates import PlanTemplateLibrary
+    
+    library = PlanTemplateLibrary()
+    match = library.match("搜索Python排序算法，生成快速排序的代码。")
+    assert match.template == "search_then_code"
+    assert match.steps == ["搜索Python排序算法", "生成快速排序代码"]
+    assert match.confidence == pytest.approx(0.95)
+    
+    partial = library.match("搜索资料，整理成报告")
+    assert partial.confidence < 0.8
+    assert library.match("帮我订一张机票") is None
+
+
+def test_planning_agent_tiers():
+    """测试模板命中时不调用LLM，并统计各层级命中率"""
+    class CountingLLM:
+        calls = 0
+        
+        def invoke(self, prompt):
+            CountingLLM.calls += 1
+            raise RuntimeError("LLM不可用")
+    
+    agent = PlanningAgent({"openai_api_key": None})
+    agent.llm = CountingLLM()
+    
+    plan = agent.decompose_task({"instruction": "打开浏览器，点击登录按钮"})
+    assert plan["planner_tier"] == "template"
+    assert [t["type"] for t in plan["subtasks"]] == ["gui_action", "gui_action"]
+    assert CountingLLM.calls == 0
+    
+    plan = agent.decompose_task({"instruction": "帮我订一张机票"})
+    assert plan["planner_tier"] == "rules"
+    assert CountingLLM.calls == 1
+    
+    stats = agent.get_status()["planner_tiers"]
+    assert stats["counts"] == {"store": 0, "template": 1, "llm": 0, "rules": 1}
+    assert stats["hit_rate"]["template"] == pytest.approx(0.5)
@@ -0,0 +1,93 @@
+"""测试DAG调度器"""
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.scheduler import DAGScheduler
+
+
+def _subtask(task_id, task_type="knowledge_query", dependencies=None):
+    return {"id": task_id, "type": task_type, "dependencies": dependencies or []}
+
+
+def test_scheduler_runs_independent_subtasks_concurrently():
+    """测试无依赖的子任务并发执行"""
+    scheduler = DAGScheduler(max_workers=4)
+    
+    def execute(subtask):
+        time.sleep(0.2)
+        return {"status": "success", "id": subtask["id"]}
+    
+    subtasks = [_subtask(f"task_{i}") for i in range(4)]
+    start = time.perf_counter()
+    results = scheduler.run(subtasks, execute)
+    elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+    
+    assert [r["id"] for r in results] == ["task_0", "task_1", "task_2", "task_3"]
+    assert elapsed < 0.6
+
+
+def test_scheduler_respects_dependencies():
+    """测试依赖顺序"""
+    scheduler = DAGScheduler(max_workers=4)
+    finished = []
+    
+    def execute(subtask):
+        time.sleep(0.05 if subtask["id"] == "a" else 0)
+        finished.append(subtask["id"])
+        return {"status": "success"}
+    
+    subtasks = [
+        _subtask("a"),
+        _subtask("b"),
+        _subtask("c", "code_generation", ["a", "b"]),
+    ]
+    scheduler.run(subtasks, execute)
+    scheduler.shutdown()
+    
+    assert finished[-1] == "c"
+
+
+def test_scheduler_concurrency_limit():
+    """测试分组并发上限"""
+    scheduler = DAGScheduler(max_workers=8, concurrency_limits={"gui_action": 1})
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+    
+    def execute(subtask):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+        return {"status": "success"}
+    
+    scheduler.run([_subtask(f"g{i}", "gui_action") for i in range(5)], execute)
+    scheduler.shutdown()
+    
+    assert active["max"] == 1
+
+
+def test_scheduler_stop_on_error():
+    """测试子任务失败后停止派发后继子任务"""
+    scheduler = DAGScheduler(max_workers=2)
+    executed = []
+    
+    def execute(subtask):
+        executed.append(subtask["id"])
+        if subtask["id"] == "a":
+            raise RuntimeError("boom")
+        return {"status": "success"}
+    
+    results = scheduler.run([_subtask("a"), _subtask("b", dependencies=["a"])], execute)
+    scheduler.shutdown()
+    
+    assert executed == ["a"]
+    assert len(results) == 1
+    assert results[0]["status"] == "error"
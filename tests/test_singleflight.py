@@ -0,0 +1,178 @@
+"""测试请求合并"""
+import asyncio
+import pytest
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.core.deadline import Deadline, DeadlineExceeded, deadline_scope
+from src.core.singleflight import SingleFlight
+from src.core.llm_gateway import LLMGateway
+from llm_stub_server import StubLLMServer
+
+
+def test_singleflight_threads_share_result():
+    """测试并发线程只执行一次"""
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    
+    def work():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "done"
+    
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flight.do, "k", work)
+        started.wait()
+        followers = [pool.submit(flight.do, "k", work) for _ in range(4)]
+        results = [leader.result()] + [f.result() for f in followers]
+    
+    assert len(calls) == 1
+    assert results[0] == ("done", False)
+    assert all(result == ("done", True) for result in results[1:])
+    stats = flight.get_stats()
+    assert stats["coalescing_ratio"] == pytest.approx(0.8)
+    assert stats["in_flight"] == 0
+
+
+def test_singleflight_async_and_errors():
+    """测试协程合并与异常传播"""
+    flight = SingleFlight()
+    calls = []
+    
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+    
+    async def main():
+        return await asyncio.gather(*[flight.ado("k", fail) for _ in range(3)],
+                                    return_exceptions=True)
+    
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    
+    # 失败不会留在在途表中，后续调用重新执行
+    with pytest.raises(ValueError):
+        asyncio.run(flight.ado("k", fail))
+    assert len(calls) == 2
+
+
+def test_singleflight_leader_cancel_does_not_cancel_followers():
+    """测试首个协程被取消后等待者重新发起"""
+    flight = SingleFlight()
+    calls = []
+    
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+    
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+    
+    assert asyncio.run(main()) == (2, False)
+
+
+def test_singleflight_cancelled_follower_does_not_affect_others():
+    """测试一个协程等待者超时取消后，首个调用与其他等待者仍得到结果"""
+    flight = SingleFlight()
+    started = threading.Event()
+    
+    def work():
+        started.set()
+        time.sleep(0.2)
+        return "done"
+    
+    async def work_async():
+        return "late"
+    
+    async def followers():
+        impatient = asyncio.wait_for(flight.ado("k", work_async), 0.05)
+        return await asyncio.gather(impatient, flight.ado("k", work_async), return_exceptions=True)
+    
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, "k", work)
+        started.wait()
+        results = asyncio.run(followers())
+        assert leader.result() == ("done", False)
+    
+    assert isinstance(results[0], asyncio.TimeoutError)
+    assert results[1] == ("done", True)
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_singleflight_follower_honours_its_own_deadline():
+    """测试等待者的截止时间短于首个调用时按自己的截止时间返回"""
+    flight = SingleFlight()
+    started = threading.Event()
+    
+    def work():
+        started.set()
+        time.sleep(0.5)
+        return "done"
+    
+    def sync_follower():
+        with deadline_scope(Deadline(0.1)):
+            return flight.do("k", work)
+    
+    async def async_follower():
+        with deadline_scope(Deadline(0.1)):
+            return await flight.ado("k", work)
+    
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "k", work)
+        started.wait()
+        begin = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            pool.submit(sync_follower).result()
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(async_follower())
+        assert time.monotonic() - begin < 0.4
+        # 首个调用不受等待者放弃的影响
+        assert leader.result() == ("done", False)
+
+
+def test_gateway_coalesces_identical_requests():
+    """测试网关合并并发的相同请求"""
+    with StubLLMServer(delay=lambda index: 0.1) as server:
+        gateway = LLMGateway({"backend": "http"})
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda _: client.invoke("热门问题"), range(4)))
+        
+        async def main():
+            return await asyncio.gather(*[client.ainvoke("另一个问题") for _ in range(4)])
+        
+        responses += asyncio.run(main())
+        gateway.close()
+    
+    assert len(server.requests) == 2
+    assert sum(response.coalesced for response in responses) == 6
+    assert gateway.get_stats()["coalescing"]["coalesced"] == 6
+
+
+def test_gateway_coalescing_disabled():
+    """测试关闭请求合并"""
+    with StubLLMServer(delay=lambda index: 0.05) as server:
+        gateway = LLMGateway({"backend": "http", "coalesce": False})
+        client = gateway.client("gpt-4", base_url=server.base_url)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            list(pool.map(lambda _: client.invoke("热门问题"), range(3)))
+        gateway.close()
+    
+    assert len(server.requests) == 3
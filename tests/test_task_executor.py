@@ -49,3 +49,373 @@ def test_task_executor_execute_structure():
     if "plan" in result:
         assert "subtasks" in result["plan"] or result["plan"].get("status") == "error"
 
+
+
+def test_task_executor_parallel_subtasks():
+    """测试互不依赖的子任务并发执行"""
+    import time
+    from src.agents.base_agent import BaseAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    
+    class SlowKnowledgeAgent(BaseAgent):
+        def process(self, input_data):
+            return self.retrieve(input_data.get("query", ""))
+        
+        def retrieve(self, query, top_k=5):
+            time.sleep(0.2)
+            return {"status": "success", "query": query, "results": []}
+    
+    executor = TaskExecutor({"agents": {}})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", PlanningAgent({"openai_api_key": None}))
+    executor.agent_manager.register_agent("knowledge", SlowKnowledgeAgent("SlowKnowledgeAgent", {}))
+    
+    start = time.perf_counter()
+    result = executor.execute({"instruction": "搜索资料A，搜索资料B，搜索资料C"})
+    elapsed = time.perf_counter() - start
+    
+    assert result["status"] == "completed"
+    assert [r["query"] for r in result["results"]] == ["搜索资料A", "搜索资料B", "搜索资料C"]
+    assert elapsed < 0.5
+
+
+class _FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class _FakeAsyncLLM:
+    """模拟异步LLM客户端"""
+    
+    def __init__(self, content, delay):
+        self.content = content
+        self.delay = delay
+    
+    def invoke(self, prompt):
+        raise AssertionError("异步路径不应调用同步接口")
+    
+    async def ainvoke(self, prompt):
+        import asyncio
+        await asyncio.sleep(self.delay)
+        return _FakeResponse(self.content)
+
+
+def test_task_executor_execute_async_shares_event_loop():
+    """测试大量异步任务共享同一事件循环"""
+    import asyncio
+    import json
+    import time
+    from src.agents.code_agent import CodeAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    
+    planning_agent = PlanningAgent({"openai_api_key": None})
+    planning_agent.llm = _FakeAsyncLLM(json.dumps({"steps": ["生成代码"]}), 0.1)
+    code_agent = CodeAgent({"openai_api_key": None})
+    code_agent.llm = _FakeAsyncLLM("```python\nresult = 1\n```", 0.1)
+    
+    executor = TaskExecutor({"agents": {}})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", planning_agent)
+    executor.agent_manager.register_agent("code", code_agent)
+    
+    async def run_all():
+        tasks = [executor.execute_async({"instruction": f"任务{i}"}) for i in range(200)]
+        return await asyncio.gather(*tasks)
+    
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+    
+    assert all(r["status"] == "completed" for r in results)
+    assert all(r["results"][0]["code"] == "result = 1" for r in results)
+    assert elapsed < 2.0
+
+
+def test_task_executor_execute_many():
+    """测试批量执行：结果有序、失败隔离、并发上限与统计"""
+    import threading
+    import time
+    from src.agents.base_agent import BaseAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+    
+    class SlowKnowledgeAgent(BaseAgent):
+        def process(self, input_data):
+            return self.retrieve(input_data.get("query", ""))
+        
+        def retrieve(self, query, top_k=5):
+            if "失败" in query:
+                raise RuntimeError("检索失败")
+            with lock:
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+            time.sleep(0.05)
+            with lock:
+                active["now"] -= 1
+            return {"status": "success", "query": query, "results": []}
+    
+    executor = TaskExecutor({"agents": {}})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", PlanningAgent({"openai_api_key": None}))
+    executor.agent_manager.register_agent("knowledge", SlowKnowledgeAgent("SlowKnowledgeAgent", {}))
+    
+    tasks = [{"instruction": f"搜索资料{i}"} for i in range(40)]
+    tasks[7] = {"instruction": "搜索失败"}
+    
+    start = time.perf_counter()
+    batch = executor.execute_many(tasks, max_concurrency=10, per_agent_limits={"knowledge": 4})
+    elapsed = time.perf_counter() - start
+    
+    results = batch["results"]
+    assert len(results) == 40
+    assert results[0]["results"][0]["query"] == "搜索资料0"
+    assert results[39]["results"][0]["query"] == "搜索资料39"
+    assert results[7]["results"][0]["status"] == "error"
+    assert active["max"] <= 4
+    assert elapsed < 40 * 0.05
+    
+    summary = batch["summary"]
+    assert summary["total"] == 40
+    # 子任务失败的任务不计为成功
+    assert summary["succeeded"] == 39 and summary["failed"] == 1 and summary["partial"] == 0
+    assert summary["throughput"] > 0
+    assert summary["latency"]["p50"] <= summary["latency"]["p99"]
+
+
+def test_task_executor_execute_stream():
+    """测试按完成顺序流式返回批量结果"""
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    
+    executor = TaskExecutor({"agents": {}})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", PlanningAgent({"openai_api_key": None}))
+    
+    tasks = ({"instruction": f"测试任务{i}"} for i in range(5))
+    indexes = sorted(index for index, _ in executor.execute_stream(tasks, max_concurrency=2))
+    
+    assert indexes == [0, 1, 2, 3, 4]
+
+
+def test_task_executor_streaming_plan_overlaps_execution():
+    """测试流式规划：首个子任务在规划结束前开始执行"""
+    import json
+    import time
+    from src.agents.base_agent import BaseAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    
+    content = json.dumps({"steps": ["搜索资料", "生成代码"]}, ensure_ascii=False)
+    split = content.index("生成代码")
+    events = []
+    
+    class SlowStreamLLM:
+        def stream(self, prompt):
+            yield content[:split]
+            time.sleep(0.2)
+            events.append(("plan_done", time.perf_counter()))
+            yield content[split:]
+    
+    class KnowledgeAgent(BaseAgent):
+        def process(self, input_data):
+            return {}
+        
+        def retrieve(self, query):
+            events.append(("knowledge_start", time.perf_counter()))
+            return {"status": "success", "results": []}
+    
+    class CodeAgent(BaseAgent):
+        def process(self, input_data):
+            return {}
+        
+        def generate_code(self, subtask):
+            return {"status": "success", "code": "pass"}
+    
+    planning_agent = PlanningAgent({"openai_api_key": None})
+    planning_agent.llm = SlowStreamLLM()
+    executor = TaskExecutor({"agents": {}, "streaming_plan": True})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", planning_agent)
+    executor.agent_manager.register_agent("knowledge", KnowledgeAgent("knowledge", {}))
+    executor.agent_manager.register_agent("code", CodeAgent("code", {}))
+    
+    result = executor.execute({"instruction": "任务"})
+    
+    assert result["status"] == "completed"
+    assert result["plan"]["execution_order"] == ["task_1", "task_2"]
+    assert [r["status"] for r in result["results"]] == ["success", "success"]
+    times = dict(events)
+    assert times["knowledge_start"] < times["plan_done"]
+
+
+def test_task_executor_deadline_returns_partial_results():
+    """测试任务超出时间预算时停止子任务并返回部分结果"""
+    import time
+    from src.agents.base_agent import BaseAgent
+    from src.agents.evaluation_agent import EvaluationAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    from src.core.deadline import current_deadline
+    
+    class CooperativeKnowledgeAgent(BaseAgent):
+        def process(self, input_data):
+            return self.retrieve(input_data.get("query", ""))
+        
+        def retrieve(self, query, top_k=5):
+            if query.endswith("A"):
+                return {"status": "success", "query": query, "results": []}
+            # 每个检查点检查截止时间，模拟一个很慢的数据源
+            current_deadline().sleep(5.0)
+            return {"status": "success", "query": query, "results": []}
+    
+    executor = TaskExecutor({"agents": {}, "task_timeout": 0.3})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", PlanningAgent({"openai_api_key": None}))
+    executor.agent_manager.register_agent("knowledge", CooperativeKnowledgeAgent("KnowledgeAgent", {}))
+    executor.agent_manager.register_agent("evaluation", EvaluationAgent({"openai_api_key": None}))
+    
+    start = time.perf_counter()
+    result = executor.execute({"instruction": "搜索资料A，搜索资料B"})
+    elapsed = time.perf_counter() - start
+    
+    assert result["status"] == "partial"
+    assert result["results"][0]["status"] == "success"
+    assert result["results"][1]["reason"] == "deadline_exceeded"
+    assert any(issue["type"] == "timeout" for issue in result["evaluation"]["issues"])
+    assert elapsed < 1.0
+
+
+def test_task_executor_splits_budget_along_dependency_chain():
+    """测试时间预算按依赖链长度切分给子任务"""
+    from src.core.deadline import Deadline, current_deadline, deadline_scope
+    
+    executor = TaskExecutor({"agents": {}})
+    subtasks = [
+        {"id": "task_0", "dependencies": []},
+        {"id": "task_1", "dependencies": ["task_0"]},
+        {"id": "task_2", "dependencies": ["task_1"]},
+        {"id": "task_3", "dependencies": []},
+    ]
+    heights = executor._subtask_heights(subtasks)
+    assert heights == {"task_0": 3, "task_1": 2, "task_2": 1, "task_3": 1}
+    
+    with deadline_scope(Deadline(9.0)):
+        first = executor._subtask_deadline(subtasks[0], heights)
+        independent = executor._subtask_deadline(subtasks[3], heights)
+        assert first.remaining() == pytest.approx(3.0, abs=0.1)
+        assert independent.remaining() == pytest.approx(9.0, abs=0.1)
+        assert first.parent is current_deadline()
+    assert executor._subtask_deadline(subtasks[0], heights) is None
+
+
+def test_task_executor_moves_screenshots_to_artifact_store(tmp_path):
+    """测试子任务结果中的截图移入产物存储，结果中只保留引用并可按需读取"""
+    from src.agents.base_agent import BaseAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    from src.core.blob_store import get_blob_store
+    
+    screenshot = b"\x89PNG" + bytes(256 * 1024)
+    
+    class FakeGUIAgent(BaseAgent):
+        def process(self, input_data):
+            return self.execute_task(input_data)
+        
+        def execute_task(self, task):
+            handle = get_blob_store().put(screenshot, content_type="image/png")
+            return {"status": "completed", "steps": 1,
+                    "final_observation": {"status": "success", "screenshot": handle, "size": (1920, 1080)}}
+    
+    executor = TaskExecutor({"agents": {}, "artifact_store": {"directory": str(tmp_path)}})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", PlanningAgent({"openai_api_key": None}))
+    executor.agent_manager.register_agent("gui", FakeGUIAgent("FakeGUIAgent", {}))
+    
+    result = executor.execute({"instruction": "点击确定按钮"})
+    
+    observation = result["results"][0]["final_observation"]
+    ref = observation["screenshot"]
+    assert ref["content_type"] == "image/png" and ref["size"] == len(screenshot)
+    assert observation["size"] == (1920, 1080)
+    assert len(repr(result["results"])) < 1024
+    assert executor.fetch_artifact(ref["artifact_id"]) == screenshot
+    assert executor.fetch_artifact("../etc/passwd") is None
+    # 截图已转存，共享内存中的句柄被释放
+    assert get_blob_store().get_stats()["blobs"] == 0
+
+
+def test_task_executor_records_trace(tmp_path):
+    """测试已采样的任务记录 任务 → 子任务 → 智能体操作 → LLM调用 的链路"""
+    import asyncio
+    import json
+    from src.agents.base_agent import BaseAgent, measured
+    from src.agents.code_agent import CodeAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    from src.recording.tracing import configure_tracer
+    
+    class FakeKnowledgeAgent(BaseAgent):
+        def process(self, input_data):
+            return self.retrieve(input_data.get("query", ""))
+        
+        @measured("retrieve")
+        def retrieve(self, query, top_k=5):
+            return {"status": "success", "query": query, "results": []}
+    
+    tracer = configure_tracer({"sample_rate": 1.0, "directory": str(tmp_path)})
+    try:
+        executor = TaskExecutor({"agents": {}})
+        executor.agent_manager = AgentManager({"agents": {}})
+        executor.agent_manager.register_agent("planning", PlanningAgent({"openai_api_key": None}))
+        executor.agent_manager.register_agent("knowledge", FakeKnowledgeAgent("FakeKnowledgeAgent", {}))
+        
+        result = executor.execute({"instruction": "搜索资料A，搜索资料B"})
+        
+        spans = tracer.get_trace(result["trace_id"])
+        by_id = {span.span_id: span for span in spans}
+        retrieves = [span for span in spans if span.name == "FakeKnowledgeAgent.retrieve"]
+        assert len(retrieves) == 2
+        assert all(by_id[span.parent_id].name == "subtask" for span in retrieves)
+        assert {span.name for span in spans} >= {"task", "plan", "subtask"}
+        events = json.loads((tmp_path / f"{result['trace_id']}.chrome.json").read_text(encoding="utf-8"))
+        assert len(events["traceEvents"]) == len(spans)
+        
+        # 异步路径：子任务在asyncio任务中执行，LLM调用挂在智能体跨度下
+        planning_agent = PlanningAgent({"openai_api_key": None})
+        planning_agent.llm = _FakeAsyncLLM(json.dumps({"steps": ["生成代码"]}), 0)
+        code_agent = CodeAgent({"openai_api_key": None})
+        code_agent.llm = _FakeAsyncLLM("```python\nresult = 1\n```", 0)
+        executor.agent_manager.register_agent("planning", planning_agent)
+        executor.agent_manager.register_agent("code", code_agent)
+        
+        result = asyncio.run(executor.execute_async({"instruction": "任务"}))
+        
+        spans = tracer.get_trace(result["trace_id"])
+        by_id = {span.span_id: span for span in spans}
+        llm_calls = [span for span in spans if span.name == "CodeAgent.llm"]
+        assert len(llm_calls) == 1
+        assert by_id[llm_calls[0].parent_id].name == "subtask"
+        assert by_id[by_id[llm_calls[0].parent_id].parent_id].name == "task"
+    finally:
+        configure_tracer({})
+
+
+def test_summarize_batch_counts_partial_and_failed_subtasks():
+    """测试批量统计区分成功、超出时间预算与失败的任务"""
+    executor = TaskExecutor({"agents": {}})
+    results = [
+        {"status": "completed", "results": [{"status": "success"}], "execution_time": 0.1},
+        {"status": "partial", "results": [{"status": "error", "reason": "deadline_exceeded"}],
+         "execution_time": 0.2},
+        {"status": "completed", "results": [{"status": "error"}, {"status": "error"}], "execution_time": 0.3},
+        {"status": "error", "message": "规划智能体未初始化", "execution_time": 0.0},
+    ]
+    
+    summary = executor._summarize_batch(results, wall_time=1.0)
+    
+    assert (summary["succeeded"], summary["partial"], summary["failed"]) == (1, 1, 2)
@@ -0,0 +1,92 @@
+"""测试执行耗时估计"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.learning.time_estimator import ExecutionTimeEstimator
+
+
+def test_estimator_falls_back_to_prior_then_learns():
+    """测试样本不足时使用先验，之后使用学习到的分布"""
+    estimator = ExecutionTimeEstimator(min_samples=3, prior_p50=5.0, prior_p95=15.0)
+    subtask = {"id": "task_1", "type": "knowledge_query", "dependencies": []}
+    assert estimator.estimate_subtask(subtask) == (5.0, 15.0)
+    
+    for seconds in [0.1, 0.1, 0.1, 0.1, 1.0]:
+        estimator.observe("knowledge_query", "knowledge", seconds)
+    p50, p95 = estimator.estimate_subtask(subtask)
+    assert p50 == pytest.approx(0.1, rel=0.1)
+    assert p95 == pytest.approx(1.0, rel=0.1)
+    
+    # 未见过的类型退回全部子任务的分布
+    assert estimator.estimate_subtask({"type": "gui_action"})[0] == pytest.approx(0.1, rel=0.1)
+
+
+def test_estimate_plan_uses_critical_path():
+    """测试计划估计取依赖图最长路径"""
+    estimator = ExecutionTimeEstimator(min_samples=1)
+    for _ in range(3):
+        estimator.observe("knowledge_query", "knowledge", 1.0)
+        estimator.observe("code_generation", "code", 2.0)
+    subtasks = [
+        {"id": "task_1", "type": "knowledge_query", "dependencies": []},
+        {"id": "task_2", "type": "knowledge_query", "dependencies": []},
+        {"id": "task_3", "type": "code_generation", "dependencies": ["task_1", "task_2"]},
+    ]
+    estimate = estimator.estimate_plan(subtasks)
+    assert estimate["p50"] == pytest.approx(3.0, rel=0.1)
+    assert estimate["critical_path"][-1] == "task_3"
+    assert len(estimate["critical_path"]) == 2
+
+
+def test_estimate_plan_p95_is_percentile_of_path_total():
+    """测试计划 p95 是完成时间的分位，而不是各子任务 p95 之和"""
+    estimator = ExecutionTimeEstimator(min_samples=1)
+    for _ in range(9):
+        estimator.observe("code_generation", "code", 1.0)
+    estimator.observe("code_generation", "code", 10.0)
+    subtasks = [
+        {"id": f"task_{i}", "type": "code_generation", "dependencies": [f"task_{i - 1}"] if i else []}
+        for i in range(10)
+    ]
+    
+    estimate = estimator.estimate_plan(subtasks)
+    assert estimate["p50"] == pytest.approx(10.0, rel=0.1)
+    # 各子任务 p95 之和为 100 秒；十个子任务中同时慢三个以上的概率低于 5%
+    assert 20.0 < estimate["p95"] < 50.0
+    assert estimator.estimate_plan(subtasks) == estimate
+
+
+def test_task_executor_feeds_estimator_and_agent_statistics():
+    """测试执行器把子任务耗时反馈给估计器与智能体统计"""
+    import time
+    from src.agents.base_agent import BaseAgent
+    from src.agents.planning_agent import PlanningAgent
+    from src.core.agent_manager import AgentManager
+    from src.core.task_executor import TaskExecutor
+    
+    class KnowledgeAgent(BaseAgent):
+        def process(self, input_data):
+            return {}
+        
+        def retrieve(self, query):
+            time.sleep(0.02)
+            return {"status": "success"}
+    
+    planning_agent = PlanningAgent({"openai_api_key": None, "plan_store": {"enabled": False},
+                                    "time_estimator": {"min_samples": 2}})
+    knowledge_agent = KnowledgeAgent("knowledge", {})
+    executor = TaskExecutor({"agents": {}})
+    executor.agent_manager = AgentManager({"agents": {}})
+    executor.agent_manager.register_agent("planning", planning_agent)
+    executor.agent_manager.register_agent("knowledge", knowledge_agent)
+    
+    first = executor.execute({"instruction": "搜索资料，搜索示例"})
+    assert first["plan"]["estimated_time"] == pytest.approx(5.0)
+    assert knowledge_agent.statistics["tasks_completed"] == 2
+    
+    second = executor.execute({"instruction": "搜索资料，搜索示例"})
+    assert second["plan"]["estimated_time"] == pytest.approx(0.02, rel=0.3)
+    assert second["plan"]["estimated_time_p95"] >= second["plan"]["estimated_time"]
@@ -0,0 +1,35 @@
+"""测试时间范围查询工具"""
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.timeutil import TimeRing, bisect_time, to_epoch
+
+
+def test_time_ring_bisect_after_eviction():
+    """测试环形序列淘汰后仍可按下标访问与按时间二分查找"""
+    ring = TimeRing()
+    for i in range(10):
+        ring.append((i, float(i)))
+    for _ in range(6):
+        ring.popleft()
+    
+    assert len(ring) == 4
+    assert [entry[0] for entry in ring] == [6, 7, 8, 9]
+    start, end = bisect_time(ring, 7.0), bisect_time(ring, 9.0)
+    assert ring[start:end] == [(7, 7.0), (8, 8.0)]
+    assert ring[start:] == [(7, 7.0), (8, 8.0), (9, 9.0)]
+    
+    ring.clear()
+    assert len(ring) == 0 and ring[0:] == []
+
+
+def test_to_epoch_accepts_all_bounds():
+    """测试时间边界的各种写法"""
+    moment = datetime(2024, 1, 1, 12, 0, 0)
+    assert to_epoch(None) is None
+    assert to_epoch(1.5) == 1.5
+    assert to_epoch(moment) == moment.timestamp()
+    assert to_epoch(moment.isoformat()) == moment.timestamp()
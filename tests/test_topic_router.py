@@ -0,0 +1,42 @@
+"""测试层级主题路由"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.topic_router import TopicRouter, topic_matches
+
+
+@pytest.mark.parametrize("pattern,topic,expected", [
+    ("task.42.completed", "task.42.completed", True),
+    ("task.*.completed", "task.42.completed", True),
+    ("task.*.completed", "task.42.failed", False),
+    ("task.*", "task.42.completed", False),
+    ("task.#", "task.42.completed", True),
+    ("task.#", "task", True),
+    ("#.completed", "task.42.completed", True),
+    ("task.#.completed", "task.completed", True),
+    ("#", "anything.at.all", True),
+])
+def test_topic_matches(pattern, topic, expected):
+    """测试 * 匹配一级、# 匹配零级或多级"""
+    assert topic_matches(pattern, topic) is expected
+
+
+def test_router_matches_trie_and_caches_routes():
+    """测试前缀树路由结果与逐个匹配一致，按注册顺序返回并缓存"""
+    router = TopicRouter()
+    patterns = ["task.*.completed", "task.#", "agent.planner", "#.completed", "task.7.completed"]
+    for pattern in patterns:
+        router.add(pattern, pattern)
+    
+    for topic in ["task.7.completed", "task.8.failed", "agent.planner", "agent.gui.completed", "other"]:
+        assert list(router.route(topic)) == [p for p in patterns if topic_matches(p, topic)]
+    
+    router.route("task.7.completed")
+    assert router.get_stats()["hits"] == 1
+    
+    assert router.remove("task.#", "task.#")
+    assert not router.remove("task.#", "task.#")
+    assert router.route("task.8.failed") == ()
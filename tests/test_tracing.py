@@ -0,0 +1,102 @@
+"""测试执行链路追踪"""
+import asyncio
+import contextvars
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.recording.tracing import Tracer, current_span, to_chrome_trace, to_otlp
+
+
+def test_spans_propagate_through_threads_and_tasks():
+    """测试跨度经线程池（复制上下文）与asyncio任务挂到父跨度下"""
+    tracer = Tracer({"sample_rate": 1.0})
+    
+    def work():
+        with tracer.span("thread_work"):
+            pass
+    
+    async def fan_out():
+        async def child(i):
+            with tracer.span("async_work", index=i):
+                await asyncio.sleep(0)
+        await asyncio.gather(*(child(i) for i in range(2)))
+    
+    with tracer.span("task") as root:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(contextvars.copy_context().run, work).result()
+        asyncio.run(fan_out())
+        assert current_span() is root
+    assert current_span() is None
+    
+    spans = tracer.get_trace(root.trace_id)
+    assert [span.name for span in spans] == ["task", "thread_work", "async_work", "async_work"]
+    assert all(span.parent_id == root.span_id for span in spans[1:])
+    assert spans[1].thread_id != root.thread_id
+    assert root.duration >= max(span.duration for span in spans[1:])
+
+
+def test_unsampled_trace_records_nothing():
+    """测试未采样的链路中子跨度为空操作"""
+    tracer = Tracer({"sample_rate": 0.0})
+    
+    with tracer.span("task") as root:
+        with tracer.span("subtask") as child:
+            assert root is None and child is None
+    
+    stats = tracer.get_stats()
+    assert stats["sampled"] == 0 and stats["unsampled"] == 1 and stats["spans"] == 0
+    assert tracer.recent_traces() == []
+
+
+def test_trace_exported_to_chrome_and_otlp_files(tmp_path):
+    """测试根跨度结束后链路写入 Chrome 与 OTLP 文件，异常记录为错误状态"""
+    tracer = Tracer({"sample_rate": 1.0, "directory": str(tmp_path)})
+    
+    try:
+        with tracer.span("task") as root:
+            with tracer.span("llm.backend", model="gpt-4", attempt=0):
+                raise RuntimeError("超时")
+    except RuntimeError:
+        pass
+    
+    chrome = json.loads((tmp_path / f"{root.trace_id}.chrome.json").read_text(encoding="utf-8"))
+    events = {event["name"]: event for event in chrome["traceEvents"]}
+    assert events["llm.backend"]["ph"] == "X"
+    assert events["llm.backend"]["cat"] == "llm"
+    assert events["llm.backend"]["args"]["parent_id"] == root.span_id
+    assert "RuntimeError" in events["llm.backend"]["args"]["error"]
+    
+    otlp = json.loads((tmp_path / f"{root.trace_id}.otlp.json").read_text(encoding="utf-8"))
+    spans = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    backend = next(span for span in spans if span["name"] == "llm.backend")
+    assert backend["traceId"] == root.trace_id and backend["parentSpanId"] == root.span_id
+    assert backend["status"]["code"] == 2
+    assert {"key": "attempt", "value": {"intValue": "0"}} in backend["attributes"]
+    assert int(backend["endTimeUnixNano"]) >= int(backend["startTimeUnixNano"])
+    
+    trace = tracer.get_trace(root.trace_id)
+    assert to_chrome_trace(trace) == chrome
+    assert to_otlp(trace)["resourceSpans"][0]["scopeSpans"][0]["spans"] == spans
+
+
+def test_reconfigure_keeps_in_flight_traces():
+    """测试配置未变化时沿用追踪器，替换追踪器后进行中的链路仍完整"""
+    from src.recording.tracing import configure_tracer, get_tracer
+    
+    try:
+        tracer = configure_tracer({"sample_rate": 1.0})
+        assert configure_tracer({"sample_rate": 1.0}) is tracer
+        
+        with get_tracer().span("task") as root:
+            configure_tracer({"sample_rate": 1.0, "max_traces": 10})
+            with get_tracer().span("subtask"):
+                pass
+        
+        assert [span.name for span in tracer.get_trace(root.trace_id)] == ["task", "subtask"]
+        assert tracer.get_stats()["late_spans"] == 0
+    finally:
+        configure_tracer({})